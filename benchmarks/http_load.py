@@ -0,0 +1,141 @@
+"""Load benchmark of the PrusaLink HTTP server types.
+
+Simulates dashboards polling a few endpoints. Every client keeps its
+connection open when the server allows it, like a browser does.
+
+Without --url, each server type is started locally with a trivial WSGI
+application, so only the server overhead is measured:
+
+    python3 benchmarks/http_load.py --clients 8 --requests 200
+
+With --url, a running PrusaLink instance is measured:
+
+    python3 benchmarks/http_load.py --url http://prusalink.local \\
+        --api-key XXXX --path /api/printer --path /api/job
+"""
+import threading
+from argparse import ArgumentParser
+from http.client import HTTPConnection
+from statistics import median, quantiles
+from time import perf_counter
+from urllib.parse import urlparse
+from wsgiref.simple_server import make_server
+
+from prusa.link.web import get_server_classes
+from prusa.link.config import Model
+
+# Count every thread started in this process
+STARTED = [0]
+_start = threading.Thread.start
+
+
+def _counting_start(self):
+    STARTED[0] += 1
+    _start(self)
+
+
+threading.Thread.start = _counting_start
+
+
+def application(environ, start_response):
+    """Trivial WSGI application answering with a small JSON."""
+    # pylint: disable=unused-argument
+    body = b'{"state": "IDLE", "temperature": 21.5}'
+    start_response("200 OK", [("Content-Type", "application/json"),
+                              ("Content-Length", str(len(body)))])
+    return [body]
+
+
+def client(host, port, paths, count, headers, latencies, errors):
+    """Poll the paths count times over one (kept alive) connection."""
+    connection = HTTPConnection(host, port, timeout=10)
+    for i in range(count):
+        path = paths[i % len(paths)]
+        start = perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(response.status)
+            if response.will_close:
+                connection.close()
+        except OSError as exc:
+            errors.append(exc)
+            connection.close()
+            continue
+        latencies.append(perf_counter() - start)
+    connection.close()
+
+
+def run_load(host, port, args):
+    """Run the clients, return a result row."""
+    latencies, errors = [], []
+    headers = {"X-Api-Key": args.api_key} if args.api_key else {}
+    threads = [
+        threading.Thread(target=client,
+                         args=(host, port, args.path, args.requests,
+                               headers, latencies, errors))
+        for _ in range(args.clients)
+    ]
+    started_before = STARTED[0]
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - start
+    server_threads = STARTED[0] - started_before - len(threads)
+
+    percentiles = quantiles(latencies, n=100) if len(latencies) > 1 \
+        else [0] * 99
+    return (len(latencies) / elapsed, median(latencies or [0]) * 1000,
+            percentiles[98] * 1000, len(errors), server_threads)
+
+
+def main():
+    """Benchmark main function."""
+    parser = ArgumentParser(prog="http_load", description=__doc__)
+    parser.add_argument("--url", help="benchmark running PrusaLink instead")
+    parser.add_argument("--api-key", help="X-Api-Key header value")
+    parser.add_argument("--path", action="append",
+                        help="path to poll, can be repeated")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=250,
+                        help="requests per client")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queue-size", type=int, default=16)
+    args = parser.parse_args()
+    args.path = args.path or ["/api/printer", "/api/job", "/api/v1/status",
+                              "/api/connection"]
+
+    print(f"{'server':<10} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'errors':>7} {'threads':>8}")
+    row = "{:<10} {:>9.0f} {:>8.2f} {:>8.2f} {:>7} {:>8}"
+
+    if args.url:
+        url = urlparse(args.url)
+        result = run_load(url.hostname, url.port or 80, args)
+        print(row.format(url.hostname, *result))
+        return
+
+    for server in ("single", "threading", "pool"):
+        cfg = Model(http=Model(server=server, workers=args.workers,
+                               queue_size=args.queue_size, keep_alive=5.0))
+        server_class, handler_class = get_server_classes(cfg)
+        httpd = make_server("127.0.0.1", 0, application,
+                            server_class=server_class,
+                            handler_class=handler_class)
+        httpd.timeout = 0.5
+        serving = threading.Thread(target=httpd.serve_forever, daemon=True)
+        serving.start()
+        try:
+            result = run_load("127.0.0.1", httpd.server_port, args)
+        finally:
+            httpd.shutdown()
+            httpd.server_close()
+        print(row.format(server, *result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Micro-benchmark of the logging overhead per serial line.
+
+The serial reader logs every line the printer sends at debug level,
+which is usually disabled. Compares a plain logger with the former
+interesting logger, taking a multiprocessing lock for every call,
+and with the current one, appending to its ring buffer without a lock:
+
+    python3 benchmarks/interesting_log.py --calls 200000
+"""
+import logging
+from argparse import ArgumentParser
+from collections import deque
+from multiprocessing import RLock
+from statistics import median
+from time import perf_counter
+
+from prusa.link.const import LOG_BUFFER_SIZE
+from prusa.link.interesting_logger import (InterestingLogger,
+                                           InterestingLogRotator)
+
+LINE = "Recv: T:214.9 /215.0 B:60.1 /60.0 T0:214.9 /215.0 @:43 B@:12 P:0"
+
+
+class LockingLogger(logging.Logger):
+    """The interesting logger as it was, locking for every entry"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.log_buffer = deque(maxlen=LOG_BUFFER_SIZE)
+        self.log_lock = RLock()
+        self.additional_messages_to_print = 0
+
+    def debug(self, msg, *args, **kwargs):
+        self._process_log_entry(self.isEnabledFor(logging.DEBUG),
+                                logging.DEBUG, msg, *args, **kwargs)
+        super().debug(msg, *args, **kwargs)
+
+    def _process_log_entry(self, got_printed, level, msg, *args, **kwargs):
+        with self.log_lock:
+            if self.additional_messages_to_print > 0:
+                self.additional_messages_to_print -= 1
+                assert got_printed is not None
+            else:
+                self.log_buffer.appendleft((level, msg, args, kwargs))
+
+
+def measure(logger, calls, rounds=5):
+    """Return the median time of one debug call in nanoseconds."""
+    times = []
+    for _ in range(rounds):
+        start = perf_counter()
+        for _ in range(calls):
+            logger.debug("%s", LINE)
+        times.append((perf_counter() - start) / calls * 1e9)
+    return median(times)
+
+
+def main():
+    """Benchmark main"""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100_000,
+                        help="debug calls per round")
+    args = parser.parse_args()
+
+    InterestingLogRotator()
+    loggers = {
+        "plain": logging.Logger("plain"),
+        "locking": LockingLogger("locking"),
+        "ring buffer": InterestingLogger("ring_buffer"),
+    }
+    for logger in loggers.values():
+        logger.parent = logging.getLogger()
+        logger.setLevel(logging.INFO)
+
+    for name, logger in loggers.items():
+        print(f"{name:>12} {measure(logger, args.calls):>8.0f} ns per line")
+
+
+if __name__ == "__main__":
+    main()
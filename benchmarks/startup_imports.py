@@ -0,0 +1,92 @@
+"""Startup import benchmark of the prusa-link daemon, with a budget.
+
+Imports the daemon the way prusa-link start does, in a fresh interpreter
+with -X importtime, and reports the slowest modules. Camera, image and
+web libraries have to load on first use, not on startup. Fails, when
+one of them gets imported, or when the module count is over the budget:
+
+    python3 benchmarks/startup_imports.py --rounds 5 --top 15
+
+The module budget does not depend on the machine, the time does, so it's
+only checked when given, e.g. --budget-ms 4000 on a Pi Zero.
+"""
+import re
+import subprocess
+import sys
+from argparse import ArgumentParser
+from statistics import median
+
+# Raise only knowingly, every module costs on a Pi Zero at each restart
+MODULE_BUDGET = 550
+
+# Loaded on first use, never on startup
+DEFERRED = ("numpy", "turbojpeg", "v4l2py", "picamera2", "zeroconf",
+            "pkg_resources", "jinja2", "prusa.link.web",
+            "prusa.link.v4l2_driver", "prusa.link.picamera_driver")
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_times(module):
+    """Imports the module in a new interpreter, returns
+    {module: (self us, cumulative us)} of the top level imports and
+    of every module imported"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=False)
+    if result.returncode:
+        sys.exit(f"Importing {module} failed:\n{result.stderr}")
+    modules = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match is None:
+            continue
+        own, cumulative, indent, name = match.groups()
+        modules[name] = (int(own), int(cumulative))
+        if len(indent) == 1:
+            total += int(cumulative)
+    return total, modules
+
+
+def main():
+    """Benchmark main"""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="prusa.link.daemon",
+                        help="the module to import")
+    parser.add_argument("--rounds", type=int, default=3,
+                        help="fresh interpreters to measure")
+    parser.add_argument("--top", type=int, default=10,
+                        help="slowest modules to show")
+    parser.add_argument("--budget-ms", type=float,
+                        help="fail over this import time")
+    args = parser.parse_args()
+
+    totals = []
+    modules = {}
+    for _ in range(args.rounds):
+        total, modules = import_times(args.module)
+        totals.append(total / 1000)
+    startup = median(totals)
+
+    print(f"{args.module}: {startup:.0f} ms, {len(modules)} modules")
+    slowest = sorted(modules.items(), key=lambda item: item[1][0],
+                     reverse=True)[:args.top]
+    for name, (own, cumulative) in slowest:
+        print(f"{own / 1000:>8.1f} ms {cumulative / 1000:>8.1f} ms  {name}")
+
+    failures = [f"{name} imported on startup" for name in sorted(modules)
+                if any(name == deferred or name.startswith(deferred + ".")
+                       for deferred in DEFERRED)]
+    if len(modules) > MODULE_BUDGET:
+        failures.append(f"{len(modules)} modules, "
+                        f"the budget is {MODULE_BUDGET}")
+    if args.budget_ms is not None and startup > args.budget_ms:
+        failures.append(f"{startup:.0f} ms, the budget is "
+                        f"{args.budget_ms:.0f} ms")
+    if failures:
+        sys.exit("Over the budget:\n  " + "\n  ".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Micro-benchmark of the YUYV to JPEG conversion of V4L2 cameras.
+
+Compares the former conversion allocating a new planar frame every time
+with the YUYVConverter reusing its planes, at full size and shrunk.
+Random frames are used, they encode slower than real pictures do:
+
+    python3 benchmarks/yuyv_jpeg.py --frames 50
+    python3 benchmarks/yuyv_jpeg.py --resolution 1920x1080 --scale 4
+"""
+from argparse import ArgumentParser
+from statistics import median
+from time import perf_counter
+
+import numpy as np
+from turbojpeg import TJSAMP_422  # type: ignore
+
+from prusa.link.util import YUYVConverter, get_jpeg
+
+RESOLUTIONS = ("640x480", "1280x720", "1920x1080")
+
+
+def allocating(data, width, height):
+    """The conversion as it was, allocating the planar frame every time"""
+    data_array = np.frombuffer(data, np.uint8)
+    size = len(data)
+    yuv_array = np.empty((size,), dtype=np.uint8)
+    yuv_array[:size//2] = data_array[0::2]
+    yuv_array[size//2: size//4*3] = data_array[1::4]
+    yuv_array[size//4*3:] = data_array[3::4]
+    return get_jpeg().encode_from_yuv(yuv_array, height, width,
+                                      jpeg_subsample=TJSAMP_422)
+
+
+def measure(function, frames, count):
+    """Return the median time of one conversion in milliseconds."""
+    times = []
+    for i in range(count):
+        start = perf_counter()
+        function(frames[i % len(frames)])
+        times.append((perf_counter() - start) * 1000)
+    return median(times)
+
+
+def main():
+    """Benchmark main"""
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resolution", action="append",
+                        help="WIDTHxHEIGHT, can be used more times")
+    parser.add_argument("--frames", type=int, default=30,
+                        help="conversions per variant and resolution")
+    parser.add_argument("--scale", type=int, default=2,
+                        help="how many times to shrink the frames")
+    args = parser.parse_args()
+
+    converter = YUYVConverter()
+    generator = np.random.default_rng(0)
+    print(f"{'resolution':>10} {'allocating':>12} {'reusing':>12} "
+          f"{'1/' + str(args.scale):>12}")
+    for resolution in args.resolution or RESOLUTIONS:
+        width, height = map(int, resolution.split("x"))
+        frames = [generator.integers(0, 256, width * height * 2,
+                                     np.uint8).tobytes()
+                  for _ in range(2)]
+
+        def reusing(data, width=width, height=height):
+            return converter.to_jpeg(data, width, height)
+
+        def shrinking(data, width=width, height=height):
+            return converter.to_jpeg(data, width, height, args.scale)
+
+        # Warm up the allocated planes and the library
+        reusing(frames[0])
+        shrinking(frames[0])
+
+        results = [
+            measure(lambda data, w=width, h=height: allocating(data, w, h),
+                    frames, args.frames),
+            measure(reusing, frames, args.frames),
+            measure(shrinking, frames, args.frames),
+        ]
+        print(f"{resolution:>10} "
+              + " ".join(f"{result:>9.2f} ms" for result in results))
+
+
+if __name__ == "__main__":
+    main()
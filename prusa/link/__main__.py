@@ -231,7 +231,7 @@ def main():
                 return 1
 
         files_preserve = []
-        for handler in logging.root.handlers:
+        for handler in config.log_handler.handlers:
             if hasattr(handler, "socket"):
                 files_preserve.append(handler.socket.fileno())
         context = DaemonContext(pidfile=pid_file,
@@ -249,6 +249,8 @@ def main():
             context.gid = getgrnam(config.daemon.group).gr_gid
 
         with context:
+            # The log listener thread did not survive the fork
+            config.log_handler.start()
             log.info("Starting service with pid %d", pid_file.read_pid())
             retval = daemon.run()
             log.info("Shutdown")
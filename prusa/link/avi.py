@@ -0,0 +1,150 @@
+"""
+Writes Motion-JPEG AVI files out of JPEG frames
+
+The frames are put into the container as they are, nothing is decoded
+or encoded, so it's cheap enough to do on a Raspberry Pi.
+"""
+import struct
+from typing import BinaryIO, Iterable, List, Tuple
+
+AVIF_HASINDEX = 0x10
+AVIIF_KEYFRAME = 0x10
+# RIFF sizes are 32 bit and some players don't like much more than this
+MAX_AVI_SIZE = 2**31 - 1
+
+# Start of frame markers carry the picture size, DHT, JPG and DAC don't
+SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def jpeg_size(data: bytes) -> Tuple[int, int]:
+    """
+    Returns the width and height of the JPEG
+    :raises ValueError: if the data is not a JPEG
+    """
+    if data[:2] != b"\xff\xd8":
+        raise ValueError("Not a JPEG")
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            raise ValueError("Invalid JPEG marker")
+        marker = data[position + 1]
+        if marker == 0xFF:  # padding
+            position += 1
+            continue
+        length = struct.unpack(">H", data[position + 2:position + 4])[0]
+        if marker in SOF_MARKERS:
+            height, width = struct.unpack(
+                ">HH", data[position + 5:position + 9])
+            return width, height
+        position += 2 + length
+    raise ValueError("No frame header found in the JPEG")
+
+
+class MJPEGWriter:
+    """
+    Writes the AVI file frame by frame, so the frames don't need to be
+    in memory. The sizes in the headers are filled in by close().
+    """
+
+    def __init__(self, file: BinaryIO, width: int, height: int, fps: float):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.index: List[Tuple[int, int]] = []
+        self.max_frame = 0
+
+        self._write_headers()
+
+    def _chunk(self, fourcc: bytes, data: bytes):
+        """Writes a chunk, padded to an even size"""
+        self.file.write(fourcc + struct.pack("<I", len(data)) + data)
+        if len(data) % 2:
+            self.file.write(b"\0")
+
+    def _write_headers(self):
+        """Writes the headers, with zeros for the counts not known yet"""
+        self.file.write(b"RIFF\0\0\0\0AVI ")
+        avih = struct.pack("<10I4I",
+                           int(1_000_000 / self.fps),  # us per frame
+                           0, 0, AVIF_HASINDEX,
+                           0,  # total frames
+                           0, 1,  # initial frames, streams
+                           0,  # suggested buffer size
+                           self.width, self.height,
+                           0, 0, 0, 0)
+        strh = struct.pack("<4s4sIHHIIIIIIiI4h",
+                           b"vids", b"MJPG", 0, 0, 0, 0,
+                           1000, int(self.fps * 1000),  # scale, rate
+                           0,
+                           0,  # length in frames
+                           0,  # suggested buffer size
+                           -1, 0,
+                           0, 0, self.width, self.height)
+        strf = struct.pack("<IiiHH4sIiiII",
+                           40, self.width, self.height, 1, 24, b"MJPG",
+                           self.width * self.height * 3, 0, 0, 0, 0)
+        strl = (b"strl"
+                + b"strh" + struct.pack("<I", len(strh)) + strh
+                + b"strf" + struct.pack("<I", len(strf)) + strf)
+        hdrl = (b"hdrl"
+                + b"avih" + struct.pack("<I", len(avih)) + avih
+                + b"LIST" + struct.pack("<I", len(strl)) + strl)
+        self._chunk(b"LIST", hdrl)
+        self.file.write(b"LIST\0\0\0\0")
+        self.movi_start = self.file.tell()
+        self.file.write(b"movi")
+
+    @property
+    def size(self) -> int:
+        """The size of the file written so far"""
+        return self.file.tell()
+
+    def add_frame(self, data: bytes):
+        """Appends a JPEG frame"""
+        self.index.append((self.file.tell() - self.movi_start, len(data)))
+        self.max_frame = max(self.max_frame, len(data))
+        self._chunk(b"00dc", data)
+
+    def close(self):
+        """Writes the index and fills in the headers, keeps the file open"""
+        movi_end = self.file.tell()
+        index = b"".join(struct.pack("<4sIII", b"00dc", AVIIF_KEYFRAME,
+                                     offset, size)
+                         for offset, size in self.index)
+        self._chunk(b"idx1", index)
+        end = self.file.tell()
+
+        frames = len(self.index)
+        self._patch(4, end - 8)
+        self._patch(self.movi_start - 4, movi_end - self.movi_start)
+        # avih: total frames and the suggested buffer size
+        self._patch(48, frames)
+        self._patch(60, self.max_frame)
+        # strh: length and the suggested buffer size
+        self._patch(140, frames)
+        self._patch(144, self.max_frame)
+        self.file.seek(end)
+
+    def _patch(self, offset, value):
+        """Overwrites a 32 bit number already written"""
+        self.file.seek(offset)
+        self.file.write(struct.pack("<I", value))
+
+
+def write_mjpeg_avi(file: BinaryIO, frames: Iterable[bytes], fps: float):
+    """
+    Writes the JPEG frames as an AVI, the size of the first one is used
+    :return: the number of frames written
+    """
+    writer = None
+    for frame in frames:
+        if writer is None:
+            writer = MJPEGWriter(file, *jpeg_size(frame), fps)
+        if writer.size + len(frame) > MAX_AVI_SIZE - 16 * len(writer.index):
+            break
+        writer.add_frame(frame)
+    if writer is None:
+        return 0
+    writer.close()
+    return len(writer.index)
@@ -0,0 +1,196 @@
+"""
+Contains implementation of the CameraStreams and CameraStream classes,
+which share captured frames among MJPEG stream clients
+"""
+import logging
+from threading import Condition, Event, Lock
+from time import monotonic
+from typing import Dict, Iterator, Optional, Tuple
+
+from prusa.connect.printer.camera import Camera
+from prusa.connect.printer.camera_controller import CameraController
+
+from .const import CAPTURE_FRAME_TIMEOUT
+from .printer_adapter.updatable import Thread, prctl_name
+from .util import downscale_jpeg
+
+log = logging.getLogger(__name__)
+
+
+class CameraStream:
+    """
+    Captures frames of one camera for any number of stream clients
+
+    Every frame is captured and encoded once, each client waits for
+    a newer frame than the one it has sent. A slow client just gets
+    the newest frame when it's ready, so the frames in between are
+    dropped for it only and the capture never waits for anyone.
+    Capturing runs only while someone is watching.
+    """
+
+    def __init__(self, camera: Camera, max_fps: float, max_width: int):
+        self.camera = camera
+        self.interval = 1 / max_fps if max_fps > 0 else 0
+        self.max_width = max_width
+
+        self.condition = Condition()
+        self.quit_evt = Event()
+        self.thread: Optional[Thread] = None
+        self.clients = 0
+        self.failed = False
+        # sequence number, JPEG
+        self.frame: Tuple[int, bytes] = (0, b"")
+
+    def frames(self) -> Iterator[bytes]:
+        """Yields JPEG frames for one client, until the camera fails"""
+        with self.condition:
+            self.clients += 1
+            if self.thread is None:
+                self.failed = False
+                self.thread = Thread(target=self._capture,
+                                     name="camera_stream",
+                                     daemon=True)
+                self.thread.start()
+        sent = 0
+        try:
+            while True:
+                with self.condition:
+                    while self.frame[0] <= sent:
+                        if self.failed or self.quit_evt.is_set():
+                            return
+                        if not self.condition.wait(CAPTURE_FRAME_TIMEOUT):
+                            return
+                    sent, data = self.frame
+                yield data
+        finally:
+            with self.condition:
+                self.clients -= 1
+
+    def stop(self):
+        """Stop capturing and end all the client streams"""
+        self.quit_evt.set()
+        with self.condition:
+            self.condition.notify_all()
+
+    def wait_stopped(self):
+        """Wait for the capturing thread to quit"""
+        thread = self.thread
+        if thread is not None:
+            thread.join()
+
+    def _capture(self):
+        """Captures frames as long as there is anyone to send them to"""
+        prctl_name()
+        sequence = 0
+        driver_sequence = 0
+        next_at = monotonic()
+        while True:
+            with self.condition:
+                if not self.clients or self.quit_evt.is_set():
+                    self.thread = None
+                    return
+            if self.quit_evt.wait(max(0.0, next_at - monotonic())):
+                continue
+            next_at = max(next_at + self.interval, monotonic())
+
+            try:
+                driver_sequence, data = self._grab(driver_sequence)
+                data = downscale_jpeg(data, self.max_width)
+            except Exception:  # pylint: disable=broad-except
+                log.exception("Camera %s failed while streaming",
+                              self.camera.camera_id)
+                with self.condition:
+                    self.failed = True
+                    self.thread = None
+                    self.condition.notify_all()
+                return
+
+            sequence += 1
+            with self.condition:
+                self.frame = (sequence, data)
+                self.condition.notify_all()
+
+    def _grab(self, newer_than: int) -> Tuple[int, bytes]:
+        """
+        Returns the next frame of the camera, the newest captured one
+        if it captures continuously, a triggered photo otherwise
+        """
+        # pylint: disable=protected-access
+        driver = self.camera._driver
+        # V4L2 drivers capturing continuously have a frame grabber
+        if getattr(driver, "grabber", None) is not None:
+            return driver.get_jpeg(newer_than)
+        snapshot = self.camera.take_a_photo()
+        if snapshot is None or snapshot.data is None:
+            raise TimeoutError("The camera did not take a photo")
+        return 0, snapshot.data
+
+
+class TooManyStreams(RuntimeError):
+    """There are as many stream clients as allowed"""
+
+
+class CameraStreams:
+    """
+    Keeps a stream for every watched camera
+
+    Frames are captured and downscaled once per camera, all the clients
+    of a camera share them. The number of clients of all the cameras
+    together is limited, as each one occupies an HTTP worker.
+    """
+
+    def __init__(self, camera_controller: CameraController, max_fps: float,
+                 max_width: int, max_clients: int):
+        # pylint: disable=too-many-arguments
+        self.camera_controller = camera_controller
+        self.max_fps = max_fps
+        self.max_width = max_width
+        self.max_clients = max_clients
+        self.streams: Dict[str, CameraStream] = {}
+        self.lock = Lock()
+        self.clients = 0
+        self.quit_evt = Event()
+
+    def frames(self, camera_id: str) -> Iterator[bytes]:
+        """
+        Yields JPEG frames of the camera for one client
+        :raises KeyError: if the camera is not connected
+        :raises TooManyStreams: if there are max_clients already
+        """
+        camera = self.camera_controller.get_camera(camera_id)
+        with self.lock:
+            if self.clients >= self.max_clients:
+                raise TooManyStreams(
+                    f"There already are {self.clients} streams")
+            stream = self.streams.get(camera_id)
+            # A reconnected camera is a new object, don't stream the old one
+            if stream is None or stream.camera is not camera:
+                stream = CameraStream(camera, self.max_fps, self.max_width)
+                self.streams[camera_id] = stream
+            self.clients += 1
+        if self.quit_evt.is_set():
+            stream.stop()
+        return self._client_frames(stream)
+
+    def _client_frames(self, stream: CameraStream) -> Iterator[bytes]:
+        """Yields the frames of the stream, frees the client slot at end"""
+        try:
+            yield from stream.frames()
+        finally:
+            with self.lock:
+                self.clients -= 1
+
+    def stop(self):
+        """Stop all streams"""
+        self.quit_evt.set()
+        with self.lock:
+            streams = list(self.streams.values())
+        for stream in streams:
+            stream.stop()
+
+    def wait_stopped(self):
+        """Wait for the streams to stop capturing"""
+        with self.lock:
+            streams = list(self.streams.values())
+        for stream in streams:
+            stream.wait_stopped()
@@ -0,0 +1,143 @@
+"""
+Contains implementation of the camera execution layer - a worker thread
+for every camera and an encode pool shared by all of them
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from multiprocessing import cpu_count
+from queue import Empty, Queue
+from threading import BoundedSemaphore, Event
+from time import monotonic
+from typing import Callable, Optional
+
+from prusa.connect.printer.camera import Snapshot
+from prusa.connect.printer.camera_driver import CameraDriver
+
+from .const import ENCODE_QUEUE_PER_WORKER, QUIT_INTERVAL
+from .metrics import registry
+from .printer_adapter.updatable import Thread, prctl_name
+from .util import is_potato_cpu
+
+log = logging.getLogger(__name__)
+
+CAPTURE_SECONDS = registry.histogram("prusalink_camera_capture_seconds",
+                                     "How long it took to take a photo",
+                                     ("driver",))
+ENCODE_SECONDS = registry.histogram("prusalink_camera_encode_seconds",
+                                    "How long it took to encode a JPEG")
+
+
+def remaining(deadline: float) -> float:
+    """Seconds left until the deadline, never negative"""
+    return max(0.0, deadline - monotonic())
+
+
+class EncodePool:
+    """
+    Encodes JPEGs for all the cameras with a thread per CPU, so they
+    encode at the same time without starving the rest of PrusaLink.
+    A single CPU gets a single thread. Only a few encodes per thread
+    can wait, the rest fails on their deadline instead of piling up.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        if workers is None:
+            workers = 1 if is_potato_cpu() else cpu_count()
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix="encode",
+                                           initializer=prctl_name)
+        self.slots = BoundedSemaphore(workers * ENCODE_QUEUE_PER_WORKER)
+
+    def encode(self, function: Callable[[bytes], bytes], data,
+               deadline: float) -> bytes:
+        """
+        Encodes the data by the function in the pool
+        :raises TimeoutError: if it's not done by the deadline
+        """
+        if not self.slots.acquire(timeout=remaining(deadline)):
+            raise TimeoutError("No encoder was free in time")
+        try:
+            future = self.executor.submit(self._timed, function, data)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        try:
+            return future.result(timeout=remaining(deadline))
+        except FutureTimeoutError as exception:
+            raise TimeoutError("Encoding did not finish in time") \
+                from exception
+
+    @staticmethod
+    def _timed(function: Callable[[bytes], bytes], data) -> bytes:
+        """Encodes and observes how long it took"""
+        with ENCODE_SECONDS.time():
+            return function(data)
+
+
+encode_pool = EncodePool()
+
+
+class CameraWorker:
+    """Takes the photos of one camera in its own thread, one by one"""
+
+    def __init__(self, take: Callable[[Snapshot], None], name: str):
+        self.take = take
+        self.queue: Queue = Queue()
+        self.quit_evt = Event()
+        self.thread = Thread(target=self._work, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, snapshot: Snapshot):
+        """Takes the photo for the snapshot as soon as possible"""
+        self.queue.put(snapshot)
+
+    def stop(self):
+        """Stops the worker, does not wait, the worker itself may call it"""
+        self.quit_evt.set()
+
+    def _work(self):
+        """Takes photos until stopped"""
+        prctl_name()
+        while not self.quit_evt.is_set():
+            try:
+                snapshot = self.queue.get(timeout=QUIT_INTERVAL)
+            except Empty:
+                continue
+            self.take(snapshot)
+
+
+class WorkerCameraDriver(CameraDriver):  # pylint: disable=abstract-method
+    """
+    A camera driver taking photos by a persistent worker instead of
+    starting a thread for every photo. Cameras triggered together
+    capture at the same time, each in its own worker.
+    This is an abstract base, the drivers implement the capture itself.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.worker: Optional[CameraWorker] = None
+
+    def trigger(self, snapshot: Optional[Snapshot] = None) -> None:
+        """Hands the photo over to the worker, does not block"""
+        if snapshot is None:
+            snapshot = Snapshot()
+            snapshot.camera_id = self.camera_id
+        if self.worker is None:
+            self.worker = CameraWorker(self._timed_photo_taker,
+                                       name=f"camera_{self.name}")
+        self.worker.submit(snapshot)
+
+    def _timed_photo_taker(self, snapshot: Snapshot):
+        """Takes the photo and observes how long it took"""
+        with CAPTURE_SECONDS.labels(self.name).time():
+            self._photo_taker(snapshot)
+
+    def stop_worker(self):
+        """Stops the worker, a new one is started by the next trigger"""
+        if self.worker is not None:
+            self.worker.stop()
+            self.worker = None
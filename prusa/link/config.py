@@ -10,6 +10,7 @@ from typing import Iterable
 from extendparser.get import Get
 
 from .const import PRINTER_CONF_TYPES
+from .log_queue import QueuedLogHandler
 
 CONNECT = 'connect.prusa3d.com'
 
@@ -44,7 +45,7 @@ def check_log_level(value):
 
 def check_server_type(value):
     """Check valid server class"""
-    if value not in ("single", "threading", "forking"):
+    if value not in ("single", "threading", "pool"):
         raise ValueError(f"Invalid value {value}")
 
 
@@ -129,6 +130,12 @@ class Config(Get):
 
         # Let's save the handler we've configured for later use
         self.configured_handler = self.get_log_handler(args)
+        # The handler gets the records from a queue, not to block anyone
+        self.log_handler = QueuedLogHandler(self.configured_handler)
+        for handler in logging.root.handlers[:]:  # reset root handlers
+            logging.root.removeHandler(handler)
+        logging.root.addHandler(self.log_handler)
+        self.log_handler.start()
 
         # [http]
         self.http = Model(
@@ -136,7 +143,19 @@ class Config(Get):
                 ("address", str, "0.0.0.0"),
                 ("port", int, 8080),
                 ("link_info", bool, False),
+                ("upload_rate", int, 0),
+                ("upload_burst", int, 256 * 1024),
+                ("server", str, "threading"),
+                ("workers", int, 4),
+                ("queue_size", int, 16),
+                ("keep_alive", float, 5.0),
+                ("thumbnail_cache_size", int, 4 * 1024 * 1024),
+                ("thumbnail_dir", str, ""),
             )))
+        check_server_type(self.http.server)
+        if self.http.thumbnail_dir:
+            self.http.thumbnail_dir = abspath(
+                join(self.daemon.data_dir, self.http.thumbnail_dir))
 
         if args.address:
             self.http.address = args.address
@@ -156,9 +175,16 @@ class Config(Get):
                     ("storage", tuple, [], ':'),
                     # relative to HOME
                     ("directories", tuple, ("./PrusaLink gcodes", ), ':'),
+                    ("print_while_receiving", bool, False),
+                    ("sd_tree_cache", str, "./sd_tree_cache.json"),
+                    ("trace_instructions", bool, False),
+                    ("trace_sample_rate", float, 0.1),
                 )))
         if args.serial_port:
             self.printer.port = args.serial_port
+        if self.printer.sd_tree_cache:
+            self.printer.sd_tree_cache = abspath(
+                join(self.daemon.data_dir, self.printer.sd_tree_cache))
 
         self.printer.settings = abspath(
             join(self.daemon.data_dir, self.printer.settings))
@@ -172,7 +198,26 @@ class Config(Get):
                 "cameras",
                 (
                     ("auto_detect", bool, True),
+                    ("continuous_capture", bool, False),
+                    ("stream_max_fps", float, 5.0),
+                    ("stream_max_width", int, 0),
+                    ("stream_max_clients", int, 2),
+                    ("upload_change_threshold", float, 0.0),
+                    ("upload_keep_alive", float, 10.0),
+                )))
+
+        # [timelapse]
+        self.timelapse = Model(
+            self.get_section(
+                "timelapse",
+                (
+                    ("enabled", bool, False),
+                    ("directory", str, "./timelapse"),
+                    ("max_size", int, 512 * 1024 * 1024),
+                    ("fps", float, 10.0),
                 )))
+        self.timelapse.directory = abspath(
+            join(self.daemon.data_dir, self.timelapse.directory))
 
         Config.instance = self
 
@@ -203,9 +248,6 @@ class Config(Get):
 
         log_format = self.get("logging", "format", fallback=log_format)
 
-        for handler in logging.root.handlers:  # reset root logger handlers
-            logging.root.removeHandler(handler)
-        logging.root.addHandler(configured_handler)
         formatter = Formatter(log_format)
         configured_handler.setFormatter(formatter)
         return configured_handler
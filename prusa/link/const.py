@@ -73,7 +73,6 @@ IP_UPDATE_INTERVAL = 5
 QUIT_INTERVAL = 0.2
 SD_INTERVAL = 0.2
 SD_FILESCAN_INTERVAL = 60
-DIR_RESCAN_INTERVAL = 1
 PRINTER_BOOT_WAIT = 8
 SEND_INFO_RETRY = 5
 SERIAL_REOPEN_TIMEOUT = 2
@@ -91,12 +90,28 @@ SELF_PING_RETRY_INTERVAL = 10
 ATTENTION_CLEAR_INTERVAL = 5
 CAMERA_INIT_DELAY = 2
 CAMERA_SCAN_INTERVAL = 30
+CAMERA_RESCAN_INTERVAL = 10 * 60  # With udev telling us about new ones
 CAMERA_REGISTER_TIMEOUT = 5
 TIME_FOR_SNAPSHOT = 1
 
+# --- HTTP server ---
+HTTP_SOCKET_TIMEOUT = 60  # How long can a pool worker wait for a client
+THUMBNAIL_DISK_FILES = 1000  # How many thumbnails to keep on disk
+
 # --- Lcd queue ---
 LCD_QUEUE_SIZE = 30
 
+# --- LCD scheduler ---
+LCD_SERIAL_BUDGET = 12  # B/s of cosmetic LCD messages while printing
+LCD_SERIAL_BURST = 75  # B, about three messages can go at once
+
+# --- Command queue ---
+COMMAND_RESULTS_KEPT = 32  # Finished commands, which can still be polled
+COMMAND_RESPONSE_TIMEOUT = 2  # s to wait for a command before HTTP 202
+
+# --- Startup ---
+STARTUP_WORKERS = 4  # Startup steps running at the same time
+
 # --- Serial queue ---
 RX_SIZE = 128  # Not used much, limits the max serial message size
 SERIAL_QUEUE_TIMEOUT = 25
@@ -114,6 +129,31 @@ USE_DYNAMIC_THRESHOLD = True  # Compute the percentile or use a fixed value?
 STATS_EVERY = 100
 TAIL_COMMANDS = 10  # how many commands after the last progress report
 PRINT_QUEUE_SIZE = 4
+STREAM_PRINT_BUFFER = 1024 * 1024  # Bytes to receive before printing starts
+
+# --- SD copier ---
+SD_COPY_QUEUE_SIZE = 16  # Lines enqueued ahead of the confirmed ones
+SD_COPY_ATTEMPTS = 3  # A failed copy starts over, M28 can't append
+SD_COPY_LISTING_TIMEOUT = 60  # How long to wait for the copy to be listed
+SD_COPY_ABORT_TIMEOUT = 10  # How long to try ending a failed SD write
+
+# --- Camera capture ---
+CAPTURE_BUFFERS = 4  # The newest and the encoded frame are held by us
+CAPTURE_FRAME_TIMEOUT = 5  # How long to wait for a frame from the camera
+CAMERA_CAPTURE_DEADLINE = 10  # A photo late after this fails, the SDK waits 20
+ENCODE_QUEUE_PER_WORKER = 2  # How many encodes can wait for a pool thread
+
+# --- Snapshot uploads ---
+CHANGE_PIXEL_NOISE = 16  # Luma difference of a pixel considered a change
+
+# --- Timelapse ---
+TIMELAPSE_RENDER_NICENESS = 19  # Rendering must not slow down printing
+
+# --- Upload scheduler ---
+UPLOAD_FEEDBACK_INTERVAL = 0.25  # How often to re-evaluate the rate limit
+UPLOAD_MIN_RATE = 32 * 1024  # B/s, never throttle the upload below this
+UPLOAD_RATE_STEP = 64 * 1024  # B/s minimal limit increase per second
+UPLOAD_MAX_LOAD = 1.5  # Load average per CPU considered as an overload
 
 # --- Storage ---
 MAX_FILENAME_LENGTH = 52
@@ -139,6 +179,17 @@ STATE_HISTORY_SIZE = 10
 LOG_BUFFER_SIZE = 200
 AFTERMATH_LOG_SIZE = 100
 
+# --- Log queue ---
+LOG_QUEUE_SIZE = 1000  # Records waiting to be written out, then dropping
+LOG_FLUSH_TIMEOUT = 5  # How long to wait for the queued records on exit
+
+# --- Sampling profiler ---
+PROFILER_INTERVAL = 0.01  # s between the samples of all the thread stacks
+PROFILER_MAX_DURATION = 300  # s, the longest profile one can ask for
+
+# --- Instruction tracing ---
+TRACE_RING_SIZE = 4096  # Traced instructions kept, the oldest get overwritten
+
 # --- Selected log files---
 GZ_SUFFIX = ".gz"
 LOGS_PATH = "/var/log"
@@ -11,7 +11,6 @@ from .config import Settings
 from .printer_adapter import prusa_link
 from .printer_adapter.prusa_link import PrusaLink
 from .printer_adapter.updatable import Thread
-from .web import run_http
 
 log = logging.getLogger(__name__)
 
@@ -57,12 +56,6 @@ class Daemon:
 
         prctl.set_name("pl#main")
         self.settings = Settings(self.cfg.printer.settings)
-        self.http = ExThread(target=run_http,
-                             args=(self, not daemon),
-                             name="http")
-
-        if self.settings.service_local.enable:
-            self.http.start()
 
         # Log daemon stuff as printer_adapter
         adapter_logger = logging.getLogger(prusa_link.__name__)
@@ -70,10 +63,19 @@ class Daemon:
             self.prusa_link = PrusaLink(self.cfg, self.settings)
         except Exception:  # pylint: disable=broad-except
             adapter_logger.exception("Adapter was not start")
-            self.http.raise_exception(KeyboardInterrupt)
-            self.http.join()
             return 1
 
+        # The web loads after the printer part is up, it's not needed
+        # for talking to the printer and takes long to import
+        # pylint: disable=import-outside-toplevel
+        from .web import run_http
+        self.http = ExThread(target=run_http,
+                             args=(self, not daemon),
+                             name="http")
+
+        if self.settings.service_local.enable:
+            self.http.start()
+
         try:
             self.prusa_link.stopped_event.wait()
             return 0
@@ -104,4 +106,5 @@ class Daemon:
         # pylint: disable=unused-argument
         if self.prusa_link:
             self.prusa_link.stop()
-        self.http.raise_exception(KeyboardInterrupt)
+        if self.http:
+            self.http.raise_exception(KeyboardInterrupt)
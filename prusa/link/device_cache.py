@@ -0,0 +1,52 @@
+"""
+Contains implementation of the DeviceCache class, which remembers what
+was found out about device nodes, so camera scans don't reopen them
+"""
+import os
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+NodeKey = Optional[Tuple[int, int]]
+
+
+def node_key(path: str) -> NodeKey:
+    """
+    Returns what identifies the device behind the node - its inode and
+    device number. Both change when the device gets re-plugged.
+    None if the node is gone
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_rdev
+
+
+def nodes_key(paths: Iterable[str]) -> Tuple[Tuple[str, NodeKey], ...]:
+    """Returns what identifies the devices behind all the nodes"""
+    return tuple((path, node_key(path)) for path in sorted(paths))
+
+
+class DeviceCache:
+    """
+    Remembers a result per device node for as long as the node stays
+    the same. Failures are not remembered, udev may be still setting up
+    permissions of a new node.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[NodeKey, Any]] = {}
+
+    def get(self, path: str, find_out: Callable[[str], Any]) -> Any:
+        """Returns the remembered result or finds it out by find_out"""
+        key = node_key(path)
+        cached = self.entries.get(path)
+        if cached is not None and key is not None and cached[0] == key:
+            return cached[1]
+        result = find_out(path)
+        self.entries[path] = (key, result)
+        return result
+
+    def keep_only(self, paths: Iterable[str]):
+        """Forgets the nodes, which are not among the paths anymore"""
+        for path in set(self.entries) - set(paths):
+            del self.entries[path]
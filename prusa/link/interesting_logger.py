@@ -5,8 +5,10 @@ import threading
 import traceback
 from collections import deque
 from copy import copy
+from datetime import datetime
 from logging import CRITICAL, DEBUG, ERROR, INFO, NOTSET, WARNING, Logger
-from multiprocessing import RLock
+from threading import RLock, get_ident
+from time import time
 
 from .const import AFTERMATH_LOG_SIZE, LOG_BUFFER_SIZE
 from .printer_adapter.structures.mc_singleton import MCSingleton
@@ -47,9 +49,14 @@ class InterestingLogRotator(metaclass=MCSingleton):
     """
     Stores all logs in a rotating queue, on trigger logs the current queue
     plus AFTERMATH_LOG_SIZE messages forward
+
+    The queue holds just references to the log call arguments, nothing
+    gets formatted until a trigger. Appending to a deque is atomic, so
+    unless there's an aftermath being logged, no lock is taken.
     """
 
     def __init__(self):
+        # (level, msg, args, kwargs, timestamp, thread id)
         self.log_buffer = deque(maxlen=LOG_BUFFER_SIZE)
         self.additional_messages_to_print = 0
         self.log_lock = RLock()
@@ -73,19 +80,26 @@ class InterestingLogRotator(metaclass=MCSingleton):
         """Is the logger name in the skipped set?"""
         return logger_name in self.skipped_loggers
 
-    def process_log_entry(self, got_printed, level, msg, *args, **kwargs):
+    def process_log_entry(self, logger, level, msg, args, kwargs):
         """
         If the log entry should be written out and was not, lets do it
         if there is nothing interesting going on, adds the log entry
         ino the rotating queue
         """
+        if not self.additional_messages_to_print:
+            if kwargs.get("exc_info") is True:
+                kwargs["exc_info"] = sys.exc_info()
+            self.log_buffer.appendleft(
+                (level, msg, args, kwargs, time(), get_ident()))
+            return
         with self.log_lock:
             if self.additional_messages_to_print > 0:
                 self.additional_messages_to_print -= 1
-                if not got_printed:
+                if not logger.isEnabledFor(level):
                     self._log(level, msg, *args, **kwargs)
             else:
-                self.log_buffer.appendleft((level, msg, args, kwargs))
+                self.log_buffer.appendleft(
+                    (level, msg, args, kwargs, time(), get_ident()))
 
     @staticmethod
     def _log(level, msg, *args, **kwargs):
@@ -96,6 +110,19 @@ class InterestingLogRotator(metaclass=MCSingleton):
         msg = f"Was[{logging.getLevelName(level)}]: " + str(msg)
         log.warning(msg, *args, **kwargs)
 
+    def _log_buffered(self):
+        """
+        Writes out the buffered messages, with the time
+        and the thread they were logged at
+        """
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while self.log_buffer:
+            level, msg, args, kwargs, timestamp, ident = self.log_buffer.pop()
+            logged_at = datetime.fromtimestamp(timestamp).strftime(
+                "%H:%M:%S.%f")[:-3]
+            msg = f"{logged_at} {names.get(ident, ident)}: " + str(msg)
+            self._log(level, msg, *args, **kwargs)
+
     @staticmethod
     def trigger(by_what: str):
         """
@@ -114,9 +141,7 @@ class InterestingLogRotator(metaclass=MCSingleton):
         with self.log_lock:
             self.additional_messages_to_print = AFTERMATH_LOG_SIZE
             log.warning("Interesting log triggered by %s", by_what)
-            while self.log_buffer:
-                level, msg, args, kwargs = self.log_buffer.pop()
-                self._log(level, msg, *args, **kwargs)
+            self._log_buffered()
 
             log.warning("Repeat - triggered by %s", by_what)
             log.warning("Listing all threads with stack traces for debugging")
@@ -180,8 +205,8 @@ class InterestingLogger(Logger):
         documented in the Class docstring
         """
         if not self.is_skipped():
-            self.log_rotator.process_log_entry(self.isEnabledFor(DEBUG), DEBUG,
-                                               msg, *args, **kwargs)
+            self.log_rotator.process_log_entry(self, DEBUG, msg, args,
+                                               kwargs)
         super().debug(msg, *args, **kwargs)
 
     def info(self, msg, *args, **kwargs):
@@ -190,8 +215,8 @@ class InterestingLogger(Logger):
         documented in the Class docstring
         """
         if not self.is_skipped():
-            self.log_rotator.process_log_entry(self.isEnabledFor(INFO), INFO,
-                                               msg, *args, **kwargs)
+            self.log_rotator.process_log_entry(self, INFO, msg, args,
+                                               kwargs)
         super().info(msg, *args, **kwargs)
 
     def warning(self, msg, *args, **kwargs):
@@ -200,8 +225,8 @@ class InterestingLogger(Logger):
         documented in the Class docstring
         """
         if not self.is_skipped():
-            self.log_rotator.process_log_entry(self.isEnabledFor(WARNING),
-                                               WARNING, msg, *args, **kwargs)
+            self.log_rotator.process_log_entry(self, WARNING, msg, args,
+                                               kwargs)
         super().warning(msg, *args, **kwargs)
 
     def error(self, msg, *args, **kwargs):
@@ -210,8 +235,8 @@ class InterestingLogger(Logger):
         documented in the Class docstring
         """
         if not self.is_skipped():
-            self.log_rotator.process_log_entry(self.isEnabledFor(ERROR), ERROR,
-                                               msg, *args, **kwargs)
+            self.log_rotator.process_log_entry(self, ERROR, msg, args,
+                                               kwargs)
         super().error(msg, *args, **kwargs)
 
     def critical(self, msg, *args, **kwargs):
@@ -220,8 +245,8 @@ class InterestingLogger(Logger):
         documented in the Class docstring
         """
         if not self.is_skipped():
-            self.log_rotator.process_log_entry(self.isEnabledFor(CRITICAL),
-                                               CRITICAL, msg, *args, **kwargs)
+            self.log_rotator.process_log_entry(self, CRITICAL, msg, args,
+                                               kwargs)
         super().critical(msg, *args, **kwargs)
 
     def log(self, level, msg, *args, **kwargs):
@@ -230,6 +255,6 @@ class InterestingLogger(Logger):
         documented in the Class docstring
         """
         if not self.is_skipped():
-            self.log_rotator.process_log_entry(self.isEnabledFor(level), level,
-                                               msg, *args, **kwargs)
+            self.log_rotator.process_log_entry(self, level, msg, args,
+                                               kwargs)
         super().log(level, msg, *args, **kwargs)
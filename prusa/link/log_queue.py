@@ -0,0 +1,154 @@
+"""
+Implements the QueuedLogHandler - log records get written out by a
+listener thread, so the threads talking to the printer never wait for
+a slow syslog or a blocked stderr
+"""
+import logging
+import os
+from collections import Counter, deque
+from itertools import count
+from logging import DEBUG, Handler, LogRecord
+from logging.handlers import QueueHandler, QueueListener
+from queue import Queue
+from typing import Deque, List, Optional, Tuple
+
+from .const import LOG_FLUSH_TIMEOUT, LOG_QUEUE_SIZE
+
+
+class LogQueue(Queue):
+    """
+    A queue of log records, which never blocks the one putting them in
+
+    When full, the oldest debug record makes room for the new one.
+    With no debug records queued, a new debug record is dropped,
+    anything more important pushes out the oldest record.
+    Debug records wait in a queue of their own, so dropping one takes
+    the same short time however full the queue is. The records are
+    numbered to get them out in the order they came in.
+    """
+
+    def __init__(self, size: int):
+        super().__init__()
+        self.size = size
+        self.dropped: Counter = Counter()
+        self.dropped_total = 0
+
+    def _init(self, maxsize: int) -> None:
+        """Called by the Queue constructor"""
+        self.queue: Deque[Tuple[int, Optional[LogRecord]]] = deque()
+        self.debug: Deque[Tuple[int, Optional[LogRecord]]] = deque()
+        self.numbers = count()
+
+    def _qsize(self):
+        return len(self.queue) + len(self.debug)
+
+    def _put(self, item):
+        """Called with the queue mutex held"""
+        if item is not None and self._qsize() >= self.size:
+            if self.debug:
+                victim = self.debug.popleft()[1]
+            elif item.levelno <= DEBUG:
+                victim = item
+            else:
+                victim = self.queue.popleft()[1]
+            self.dropped[victim.levelname] += 1
+            self.dropped_total += 1
+            # put() counts the new record in, one of them is gone
+            self.unfinished_tasks -= 1
+            if victim is item:
+                return
+        entry = (next(self.numbers), item)
+        if item is not None and item.levelno <= DEBUG:
+            self.debug.append(entry)
+        else:
+            self.queue.append(entry)
+
+    def _get(self):
+        """Called with the queue mutex held, returns the oldest record"""
+        if self.debug and (not self.queue
+                           or self.debug[0][0] < self.queue[0][0]):
+            return self.debug.popleft()[1]
+        return self.queue.popleft()[1]
+
+    def records(self) -> List[Optional[LogRecord]]:
+        """The queued records in the order they will be handled"""
+        with self.mutex:
+            return [item for _, item in sorted((*self.queue, *self.debug),
+                                               key=lambda entry: entry[0])]
+
+
+class LogListener(QueueListener):
+    """Writes out the queued records, reports the dropped ones"""
+
+    queue: LogQueue
+
+    def __init__(self, queue: LogQueue, *handlers: Handler):
+        super().__init__(queue, *handlers, respect_handler_level=True)
+        self.reported: Counter = Counter()
+        self.reported_total = 0
+
+    def handle(self, record: LogRecord):
+        """Reports the records dropped since the last time, if any"""
+        if self.queue.dropped_total != self.reported_total:
+            with self.queue.mutex:
+                dropped = self.queue.dropped - self.reported
+                self.reported_total = self.queue.dropped_total
+            self.reported.update(dropped)
+            super().handle(logging.makeLogRecord(dict(
+                name=__name__, levelno=logging.WARNING, levelname="WARNING",
+                msg="Logging fell behind, dropped %s",
+                args=(dict(dropped),))))
+        super().handle(record)
+
+    def stop(self, timeout: Optional[float] = LOG_FLUSH_TIMEOUT):
+        """Writes out the queued records and stops, a stuck handler
+        makes it give up after the timeout"""
+        if self._thread is None:
+            return
+        self.enqueue_sentinel()
+        self._thread.join(timeout)
+        self._thread = None
+
+
+class QueuedLogHandler(QueueHandler):
+    """
+    Puts the records to a bounded queue, the handlers get them
+    from a listener thread
+    """
+
+    queue: LogQueue
+
+    def __init__(self, *handlers: Handler, size: int = LOG_QUEUE_SIZE):
+        self.size = size
+        super().__init__(LogQueue(size))
+        self.handlers = handlers
+        self.listener = LogListener(self.queue, *handlers)
+        self.pid = os.getpid()
+
+    @property
+    def dropped(self) -> Counter:
+        """The dropped record counts by the level name"""
+        return self.queue.dropped
+
+    def start(self):
+        """
+        Starts the listener. After a fork, the listener thread is not
+        there anymore, so a new one gets started with a new queue
+        """
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            queue = LogQueue(self.size)
+            for record in self.queue.records():
+                queue.put_nowait(record)
+            queue.dropped = self.queue.dropped
+            queue.dropped_total = self.queue.dropped_total
+            self.queue = queue
+            self.listener = LogListener(queue, *self.handlers)
+        if self.listener._thread is None:  # pylint: disable=protected-access
+            self.listener.start()
+
+    def close(self):
+        """Writes out the queued records before closing"""
+        if self.pid == os.getpid():
+            self.listener.stop()
+        super().close()
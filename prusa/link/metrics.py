@@ -0,0 +1,279 @@
+"""
+Contains implementation of the metrics registry - counters, gauges and
+histograms exposed in the Prometheus text format
+
+Counting happens on the hot paths, so nothing there takes a lock. Every
+thread adds to its own cell and the cells get summed up on a scrape only.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from math import isinf, isnan
+from threading import Lock, get_ident
+from time import monotonic
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+Sample = Tuple[str, Tuple[Tuple[str, str], ...], float]
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0)
+
+
+def format_value(value: float) -> str:
+    """Formats a sample value the way Prometheus expects it"""
+    if isnan(value):
+        return "NaN"
+    if isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    """Formats the label names and values as {name="value",...}"""
+    if not labels:
+        return ""
+    return "{" + ",".join(
+        f'{name}="{escape(value)}"' for name, value in labels) + "}"
+
+
+def escape(value: str) -> str:
+    """Escapes a label value"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n") \
+        .replace('"', '\\"')
+
+
+class Cells:
+    """Per thread cells of numbers, only their own thread writes into them"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.cells: Dict[int, List[float]] = {}
+
+    def own(self) -> List[float]:
+        """The cell of the current thread"""
+        ident = get_ident()
+        cell = self.cells.get(ident)
+        if cell is None:
+            cell = self.cells[ident] = [0.0] * self.size
+        return cell
+
+    def sums(self) -> List[float]:
+        """The cells summed up"""
+        sums = [0.0] * self.size
+        for cell in list(self.cells.values()):
+            for i, value in enumerate(cell):
+                sums[i] += value
+        return sums
+
+
+class CounterValue:
+    """A number, which only goes up"""
+
+    def __init__(self):
+        self.cells = Cells(1)
+
+    def inc(self, amount: float = 1.0):
+        """Adds the amount"""
+        self.cells.own()[0] += amount
+
+    def samples(self, name: str) -> Iterator[Sample]:
+        """The samples - a name, extra labels and a value"""
+        yield name, (), self.cells.sums()[0]
+
+
+class GaugeValue:
+    """A number, which can go up and down, or gets read by a function"""
+
+    def __init__(self):
+        self.value = 0.0
+        self.function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float):
+        """Sets the value"""
+        self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        """The value gets read by the function on every scrape"""
+        self.function = function
+
+    def samples(self, name: str) -> Iterator[Sample]:
+        """The samples - a name, extra labels and a value"""
+        if self.function is not None:
+            yield name, (), float(self.function())
+        else:
+            yield name, (), self.value
+
+
+class HistogramValue:
+    """Counts the observed values into fixed buckets"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        # A count for each bucket, one for +Inf, then the sum and the count
+        self.cells = Cells(len(self.buckets) + 3)
+
+    def observe(self, value: float):
+        """Counts the value into its bucket"""
+        cell = self.cells.own()
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    @contextmanager
+    def time(self):
+        """Observes how long the with block took in seconds"""
+        started_at = monotonic()
+        try:
+            yield
+        finally:
+            self.observe(monotonic() - started_at)
+
+    def samples(self, name: str) -> Iterator[Sample]:
+        """The samples - a name, extra labels and a value"""
+        sums = self.cells.sums()
+        cumulative = 0.0
+        for bound, count in zip(self.buckets + (float("inf"),), sums):
+            cumulative += count
+            yield f"{name}_bucket", (("le", format_value(bound)),), cumulative
+        yield f"{name}_sum", (), sums[-2]
+        yield f"{name}_count", (), sums[-1]
+
+
+class Metric:
+    """
+    A named metric with a value for every combination of its labels.
+    Without labels, it can be used as its only value directly
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str,
+                 labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.values: Dict[Tuple[str, ...], object] = {}
+        if not self.label_names:
+            self.labels()
+
+    def _new_value(self):
+        """Makes a value for a new combination of labels"""
+        raise NotImplementedError()
+
+    def labels(self, *values: str):
+        """Returns the value for the label values"""
+        value = self.values.get(values)
+        if value is None:
+            if len(values) != len(self.label_names):
+                raise ValueError(f"{self.name} has labels "
+                                 f"{self.label_names}, got {values}")
+            value = self.values.setdefault(values, self._new_value())
+        return value
+
+    def expose(self) -> str:
+        """The metric in the Prometheus text format"""
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} {self.kind}"]
+        for label_values, value in sorted(list(self.values.items())):
+            labels = tuple(zip(self.label_names, label_values))
+            for name, extra, sample in value.samples(self.name):
+                lines.append(f"{name}{format_labels(labels + extra)} "
+                             f"{format_value(sample)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    """Counts things, like lines read or resends"""
+
+    kind = "counter"
+
+    def _new_value(self):
+        return CounterValue()
+
+    def inc(self, amount: float = 1.0):
+        """Adds the amount to the counter without labels"""
+        self.labels().inc(amount)
+
+
+class Gauge(Metric):
+    """Current values, like a threshold"""
+
+    kind = "gauge"
+
+    def _new_value(self):
+        return GaugeValue()
+
+    def set(self, value: float):
+        """Sets the gauge without labels"""
+        self.labels().set(value)
+
+    def set_function(self, function: Callable[[], float]):
+        """Reads the gauge without labels by the function"""
+        self.labels().set_function(function)
+
+
+class Histogram(Metric):
+    """Distributions of values, like latencies"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str,
+                 labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        super().__init__(name, documentation, labels)
+
+    def _new_value(self):
+        return HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        """Observes a value of the histogram without labels"""
+        self.labels().observe(value)
+
+    def time(self):
+        """Observes the duration of a with block"""
+        return self.labels().time()
+
+
+class Registry:
+    """Keeps the metrics by their names"""
+
+    def __init__(self):
+        self.lock = Lock()
+        self.metrics: Dict[str, Metric] = {}
+
+    def _get(self, cls, name, *args, **kwargs):
+        """Returns the metric of the name, registers it if it's new"""
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, documentation: str,
+                labels: Sequence[str] = ()) -> Counter:
+        """Returns the counter of the name"""
+        return self._get(Counter, name, documentation, labels)
+
+    def gauge(self, name: str, documentation: str,
+              labels: Sequence[str] = ()) -> Gauge:
+        """Returns the gauge of the name"""
+        return self._get(Gauge, name, documentation, labels)
+
+    def histogram(self, name: str, documentation: str,
+                  labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Returns the histogram of the name"""
+        return self._get(Histogram, name, documentation, labels, buckets)
+
+    def expose(self) -> str:
+        """All the metrics in the Prometheus text format"""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda m: m.name)
+        return "".join(metric.expose() for metric in metrics)
+
+
+registry = Registry()
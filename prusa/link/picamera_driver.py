@@ -1,12 +1,15 @@
 """Contains implementation of a driver for Rpi Cameras"""
 import logging
+from copy import deepcopy
+from glob import glob
 from io import BytesIO
 from time import sleep
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 from prusa.connect.printer.camera import Resolution
-from prusa.connect.printer.camera_driver import CameraDriver
 from prusa.connect.printer.const import CapabilityType, NotSupported
+from .camera_workers import WorkerCameraDriver
+from .device_cache import nodes_key
 from .util import is_potato_cpu
 
 log = logging.getLogger(__name__)
@@ -21,15 +24,32 @@ except ImportError:
             raise NotSupported("No Pi Camera support")
 
 
-class PiCameraDriver(CameraDriver):
+class PiCameraDriver(WorkerCameraDriver):
     """Linux V4L2 USB webcam driver"""
 
     name = "PiCamera"
     REQUIRES_SETTINGS: Dict[str, str] = {}
 
+    # Instancing Picamera2 is expensive, don't, until a device changes
+    _scanned_nodes: Optional[Tuple] = None
+    _scanned: Dict[str, Dict[str, str]] = {}
+
+    @classmethod
+    def _scan(cls):
+        """Report the pi camera if it is connected"""
+        nodes = nodes_key(glob("/dev/video*") + glob("/dev/media*"))
+        if nodes != cls._scanned_nodes:
+            available = cls._scan_picamera()
+            if available is None:
+                return {}
+            cls._scanned = available
+            cls._scanned_nodes = nodes
+        return deepcopy(cls._scanned)
+
     @staticmethod
-    def _scan():
-        """Report the pi camera i it is connected"""
+    def _scan_picamera():
+        """Instances Picamera2 to find out which camera is connected,
+        returns None if it's not clear"""
         available = {}
         try:
             picam2 = Picamera2()
@@ -39,6 +59,7 @@ class PiCameraDriver(CameraDriver):
             log.info("No picamera connected or worse. Error: %s", error)
         except Exception:  # pylint: disable=broad-except
             log.exception("Error scanning for PiCameras")
+            return None
         else:
             model = picam2.camera_properties.get("Model", "unknown")
             camera_id = f"picamera {model}"
@@ -99,6 +120,7 @@ class PiCameraDriver(CameraDriver):
 
     def disconnect(self):
         """Disconnects from the Raspi Camera"""
+        self.stop_worker()
         if not is_potato_cpu():
             self.picam2.stop()
         self.picam2.close()
@@ -32,6 +32,14 @@ class Command:
     """
     # pylint: disable=too-many-instance-attributes
     command_name = "command"
+    # Lower goes first in the command queue
+    priority = 1
+    # Gets stopped, when a command of a higher priority is enqueued
+    preemptible = False
+    # When queued already, the callers get the result of the queued one
+    coalesce = False
+    # Needs the printer, which is not available while copying onto the SD
+    refused_while_copying = False
 
     def __init__(self, command_id=None, source=Source.CONNECT) -> None:
         self.serial_queue: MonitoredSerialQueue = \
@@ -92,6 +100,9 @@ class Command:
         """
         Encapsulates the run command, provides default data for returning
         """
+        if self.refused_while_copying and self.model.sd_copier.copying:
+            self.failed(f"Can't {self.command_name} while copying a file "
+                        f"to the SD card")
         data = self._run_command()
         default_data = dict(source=self.source)
         if data is not None:
@@ -102,6 +113,14 @@ class Command:
     def _run_command(self):
         """Put implementation here"""
 
+    def cancels(self, other: "Command") -> bool:
+        """
+        Does this command make the other one, still queued, go against
+        what the user wants? The other one gets dropped then
+        """
+        # pylint: disable=unused-argument
+        return False
+
     def stop(self):
         """Stops the command"""
         self.running = False
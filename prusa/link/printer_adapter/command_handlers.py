@@ -21,6 +21,7 @@ from ..serial.helpers import enqueue_instruction, enqueue_list_from_str
 from ..util import file_is_on_sd, round_to_five
 from .command import Command
 from .state_manager import StateChange
+from .structures.growing_file import GrowingFile
 from .structures.model_classes import JobState
 from .structures.regular_expressions import (OPEN_RESULT_REGEX,
                                              PRINTER_BOOT_REGEX,
@@ -32,6 +33,8 @@ log = logging.getLogger(__name__)
 class TryUntilState(Command):
     """A base for commands stop, pause and resume print"""
     command_name = "pause/stop/resume print"
+    preemptible = True
+    coalesce = True
 
     def __init__(self, command_id=None, source=Source.CONNECT):
         """
@@ -103,6 +106,11 @@ class TryUntilState(Command):
 class StopPrint(TryUntilState):
     """Class for stopping a print"""
     command_name = "stop print"
+    priority = 0
+
+    def cancels(self, other: Command) -> bool:
+        """Starting or resuming the print would undo this"""
+        return isinstance(other, (StartPrint, ResumePrint))
 
     def _run_command(self):
         """
@@ -123,6 +131,11 @@ class StopPrint(TryUntilState):
 class PausePrint(TryUntilState):
     """Class for pausing a running print"""
     command_name = "pause print"
+    priority = 0
+
+    def cancels(self, other: Command) -> bool:
+        """Starting or resuming the print would undo this"""
+        return isinstance(other, (StartPrint, ResumePrint))
 
     def _run_command(self):
         """If a print is in progress, pauses it.
@@ -162,10 +175,19 @@ class ResumePrint(TryUntilState):
 class StartPrint(Command):
     """Class for starting a print from a given path"""
     command_name = "start print"
+    refused_while_copying = True
 
-    def __init__(self, path: str, **kwargs):
+    def __init__(self,
+                 path: str,
+                 stream: Optional[GrowingFile] = None,
+                 **kwargs):
+        """
+        :param path: the connect path of the file to print
+        :param stream: the file being received, if it's still in transfer
+        """
         super().__init__(**kwargs)
         self.path_string = path
+        self.stream = stream
 
     def _run_command(self):
         """
@@ -185,6 +207,13 @@ class StartPrint(Command):
             self.failed(f"Cannot print in "
                         f"{self.state_manager.get_state()} state.")
             return
+
+        # The cached listing could be of another card
+        if file_is_on_sd(Path(self.path_string).parts) \
+                and not self.model.sd_card.confirmed:
+            self.failed("The SD card has not been listed yet")
+            return
+
         self.state_manager.expect_change(
             StateChange(to_states={State.PRINTING: self.source},
                         command_id=self.command_id))
@@ -204,6 +233,8 @@ class StartPrint(Command):
 
             self._load_file(short_path)
             self._start_print()
+        elif self.stream is not None:
+            self.file_printer.print(self.stream.path, stream=self.stream)
         else:
             if self.printer.fs.get(self.path_string) is None:
                 self.failed(f"The file at {self.path_string} does not exist.")
@@ -244,6 +275,7 @@ class StartPrint(Command):
 class ExecuteGcode(Command):
     """Class for executing an arbitrary gcode or gcode list"""
     command_name = "execute_gcode"
+    refused_while_copying = True
 
     def __init__(self, gcode, force=False, **kwargs):
         """
@@ -312,6 +344,7 @@ class ExecuteGcode(Command):
 
 class FilamentCommand(Command):
     """The shared code for Loading and Unloading of filament"""
+    refused_while_copying = True
 
     def __init__(self, parameters: Optional[Dict], **kwargs):
         super().__init__(**kwargs)
@@ -439,6 +472,7 @@ class ResetPrinter(Command):
 class JobInfo(Command):
     """Class for sending/getting the job info"""
     command_name = "job_info"
+    coalesce = True
 
     def _run_command(self):
         """Returns job_info from the job component"""
@@ -470,6 +504,7 @@ class JobInfo(Command):
 class SetReady(Command):
     """Class for setting the printer into READY"""
     command_name = "set_ready"
+    coalesce = True
 
     def _run_command(self):
         """Sets the printer into ready, if it's IDLE"""
@@ -485,6 +520,7 @@ class SetReady(Command):
 class CancelReady(Command):
     """Class for setting the printer into READY"""
     command_name = "cancel_ready"
+    coalesce = True
 
     def _run_command(self):
         """Cancels the READY state"""
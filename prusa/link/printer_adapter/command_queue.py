@@ -1,14 +1,25 @@
 """
 Implements the CommandQueue with CommandAdapter class, the objects of
 withch are the queue members
+
+Enqueuing a command returns a future of its result, which the caller can
+wait for, or poll. Commands of a higher priority (a lower number) get
+ahead in the queue, and can stop a preemptible command being run.
+Getting ahead must not reverse what the user asked for, so the queued
+commands, which the new one cancels, fail right away.
 """
 
 import logging
-from queue import Empty, Queue
-from threading import Event, RLock
-from typing import Any, Dict, Optional
-
-from ..const import QUIT_INTERVAL
+from collections import OrderedDict
+from concurrent.futures import Future
+from copy import copy
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from itertools import count
+from queue import Empty, PriorityQueue
+from threading import RLock
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from ..const import COMMAND_RESULTS_KEPT, QUIT_INTERVAL
 from .command import Command, CommandFailed
 from .telemetry_passer import TelemetryPasser
 from .updatable import Thread, prctl_name
@@ -19,15 +30,27 @@ log = logging.getLogger(__name__)
 CommandResult = Dict[str, Any]
 
 
-class CommandAdapter:
-    """Adapts the command class for processing in a queue"""
+class CommandAdapter(Future):
+    """Adapts the command class for processing in a queue, it's the future
+    of the command result"""
 
-    # pylint: disable=too-few-public-methods
-    def __init__(self, command) -> None:
-        self.processed = Event()
-        self.data: CommandResult = {}
-        self.exception: Optional[Exception] = None
+    def __init__(self, command: Command, number: int) -> None:
+        super().__init__()
         self.command: Command = command
+        self.number = number
+
+    def status(self) -> Dict[str, Any]:
+        """The state of the command, its result or error when done"""
+        status: Dict[str, Any] = dict(id=self.number,
+                                      command=self.command.command_name)
+        if not self.done():
+            status["state"] = "RUNNING" if self.running() else "QUEUED"
+        elif self.exception() is not None:
+            status["state"] = "FAILED"
+            status["error"] = str(self.exception())
+        else:
+            status["state"] = "FINISHED"
+        return status
 
 
 class CommandQueue:
@@ -38,12 +61,18 @@ class CommandQueue:
 
     def __init__(self) -> None:
         self.running = False
-        self.command_queue: Queue[CommandAdapter] = Queue()
+        self.command_queue: PriorityQueue[Tuple[int, int, CommandAdapter]] = \
+            PriorityQueue()
         self.current_command_adapter: Optional[CommandAdapter] = None
         self.runner_thread = Thread(target=self.process_queue,
                                     name="command_queue",
                                     daemon=True)
         self.enqueue_lock = RLock()
+        self.numbers = count(1)
+        # Queued commands, which can be done once for many callers
+        self.coalescing: Dict[Hashable, CommandAdapter] = {}
+        # The recent commands by their numbers, for polling their state
+        self.recent: OrderedDict[int, CommandAdapter] = OrderedDict()
 
     def start(self) -> None:
         """Start the command processing"""
@@ -55,65 +84,144 @@ class CommandQueue:
         self.running = False
         self._stop_current()
 
+    @staticmethod
+    def _coalesce_key(command: Command) -> Optional[Hashable]:
+        """
+        Commands with the same key do the same, None never coalesces.
+        Commands for different callers, like the Connect ones with their
+        own command ids, don't, their results can differ
+        """
+        if not command.coalesce:
+            return None
+        return type(command), command.source, command.command_id
+
     def enqueue_command(self, command: Command) -> CommandAdapter:
         """
         Ask for a command to be processed
         :param command: The command to be processed
+        :return: the future of the command result. If the same command
+            is already queued, the future of that one
         """
         with self.enqueue_lock:
-            adapter = CommandAdapter(command)
-            self.command_queue.put(adapter)
+            key = self._coalesce_key(command)
+            if key is not None and key in self.coalescing:
+                log.debug("%s is already queued", command.command_name)
+                return self.coalescing[key]
+            adapter = CommandAdapter(command, next(self.numbers))
+            if key is not None:
+                self.coalescing[key] = adapter
+            self.recent[adapter.number] = adapter
+            while len(self.recent) > COMMAND_RESULTS_KEPT:
+                self.recent.popitem(last=False)
+            self._cancel_queued(command)
+            self.command_queue.put(
+                (command.priority, adapter.number, adapter))
+            self._preempt(command)
             return adapter
 
-    def do_command(self, command: Command):
+    def submit(self, command: Command) -> CommandAdapter:
         """
-        Block until the command gets processed, pass what it returns
-        :param command: The command to be processed
+        Enqueue a command on behalf of a user, without waiting for it
+        :return: the future of the command result
         """
         TelemetryPasser.get_instance().activity_observed()
 
         if not self.running:
             log.warning("Don't wait for commands enqueued in a non-"
                         "running command queue")
+        return self.enqueue_command(command)
+
+    def get_command(self, number: int) -> Optional[CommandAdapter]:
+        """Returns one of the recent commands by its number"""
+        return self.recent.get(number)
 
-        adapter = self.enqueue_command(command)
+    def do_command(self, command: Command):
+        """
+        Block until the command gets processed, pass what it returns
+        :param command: The command to be processed
+        """
+        return self.wait_for(self.submit(command))
+
+    def wait_for(self, adapter: CommandAdapter):
+        """
+        Block until the enqueued command gets processed,
+        pass what it returns - a copy, the result can have more callers
+        """
         while self.running:
-            if adapter.processed.wait(QUIT_INTERVAL):
-                break
-        if adapter.exception is not None:
-            raise adapter.exception  # pylint: disable=raising-bad-type
-        if not adapter.processed.is_set():
-            log.warning("Unprocessed command %s!", adapter.command)
-            raise CommandFailed("Command has not been processed because "
-                                "PrusaLink is stopping or in an error state")
-        return adapter.data
+            try:
+                return copy(adapter.result(QUIT_INTERVAL))
+            except FutureTimeoutError:
+                continue
+        log.warning("Unprocessed command %s!", adapter.command)
+        raise CommandFailed("Command has not been processed because "
+                            "PrusaLink is stopping or in an error state")
 
     def force_command(self, command: Command):
         """Drops everything and does the supplied command"""
         with self.enqueue_lock:
             self.clear_queue()
-            return self.do_command(command)
+            adapter = self.submit(command)
+        return self.wait_for(adapter)
 
     def process_queue(self) -> None:
         """
         Runs until stopped, processes commands in queue, writes outputs
-        into a dict
+        into their futures
         """
         prctl_name()
         while self.running:
             try:
-                adapter: CommandAdapter = self.command_queue.get(
-                    timeout=QUIT_INTERVAL)
+                _, _, adapter = self.command_queue.get(timeout=QUIT_INTERVAL)
             except Empty:
                 continue
 
-            try:
+            with self.enqueue_lock:
+                self._forget_coalescing(adapter)
+                # Cancelled while queued
+                if adapter.done() \
+                        or not adapter.set_running_or_notify_cancel():
+                    continue
                 self.current_command_adapter = adapter
-                adapter.data = adapter.command.run_command()
+
+            try:
+                data = adapter.command.run_command()
             except Exception as exception:  # pylint: disable=broad-except
                 # Don't forget to pass exceptions as well as values
-                adapter.exception = exception
-            adapter.processed.set()
+                adapter.set_exception(exception)
+            else:
+                adapter.set_result(data)
+            finally:
+                self.current_command_adapter = None
+
+    def _forget_coalescing(self, adapter: CommandAdapter):
+        """The adapter is not queued anymore, the same command will
+        have to be done again"""
+        key = self._coalesce_key(adapter.command)
+        if key is not None and self.coalescing.get(key) is adapter:
+            del self.coalescing[key]
+
+    def _cancel_queued(self, command: Command):
+        """Fails the queued commands, which the new one cancels"""
+        with self.command_queue.mutex:
+            queued = [adapter for _, _, adapter in self.command_queue.queue]
+        for adapter in queued:
+            if adapter.done() or not command.cancels(adapter.command):
+                continue
+            log.debug("%s cancels the queued %s", command.command_name,
+                      adapter.command.command_name)
+            self._forget_coalescing(adapter)
+            if adapter.set_running_or_notify_cancel():
+                adapter.set_exception(CommandFailed(
+                    f"Cancelled by {command.command_name}"))
+
+    def _preempt(self, command: Command):
+        """Stops the current command, if the new one is more important"""
+        current = self.current_command_adapter
+        if current is not None and current.command.preemptible \
+                and command.priority < current.command.priority:
+            log.debug("%s preempts %s", command.command_name,
+                      current.command.command_name)
+            current.command.stop()
 
     def _stop_current(self):
         """Stops current command, if there is any"""
@@ -125,5 +233,11 @@ class CommandQueue:
         with self.enqueue_lock:
             self._stop_current()
             while not self.command_queue.empty():
-                adapter = self.command_queue.get()
+                _, _, adapter = self.command_queue.get()
+                self._forget_coalescing(adapter)
                 adapter.command.stop()
+                if not adapter.done() \
+                        and adapter.set_running_or_notify_cancel():
+                    adapter.set_exception(
+                        CommandFailed("Command has been cleared from "
+                                      "the queue"))
@@ -16,6 +16,7 @@ from ..serial.serial_queue import SerialQueue
 from ..util import get_clean_path, get_gcode, get_print_stats_gcode
 from .model import Model
 from .print_stats import PrintStats
+from .structures.growing_file import GrowingFile, StreamAborted
 from .structures.mc_singleton import MCSingleton
 from .structures.module_data_classes import FilePrinterData
 from .structures.regular_expressions import (CANCEL_REGEX, POWER_PANIC_REGEX,
@@ -67,6 +68,8 @@ class FilePrinter(metaclass=MCSingleton):
                                        lambda sender, match: self.resume())
 
         self.thread: Optional[Thread] = None
+        # Set when printing a file that is still being transferred
+        self.stream: Optional[GrowingFile] = None
 
     def start(self) -> None:
         """Power panic is not yet implemented, sso this does nothing"""
@@ -93,12 +96,18 @@ class FilePrinter(metaclass=MCSingleton):
         if self.pp_exists:
             os.remove(self.data.pp_file_path)
 
-    def print(self, os_path: str) -> None:
-        """Starts a file print for the supplied path"""
+    def print(self,
+              os_path: str,
+              stream: Optional[GrowingFile] = None) -> None:
+        """
+        Starts a file print for the supplied path
+        :param stream: supply, if the file is still being transferred
+        """
         if self.data.printing:
             raise RuntimeError("Cannot print two things at once")
 
         self.data.file_path = os_path
+        self.stream = stream
         self.thread = Thread(target=self._print,
                              name="file_print",
                              daemon=True)
@@ -106,9 +115,40 @@ class FilePrinter(metaclass=MCSingleton):
         self.data.stopped_forcefully = False
         self.print_stats.start_time_segment()
         self.new_print_started_signal.send(self)
-        self.print_stats.track_new_print(self.data.file_path)
+        if stream is None:
+            self.print_stats.track_new_print(self.data.file_path)
+        else:
+            self.print_stats.track_new_stream(stream)
         self.thread.start()
 
+    def _open(self):
+        """Opens the file to print, unless it's already open as a stream"""
+        if self.stream is not None:
+            return self.stream
+        return open(self.data.file_path, "r", encoding='utf-8')
+
+    def _total_size(self) -> int:
+        """The size of the printed file, or the announced size of the
+        one being transferred"""
+        if self.stream is None:
+            return os.path.getsize(self.data.file_path)
+        return self.stream.size
+
+    def _readline(self, file):
+        """
+        Reads a line from the printed file, if the file is still being
+        transferred, waits for the line to arrive
+        """
+        if self.stream is None:
+            return file.readline()
+        try:
+            return self.stream.readline(lambda: self.data.printing)
+        except StreamAborted as exception:
+            log.error("Stopping the print of an incomplete file: %s",
+                      exception)
+            self.stop_print()
+            return ""
+
     def _print(self, from_line=0):
         """
         Parses and sends the gcode commands from the file to serial.
@@ -116,8 +156,8 @@ class FilePrinter(metaclass=MCSingleton):
         """
 
         prctl_name()
-        total_size = os.path.getsize(self.data.file_path)
-        with open(self.data.file_path, "r", encoding='utf-8') as file:
+        total_size = self._total_size()
+        with self._open() as file:
             # Reset the line counter, printing a new file
             self.serial_queue.reset_message_number()
 
@@ -125,7 +165,7 @@ class FilePrinter(metaclass=MCSingleton):
             self.data.enqueued.clear()
             line_index = 0
             while True:
-                line = file.readline()
+                line = self._readline(file)
 
                 # Recognise the end of the file
                 if line == "":
@@ -224,6 +264,19 @@ class FilePrinter(metaclass=MCSingleton):
 
             log.debug("%s confirmed", wait_for.message)
 
+    def print_at_risk(self) -> bool:
+        """
+        Is the serial print in danger of being starved?
+        It is, when few of the print lines are left waiting for their
+        confirmation and the printer planner is not fed
+        """
+        if not self.data.printing:
+            return False
+        waiting = sum(not instruction.is_confirmed()
+                      for instruction in tuple(self.data.enqueued))
+        return waiting < PRINT_QUEUE_SIZE // 2 \
+            and not self.serial_queue.is_planner_fed()
+
     def react_to_gcode(self, gcode):
         """
         Some gcodes need to be reacted to right after they get enqueued
@@ -272,7 +325,9 @@ class FilePrinter(metaclass=MCSingleton):
         divisibility, or just before the end of a file print
         """
         divisible = gcode_number % STATS_EVERY == 0
-        do_stats = not self.model.print_stats.has_inbuilt_stats
+        # The gcode count is unknown, while the file is being transferred
+        do_stats = not self.model.print_stats.has_inbuilt_stats \
+            and self.model.print_stats.total_gcode_count > 0
         print_ending = (
             gcode_number == self.model.print_stats.total_gcode_count -
             TAIL_COMMANDS)
@@ -7,10 +7,11 @@ from itertools import islice
 from pathlib import Path
 from threading import Lock
 from time import time
-from typing import Optional
+from typing import List, Optional, Tuple
 
 from blinker import Signal  # type: ignore
 from prusa.connect.printer.const import State
+from prusa.connect.printer.files import File
 
 from ...const import (MAX_FILENAME_LENGTH, SD_FILESCAN_INTERVAL, SD_INTERVAL,
                       SD_STORAGE_NAME, SFN_TO_LFN_EXTENSIONS)
@@ -28,6 +29,7 @@ from ..structures.regular_expressions import (CONFIRMATION_REGEX, LFN_CAPTURE,
                                               SD_EJECTED_REGEX,
                                               SD_PRESENT_REGEX)
 from ..updatable import ThreadedUpdatable
+from .sd_tree_cache import SDTreeCache, add_children, fingerprint, node_to_dict
 
 log = logging.getLogger(__name__)
 
@@ -52,6 +54,43 @@ def get_root():
     return SDFile(name=SD_STORAGE_NAME, is_dir=True, ro=True)
 
 
+# old path, new path, changed node
+TreeChange = Tuple[Optional[str], Optional[str], Optional[File]]
+
+
+def reconcile_tree(current: File, fresh: File,
+                   changes: List[TreeChange]) -> List[TreeChange]:
+    """
+    Changes the current tree to look like the fresh one, keeping the nodes
+    that did not change, so anyone holding the tree sees the changes.
+    Nodes of the fresh tree are moved, it cannot be used afterwards.
+
+    :return: the list of changes in the Connect FILE_CHANGED format
+    """
+    for name in list(current.children):
+        node = current.children[name]
+        fresh_node = fresh.children.get(name)
+        if fresh_node is None or fresh_node.is_dir != node.is_dir:
+            changes.append((node.abs_path(SD_STORAGE_NAME), None, None))
+            del current.children[name]
+
+    for name, fresh_node in fresh.children.items():
+        node = current.children.get(name)
+        if node is None:
+            fresh_node.parent = current
+            current.children[name] = fresh_node
+            path = fresh_node.abs_path(SD_STORAGE_NAME)
+            changes.append((None, path, fresh_node))
+        elif node.is_dir:
+            node.attrs = fresh_node.attrs
+            reconcile_tree(node, fresh_node, changes)
+        elif node.attrs != fresh_node.attrs:
+            node.attrs = fresh_node.attrs
+            path = node.abs_path(SD_STORAGE_NAME)
+            changes.append((path, path, node))
+    return changes
+
+
 class FileTreeParser:
     """
     Parses the file tree from a printer supplied format
@@ -181,6 +220,26 @@ class FileTreeParser:
         except FileNotFoundError as exception:
             log.exception(exception)
 
+    def to_dict(self):
+        """Serializes the parsed tree and path translations for caching"""
+        return {
+            "tree": node_to_dict(self.tree),
+            "lfn_to_sfn_paths": self.lfn_to_sfn_paths,
+            "sfn_to_lfn_paths": self.sfn_to_lfn_paths,
+            "mixed_to_lfn_paths": self.mixed_to_lfn_paths,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Creates the parsing result from the cached one"""
+        file_tree_parser = cls(matches=[])
+        add_children(file_tree_parser.tree, data["tree"]["children"])
+        file_tree_parser.lfn_to_sfn_paths = dict(data["lfn_to_sfn_paths"])
+        file_tree_parser.sfn_to_lfn_paths = dict(data["sfn_to_lfn_paths"])
+        file_tree_parser.mixed_to_lfn_paths = dict(
+            data["mixed_to_lfn_paths"])
+        return file_tree_parser
+
 
 class SDCard(ThreadedUpdatable):
     """
@@ -200,16 +259,26 @@ class SDCard(ThreadedUpdatable):
     The card removal could've gone unnoticed and the printer is telling
     us about an SD insertion. Let's tell connect the card got removed and go
     to the INITIALISING state
+
+    The last parsed listing is cached. An inserted card gets it right away,
+    as not confirmed - it can be of a different card. The fresh one from
+    the printer is then reconciled with it, or replaces it, if it's not
+    the same card. The periodic FlashAir re-scans are reconciled too, only
+    the changed files are reported.
     """
     thread_name = "sd_updater"
 
     # Cycle fast, but re-scan only on events or in big intervals
     update_interval = SD_INTERVAL
 
+    # pylint: disable=too-many-arguments
     def __init__(self, serial_queue: SerialQueue, serial_parser: SerialParser,
-                 state_manager: StateManager, model: Model):
+                 state_manager: StateManager, model: Model,
+                 tree_cache_path: Optional[str] = None):
 
         self.tree_updated_signal = Signal()  # kwargs: tree: FileTree
+        # kwargs: old_path: str, new_path: str, file: File
+        self.file_changed_signal = Signal()
         self.state_changed_signal = Signal()  # kwargs: sd_state: SDState
         self.sd_attached_signal = Signal()  # kwargs: files: SDFile
         self.sd_detached_signal = Signal()
@@ -231,9 +300,12 @@ class SDCard(ThreadedUpdatable):
                                         lfn_to_sfn_paths={},
                                         sfn_to_lfn_paths={},
                                         mixed_to_lfn_paths={},
+                                        fingerprint=None,
+                                        confirmed=False,
                                         is_flash_air=False)
         self.data = self.model.sd_card
         self.lock = Lock()
+        self.tree_cache = SDTreeCache(tree_cache_path)
 
         super().__init__()
 
@@ -282,14 +354,22 @@ class SDCard(ThreadedUpdatable):
         if self.data.sd_state == SDState.ABSENT:
             return
 
+        if self.data.sd_state == SDState.INITIALISING:
+            self._serve_cached()
+
         file_tree_parser = self._construct_file_tree()
 
         self.handle_special_menu(file_tree_parser)
+        listing = file_tree_parser.to_dict()
+        card_fingerprint = fingerprint(listing)
 
         to_decide_presence = False
 
         with self.lock:
-            self._set_files(file_tree_parser)
+            if self.data.sd_state == SDState.ABSENT:
+                return  # ejected while listing
+
+            changes = self._take_listing(file_tree_parser, card_fingerprint)
 
             if self.data.sd_state == SDState.UNSURE:
                 # The files are of type SDFile - the root is always present
@@ -304,14 +384,98 @@ class SDCard(ThreadedUpdatable):
             if self.data.sd_state == SDState.INITIALISING:
                 self._sd_state_changed(SDState.PRESENT)
 
+        if file_tree_parser.tree.children:
+            self.tree_cache.save(card_fingerprint, listing)
+
+        for old_path, new_path, node in changes:
+            self.file_changed_signal.send(self,
+                                          old_path=old_path,
+                                          new_path=new_path,
+                                          file=node)
+
         if to_decide_presence:
             self.decide_presence()
 
         self.tree_updated_signal.send(self, tree=self.data.files)
 
-    def _set_files(self, file_tree_parser: FileTreeParser):
-        """Sets the file variables according to the supplied parsing context"""
+    def _take_listing(self, file_tree_parser: FileTreeParser,
+                      card_fingerprint: str) -> List[TreeChange]:
+        """
+        Replaces the served files with the listing from the printer,
+        or only the changed ones, if the listed card is the served one
+        :return: the changed files to announce
+        """
+        if self.data.sd_state != SDState.PRESENT:
+            self._set_files(file_tree_parser, card_fingerprint)
+        elif card_fingerprint == self.data.fingerprint:
+            log.debug("SD card listing has not changed")
+            self.data.confirmed = True
+        elif self._same_card(file_tree_parser):
+            return self._reconcile(file_tree_parser, card_fingerprint)
+        else:
+            log.debug("A different SD card than the cached one")
+            self._sd_state_changed(SDState.INITIALISING)
+            self._set_files(file_tree_parser, card_fingerprint)
+        return []
+
+    def _serve_cached(self):
+        """
+        Serves the listing of the last seen card, until the fresh one
+        arrives from the printer
+        """
+        cached = self.tree_cache.last()
+        if cached is None:
+            return
+        card_fingerprint, listing = cached
+        try:
+            file_tree_parser = FileTreeParser.from_dict(listing)
+        except (KeyError, TypeError, ValueError, FileNotFoundError):
+            log.exception("Cached SD card listing is invalid")
+            return
+
+        with self.lock:
+            if self.data.sd_state != SDState.INITIALISING:
+                return
+            log.debug("Serving the cached SD card listing %s until "
+                      "confirmed", card_fingerprint)
+            self._set_files(file_tree_parser, card_fingerprint,
+                            confirmed=False)
+            self._sd_state_changed(SDState.PRESENT)
+
+    def _same_card(self, file_tree_parser: FileTreeParser):
+        """
+        Guesses, whether the listing is of the card we have the files of.
+        Files of the same card keep their short names, so at least half
+        of them should be shared.
+        """
+        current = set(self.data.sfn_to_lfn_paths)
+        fresh = set(file_tree_parser.sfn_to_lfn_paths)
+        return len(current & fresh) * 2 >= max(len(current), len(fresh))
+
+    def _reconcile(self, file_tree_parser: FileTreeParser,
+                   card_fingerprint: str) -> List[TreeChange]:
+        """
+        Updates only the changed entries of the current file tree
+        :return: what changed
+        """
+        assert self.lock.locked()
+        changes = reconcile_tree(self.data.files, file_tree_parser.tree, [])
+        log.debug("SD card listing reconciled, %d changes", len(changes))
+        file_tree_parser.tree = self.data.files
+        self._set_files(file_tree_parser, card_fingerprint)
+        return changes
+
+    def _set_files(self, file_tree_parser: FileTreeParser,
+                   card_fingerprint: Optional[str] = None,
+                   confirmed: bool = True):
+        """
+        Sets the file variables according to the supplied parsing context
+        :param confirmed: False for the cached files, not listed
+            by the printer yet
+        """
         assert self.lock.locked()
+        self.data.fingerprint = card_fingerprint
+        self.data.confirmed = confirmed
         self.data.files = file_tree_parser.tree
         # Try to be as atomic as possible
         self.data.lfn_to_sfn_paths = file_tree_parser.lfn_to_sfn_paths
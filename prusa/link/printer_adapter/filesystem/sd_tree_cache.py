@@ -0,0 +1,99 @@
+"""
+Contains implementation of the SDTreeCache class, which remembers the last
+parsed SD card listing, so it doesn't have to be awaited from the printer
+after every card insertion or PrusaLink restart
+"""
+import json
+import logging
+from hashlib import sha256
+from os import replace
+from typing import Any, Dict, Optional, Tuple
+
+from prusa.connect.printer.files import File
+
+log = logging.getLogger(__name__)
+
+
+def node_to_dict(node: File) -> Dict[str, Any]:
+    """Serializes the file tree node and its children"""
+    return {
+        "name": node.name,
+        "is_dir": node.is_dir,
+        "attrs": node.attrs,
+        "children": [node_to_dict(child) for child in node.children.values()],
+    }
+
+
+def add_children(node: File, children):
+    """Adds serialized children to the file tree node"""
+    for child in children:
+        added = node.add(name=child["name"],
+                         is_dir=child["is_dir"],
+                         **child["attrs"])
+        add_children(added, child["children"])
+
+
+def fingerprint(listing: Dict[str, Any]) -> str:
+    """
+    Returns the fingerprint of a serialized listing, a changed file
+    gives a different fingerprint
+    """
+    data = json.dumps(listing, sort_keys=True).encode()
+    return sha256(data).hexdigest()[:20]
+
+
+class SDTreeCache:
+    """
+    Keeps the last SD card listing in a file, it's used for a card insertion
+    before the printer sends a fresh listing.
+
+    The firmware does not tell us anything identifying the card before
+    listing it, so only the last listing is kept, it can be of a different
+    card than the inserted one
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.listing: Optional[Dict[str, Any]] = None
+        self.fingerprint: Optional[str] = None
+        self.load()
+
+    def load(self):
+        """Loads the cache file, if there is a valid one"""
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                listing = json.load(file)
+            if not isinstance(listing, dict) or "tree" not in listing:
+                raise ValueError("Not a listing")
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as exception:
+            log.warning("Ignoring invalid SD tree cache %s: %s", self.path,
+                        exception)
+            return
+        self.listing = listing
+        self.fingerprint = fingerprint(listing)
+
+    def last(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Returns the fingerprint and listing of the last seen card"""
+        if self.listing is None or self.fingerprint is None:
+            return None
+        return self.fingerprint, self.listing
+
+    def save(self, card_fingerprint: str, listing: Dict[str, Any]):
+        """Remembers the listing as the last seen one"""
+        if card_fingerprint == self.fingerprint:
+            return
+        self.listing = listing
+        self.fingerprint = card_fingerprint
+
+        if not self.path:
+            return
+        try:
+            with open(self.path + ".tmp", "w", encoding="utf-8") as file:
+                json.dump(listing, file)
+            replace(self.path + ".tmp", self.path)
+        except OSError as exception:
+            log.warning("Can't save the SD tree cache: %s", exception)
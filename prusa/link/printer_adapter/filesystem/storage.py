@@ -5,32 +5,28 @@ track of Linux and folder storage.
 import abc
 import logging
 import os
-import select
 from typing import List, Set
 
 from blinker import Signal  # type: ignore
 
 from ...config import Config
-from ...const import (BLACKLISTED_NAMES, BLACKLISTED_PATHS, BLACKLISTED_TYPES,
-                      DIR_RESCAN_INTERVAL, QUIT_INTERVAL)
+from ...const import BLACKLISTED_NAMES, BLACKLISTED_PATHS, BLACKLISTED_TYPES
 from ...util import ensure_directory, get_clean_path
 from ..model import Model
 from ..structures.module_data_classes import StorageData
-from ..updatable import ThreadedUpdatable
 
 log = logging.getLogger(__name__)
 
 
-class Storage(ThreadedUpdatable):
+class Storage:
     """
     This module is the base for modules tracking attaching and detaching
-    of storage
+    of storage. The StorageWatcher calls update() when something changes.
     """
 
     paths_to_storage: List[str] = []
 
     def __init__(self, model: Model):
-        super().__init__()
         self.model: Model = model
 
         self.attached_signal = Signal()  # kwargs = path: str
@@ -153,9 +149,6 @@ class FilesystemStorage(Storage):
     Responsible for reporting which valid linux storage was attached
     """
 
-    thread_name = "filesystem_storage_thread"
-    update_interval = 0  # The waiting is done in epoll timeout instead of here
-
     def __init__(self, model: Model, cfg: Config):
         FilesystemStorage.paths_to_storage = \
             list(cfg.printer.storage)
@@ -167,43 +160,34 @@ class FilesystemStorage(Storage):
         # Call this after initializing the data
         super().__init__(model)
 
-        # Force the update, even if no events are caught, we need to see
-        # which things are attached, before beginning to only observe changes
-        self.force_update = True
-
+        # The kernel marks this file with an exceptional condition
+        # on every mount change, which is what the watcher waits for
         # pylint: disable=consider-using-with
         self.mtab = open("/etc/mtab", "r", encoding='utf-8')
-        self.epoll_obj = select.epoll(1)
-        self.epoll_obj.register(self.mtab.fileno(), select.EPOLLOUT)
 
     def get_data_object(self) -> StorageData:
         return self.model.filesystem_storage
 
+    def fileno(self):
+        """The file descriptor to poll for mount changes"""
+        return self.mtab.fileno()
+
     def get_storage(self) -> Set[str]:
         """
-        Checks epoll for storage changes. if there are changes, gets
-        a new storage list from mtab.
-        If not, returns the current storage
+        Gets a new storage list from mtab.
+        Reading it also clears the mount change notification.
         """
-        # Non-empty epoll result means something regarding storage has changed
-        epoll_result = self.epoll_obj.poll(QUIT_INTERVAL)
-        if epoll_result or self.force_update:
-            self.force_update = False
-
-            self.mtab.seek(0)
-            new_storage_set: Set[str] = set()
-
-            line_list = self.mtab.readlines()
-            for line in line_list:
-                _name, string_path, fs_type, *_ = line.split(" ")
-                clean_path = get_clean_path(string_path)
-
-                if self.storage_belongs(clean_path, fs_type):
-                    new_storage_set.add(clean_path)
-            # If something changed, return the newly constructed dict
-            return new_storage_set
-        # Otherwise, return the same dict
-        return self.data.attached_set
+        self.mtab.seek(0)
+        new_storage_set: Set[str] = set()
+
+        line_list = self.mtab.readlines()
+        for line in line_list:
+            _name, string_path, fs_type, *_ = line.split(" ")
+            clean_path = get_clean_path(string_path)
+
+            if self.storage_belongs(clean_path, fs_type):
+                new_storage_set.add(clean_path)
+        return new_storage_set
 
     def storage_belongs(self, path, fs_type):
         """Checks if we are interested in tracking a given storage"""
@@ -211,9 +195,8 @@ class FilesystemStorage(Storage):
         type_valid = is_wanted and fs_type not in BLACKLISTED_TYPES
         return is_wanted and type_valid
 
-    def stop(self):
-        """Stops this component"""
-        super().stop()
+    def close(self):
+        """Closes the mtab file"""
         self.mtab.close()
 
 
@@ -237,9 +220,6 @@ class FolderStorage(Storage):
         for directory in self.data.configured_storage:
             ensure_directory(directory)
 
-    thread_name = "folder_storage_thread"
-    update_interval = DIR_RESCAN_INTERVAL
-
     def get_data_object(self) -> StorageData:
         """
         There need to be two different object for the two different storage
@@ -272,3 +252,17 @@ class FolderStorage(Storage):
         exists = os.path.exists(directory)
         readable = exists and os.access(directory, os.R_OK)
         return exists and readable
+
+    def watched_paths(self) -> Set[str]:
+        """
+        Returns the directories, in which the configured ones can appear,
+        disappear or change permissions - their closest existing parents
+        """
+        paths: Set[str] = set()
+        for directory in self.data.configured_storage:
+            parent = os.path.dirname(directory)
+            while not os.path.isdir(parent) \
+                    and parent != os.path.dirname(parent):
+                parent = os.path.dirname(parent)
+            paths.add(parent)
+        return paths
@@ -16,6 +16,7 @@ from ...serial.serial_queue import SerialQueue
 from ..state_manager import StateManager
 from .sd_card import SDCard
 from .storage import FilesystemStorage, FolderStorage
+from .storage_watcher import StorageWatcher
 
 log = logging.getLogger(__name__)
 
@@ -34,6 +35,8 @@ class StorageController:
         self.folder_detached_signal = Signal()
         self.sd_attached_signal = Signal()
         self.sd_detached_signal = Signal()
+        # kwargs: old_path: str, new_path: str, file: File
+        self.sd_file_changed_signal = Signal()
         self.menu_found_signal = Signal()
 
         self.serial_parser = serial_parser
@@ -42,9 +45,11 @@ class StorageController:
         self.model = model
 
         self.sd_card = SDCard(self.serial_queue, self.serial_parser,
-                              self.state_manager, self.model)
+                              self.state_manager, self.model,
+                              cfg.printer.sd_tree_cache)
         self.sd_card.sd_attached_signal.connect(self.sd_attached)
         self.sd_card.sd_detached_signal.connect(self.sd_detached)
+        self.sd_card.file_changed_signal.connect(self.sd_file_changed)
         self.sd_card.menu_found_signal.connect(self.menu_found)
 
         self.filesystem_storage = FilesystemStorage(self.model, cfg)
@@ -53,6 +58,8 @@ class StorageController:
         self.filesystem_storage.detached_signal.connect(self.folder_detached)
         self.folder_storage.attached_signal.connect(self.folder_attached)
         self.folder_storage.detached_signal.connect(self.folder_detached)
+        self.storage_watcher = StorageWatcher(self.filesystem_storage,
+                                              self.folder_storage)
 
         self.sd_tree: Optional[SDFile] = None
 
@@ -76,6 +83,19 @@ class StorageController:
         assert sender is not None
         self.sd_detached_signal.send(self)
 
+    def sd_file_changed(self, sender, old_path: Optional[str],
+                        new_path: Optional[str], file: Optional[File]):
+        """Signal pass-through"""
+        assert sender is not None
+        self.sd_file_changed_signal.send(self,
+                                         old_path=old_path,
+                                         new_path=new_path,
+                                         file=file)
+
+    def watch_files(self, get_file_handler):
+        """Lets the storage watcher handle the SDK file tree inotify too"""
+        self.storage_watcher.watch_files(get_file_handler)
+
     def menu_found(self, _, menu_sfn):
         """Secret menu has been found signal passthrough"""
         self.menu_found_signal.send(menu_sfn=menu_sfn)
@@ -89,17 +109,14 @@ class StorageController:
     def start(self):
         """Starts submodules"""
         self.sd_card.start()
-        self.filesystem_storage.start()
-        self.folder_storage.start()
+        self.storage_watcher.start()
 
     def stop(self):
         """Stops submodules"""
         self.sd_card.stop()
-        self.filesystem_storage.stop()
-        self.folder_storage.stop()
+        self.storage_watcher.stop()
 
     def wait_stopped(self):
         """SWait for storage submodules to quit"""
         self.sd_card.wait_stopped()
-        self.filesystem_storage.wait_stopped()
-        self.folder_storage.wait_stopped()
+        self.storage_watcher.wait_stopped()
@@ -0,0 +1,152 @@
+"""
+Contains implementation of the StorageWatcher class, the one thread waiting
+for any storage change
+"""
+import logging
+import os
+import select
+from threading import Event
+from typing import Any, Callable, Dict, Optional
+
+from inotify_simple import INotify, flags  # type: ignore
+
+from ..updatable import Thread, prctl_name
+from .storage import FilesystemStorage, FolderStorage
+
+log = logging.getLogger(__name__)
+
+FOLDER_FLAGS = (flags.CREATE | flags.DELETE | flags.MOVED_FROM
+                | flags.MOVED_TO | flags.ATTRIB | flags.DELETE_SELF
+                | flags.MOVE_SELF)
+
+
+class StorageWatcher:
+    """
+    Sleeps until something storage related changes, then updates the one
+    who cares. Watches:
+        - mount changes for the filesystem storage
+        - inotify events in parents of configured directories for
+          the folder storage
+        - inotify events of the SDK file tree handler, which changes
+          with every attach and detach
+    """
+
+    def __init__(self, filesystem_storage: FilesystemStorage,
+                 folder_storage: FolderStorage):
+        self.filesystem_storage = filesystem_storage
+        self.folder_storage = folder_storage
+
+        self.quit_evt = Event()
+        self.epoll = select.epoll()
+        self.wakeup_read, self.wakeup_write = os.pipe()
+        self.folder_inotify = INotify()
+        self.folder_watches: Dict[str, int] = {}
+
+        self.get_file_handler: Callable[[], Any] = lambda: None
+        self.file_handler: Optional[Any] = None
+
+        self.thread = Thread(target=self._watch, name="storage_watcher")
+
+    def watch_files(self, get_file_handler: Callable[[], Any]):
+        """
+        Sets up the source of the SDK inotify handler, which keeps the file
+        tree up to date. It's a callable as the handler gets replaced.
+        """
+        self.get_file_handler = get_file_handler
+        os.write(self.wakeup_write, b"\0")
+
+    def start(self):
+        """Start the watcher thread"""
+        self.thread.start()
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self.quit_evt.set()
+        os.write(self.wakeup_write, b"\0")
+
+    def wait_stopped(self):
+        """Wait for the watcher thread to quit"""
+        self.thread.join()
+
+    def _watch(self):
+        """The watching loop"""
+        prctl_name()
+        self.epoll.register(self.wakeup_read, select.EPOLLIN)
+        self.epoll.register(self.filesystem_storage.fileno(),
+                            select.EPOLLPRI | select.EPOLLERR)
+        self.epoll.register(self.folder_inotify.fileno(), select.EPOLLIN)
+
+        self._update_mounts()
+        try:
+            while not self.quit_evt.is_set():
+                self._follow_file_handler()
+                for fileno, _ in self.epoll.poll():
+                    self._handle(fileno)
+        finally:
+            self.epoll.close()
+            self.folder_inotify.close()
+            self.filesystem_storage.close()
+            os.close(self.wakeup_read)
+            os.close(self.wakeup_write)
+
+    def _handle(self, fileno):
+        """Handle an event on the file descriptor"""
+        try:
+            if fileno == self.wakeup_read:
+                os.read(self.wakeup_read, 64)
+            elif fileno == self.filesystem_storage.fileno():
+                log.debug("Mounts have changed")
+                self._update_mounts()
+            elif fileno == self.folder_inotify.fileno():
+                self._forget_removed_watches(self.folder_inotify.read(0))
+                self._update_folders()
+            elif self.file_handler is not None:
+                self.file_handler()
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Unhandled exception while watching storage")
+
+    def _update_mounts(self):
+        """Mounts can make configured directories appear too"""
+        self.filesystem_storage.update()
+        self._update_folders()
+
+    def _update_folders(self):
+        """Update the folder storage, watch where its directories are"""
+        self.folder_storage.update()
+
+        wanted = self.folder_storage.watched_paths()
+        for path in set(self.folder_watches) - wanted:
+            try:
+                self.folder_inotify.rm_watch(self.folder_watches.pop(path))
+            except OSError:
+                pass  # the directory is gone and so is its watch
+        for path in wanted - set(self.folder_watches):
+            try:
+                self.folder_watches[path] = self.folder_inotify.add_watch(
+                    path, FOLDER_FLAGS)
+            except OSError:
+                log.warning("Cannot watch %s for storage changes", path)
+
+    def _forget_removed_watches(self, events):
+        """Watches of deleted directories are removed by the kernel"""
+        removed = {event.wd for event in events if event.mask & flags.IGNORED}
+        for path, watch in list(self.folder_watches.items()):
+            if watch in removed:
+                del self.folder_watches[path]
+
+    def _follow_file_handler(self):
+        """Register the current SDK inotify handler if it got replaced"""
+        file_handler = self.get_file_handler()
+        if file_handler is self.file_handler:
+            return
+        # Keep the old handler referenced until it's unregistered,
+        # so its file descriptor can't be reused in the meantime
+        if self.file_handler is not None:
+            try:
+                self.epoll.unregister(self.file_handler.inotify.fileno())
+            except (OSError, ValueError):
+                pass  # already closed
+        if file_handler is not None:
+            self.epoll.register(file_handler.inotify.fileno(),
+                                select.EPOLLIN)
+        self.file_handler = file_handler
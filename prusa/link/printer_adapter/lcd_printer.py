@@ -24,6 +24,8 @@ from ..const import (FW_MESSAGE_TIMEOUT, PRINTING_STATES, QUIT_INTERVAL,
 from ..serial.helpers import enqueue_instruction, wait_for_instruction
 from ..serial.serial_parser import SerialParser
 from ..serial.serial_queue import SerialQueue
+from .file_printer import FilePrinter
+from .lcd_scheduler import LCDScheduler
 from .model import Model
 from .structures.carousel import Carousel, LCDLine, Screen
 from .structures.mc_singleton import MCSingleton
@@ -95,12 +97,14 @@ class LCDPrinter(metaclass=MCSingleton):
 
     # pylint: disable=too-many-arguments
     def __init__(self, serial_queue: SerialQueue, serial_parser: SerialParser,
-                 model: Model, settings: Settings, printer: Printer):
+                 model: Model, settings: Settings, printer: Printer,
+                 file_printer: FilePrinter):
         self.serial_queue: SerialQueue = serial_queue
         self.serial_parser: SerialParser = serial_parser
         self.model: Model = model
         self.settings: Settings = settings
         self.printer: Printer = printer
+        self.scheduler = LCDScheduler(file_printer)
 
         self.event_queue: Queue[Callable[[], None]] = Queue()
 
@@ -113,7 +117,7 @@ class LCDPrinter(metaclass=MCSingleton):
         self.print_screen = Screen(order=1)
         self.wizard_screen = Screen(chime_gcode=WELCOME_CHIME)
         self.wait_screen = Screen(resets_idle=False)
-        self.error_screen = Screen(chime_gcode=ERROR_CHIME)
+        self.error_screen = Screen(chime_gcode=ERROR_CHIME, urgent=True)
         self.upload_screen = Screen(chime_gcode=UPLOAD_CHIME)
         self.ready_screen = Screen(resets_idle=False)
         self.idle_screen = Screen(resets_idle=False)
@@ -184,6 +188,7 @@ class LCDPrinter(metaclass=MCSingleton):
             self.ignore -= 1
         else:
             self._reset_idle()
+            self.scheduler.forget()
             self.fw_msg_end_at = time() + FW_MESSAGE_TIMEOUT
             self.add_event(self.carousel.set_rewind)
 
@@ -454,16 +459,20 @@ class LCDPrinter(metaclass=MCSingleton):
     def _print(self, line: LCDLine, to_wait=None):
         """
         Sends the given message using M117 gcode and waits for its
-        confirmation
+        confirmation. Unless the scheduler says it's not worth sending,
+        then the line just takes its time
 
         :param line: Text to be shown in the status portion of the printer LCD
         """
         if line.resets_idle:
             self._reset_idle()
         ascii_text = unidecode.unidecode(line.text)
+        gcode = f"M117 \x7E{ascii_text}"
+        if not self.scheduler.admit(line, gcode):
+            line.reset_end()
+            return
         self.ignore += 1
-        instruction = enqueue_instruction(self.serial_queue,
-                                          f"M117 \x7E{ascii_text}",
+        instruction = enqueue_instruction(self.serial_queue, gcode,
                                           to_front=True)
 
         # Play a sound accompanying the newly shown thing
@@ -492,7 +501,7 @@ class LCDPrinter(metaclass=MCSingleton):
         if not fast:
             time_out_at = time() + 5
             self.wait_stopped()
-            self._print(LCDLine("PrusaLink stopped"),
+            self._print(LCDLine("PrusaLink stopped", urgent=True),
                         lambda: time() < time_out_at)
 
     def wait_stopped(self):
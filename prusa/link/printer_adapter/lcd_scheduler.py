@@ -0,0 +1,71 @@
+"""
+Contains implementation of the LCDScheduler class
+
+LCD messages share the serial link with the print itself and go in front
+of it. While printing over serial, the cosmetic ones get only a small
+budget of the link, the urgent ones go through always.
+"""
+import logging
+from time import monotonic
+from typing import Optional
+
+from ..const import LCD_SERIAL_BUDGET, LCD_SERIAL_BURST
+from .file_printer import FilePrinter
+from .structures.carousel import LCDLine
+from .upload_scheduler import TokenBucket
+
+log = logging.getLogger(__name__)
+
+
+class LCDScheduler:
+    """
+    Decides which LCD lines are worth sending to the printer
+
+    A line same as the one on the display already is never sent again.
+    While printing over serial, the cosmetic lines are not sent at all
+    when the print is at risk of being starved, otherwise only as many
+    bytes per second as the budget allows. Scrolling screens show fewer
+    frames that way, the skipped ones still take their time.
+    """
+
+    def __init__(self, file_printer: FilePrinter):
+        self.file_printer = file_printer
+        self.bucket = TokenBucket(rate=LCD_SERIAL_BUDGET,
+                                  burst=LCD_SERIAL_BURST)
+        self.shown: Optional[str] = None
+
+        self.sent = 0
+        self.skipped = 0
+
+    def forget(self):
+        """The firmware has overwritten the display with its own message"""
+        self.shown = None
+
+    def serial_printing(self):
+        """Is there a print running over the serial link?"""
+        return self.file_printer.data.printing
+
+    def admit(self, line: LCDLine, gcode: str) -> bool:
+        """
+        Should the line be sent as the given gcode?
+        Accounts for it in the budget if so
+        """
+        if gcode == self.shown and not line.chime_gcode:
+            return self._skip(line, "is already shown")
+        if not line.urgent and self.serial_printing():
+            now = monotonic()
+            if self.file_printer.print_at_risk():
+                return self._skip(line, "would starve the print")
+            self.bucket.refill(now)
+            if self.bucket.tokens < len(gcode):
+                return self._skip(line, "is over the budget")
+            self.bucket.take(len(gcode), now)
+        self.shown = gcode
+        self.sent += 1
+        return True
+
+    def _skip(self, line: LCDLine, reason: str) -> bool:
+        """Counts and logs a line not being sent"""
+        self.skipped += 1
+        log.debug("Not printing '%s' on the LCD, it %s", line.text, reason)
+        return False
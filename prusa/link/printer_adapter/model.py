@@ -4,8 +4,9 @@ from .structures.mc_singleton import MCSingleton
 from .structures.model_classes import Telemetry
 from .structures.module_data_classes import (FilePrinterData, IPUpdaterData,
                                              JobData, PrintStatsData,
-                                             SDCardData, StateManagerData,
-                                             StorageData, SerialAdapterData)
+                                             SDCardData, SDCopierData,
+                                             StateManagerData, StorageData,
+                                             SerialAdapterData)
 
 
 class Model(metaclass=MCSingleton):
@@ -26,6 +27,7 @@ class Model(metaclass=MCSingleton):
     job: JobData
     ip_updater: IPUpdaterData
     sd_card: SDCardData
+    sd_copier: SDCopierData
     folder_storage: StorageData
     filesystem_storage: StorageData
 
@@ -5,6 +5,7 @@ from time import time
 from ..const import TAIL_COMMANDS
 from ..util import get_gcode
 from .model import Model
+from .structures.growing_file import GrowingFile
 from .structures.module_data_classes import PrintStatsData
 
 log = logging.getLogger(__name__)
@@ -33,23 +34,62 @@ class PrintStats:
         reporting
         :param file_path: path of the file to analyze
         """
-        self.data.total_gcode_count = 0
         self.data.print_time = 0
-        self.data.has_inbuilt_stats = False
 
         with open(file_path, encoding='utf-8') as gcode_file:
-            for line in gcode_file:
-                gcode = get_gcode(line)
-                if gcode:
-                    self.data.total_gcode_count += 1
-                if "M73" in gcode:
-                    self.data.has_inbuilt_stats = True
-                    break
+            self.data.total_gcode_count, self.data.has_inbuilt_stats = \
+                self.analyze(gcode_file)
 
         log.info(
             "New file analyzed. It %s inbuilt percent and time reporting.",
             'has' if self.data.has_inbuilt_stats else 'does not have')
 
+    def track_new_stream(self, stream: GrowingFile):
+        """
+        Analyzes the already received part of a file, which is still being
+        transferred. Until the transfer finishes, the gcode count is unknown
+        :param stream: the file being received
+        """
+        self.data.print_time = 0
+        with stream.reopen() as gcode_file:
+            gcode_count, self.data.has_inbuilt_stats = \
+                self.analyze(gcode_file)
+        self.data.total_gcode_count = \
+            gcode_count if self.data.has_inbuilt_stats else 0
+
+        log.info(
+            "Received part of the file analyzed. It %s inbuilt percent and "
+            "time reporting.",
+            'has' if self.data.has_inbuilt_stats else 'does not have')
+
+    def stream_finished(self, stream: GrowingFile):
+        """
+        The file has been received whole, count its gcodes, so the progress
+        can be estimated
+        :param stream: the received file
+        """
+        if self.data.has_inbuilt_stats:
+            return
+        with stream.reopen() as gcode_file:
+            self.data.total_gcode_count, self.data.has_inbuilt_stats = \
+                self.analyze(gcode_file)
+
+    @staticmethod
+    def analyze(gcode_file):
+        """
+        Counts the gcodes in the supplied file until it finds one
+        with print stats
+        :return: the gcode count and whether the file has print stats
+        """
+        gcode_count = 0
+        for line in gcode_file:
+            gcode = get_gcode(line)
+            if gcode:
+                gcode_count += 1
+            if "M73" in gcode:
+                return gcode_count, True
+        return gcode_count, False
+
     def end_time_segment(self):
         """
         Ends the current time segment and adds its length to the print time
@@ -0,0 +1,153 @@
+"""Contains implementation of the PrintWhileReceiving class"""
+import logging
+from typing import Optional
+
+from prusa.connect.printer.const import State
+from prusa.connect.printer.download import DOWNLOAD_TYPES
+
+from ..config import Config
+from ..const import STREAM_PRINT_BUFFER
+from ..sdk_augmentation.printer import MyPrinter
+from .command import CommandFailed
+from .command_handlers import StartPrint
+from .command_queue import CommandQueue
+from .file_printer import FilePrinter
+from .job import Job, JobState
+from .print_stats import PrintStats
+from .structures.growing_file import GrowingFile
+
+log = logging.getLogger(__name__)
+
+
+class PrintWhileReceiving:
+    """
+    Starts serial prints of files, which are still being transferred
+
+    Once enough of a file that is supposed to be printed has been received,
+    the print starts, reading the file as it grows. The transfer callbacks
+    tell the file printer, when the file is complete, or when it never will
+    be, so the print can be stopped.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, cfg: Config, printer: MyPrinter, job: Job,
+                 command_queue: CommandQueue, file_printer: FilePrinter,
+                 print_stats: PrintStats):
+        self.enabled = cfg.printer.print_while_receiving
+        self.printer = printer
+        self.transfer = printer.transfer
+        self.job = job
+        self.command_queue = command_queue
+        self.file_printer = file_printer
+        self.print_stats = print_stats
+
+        self.stream: Optional[GrowingFile] = None
+        # The transfer we either stream, or decided not to
+        self.transfer_id: Optional[int] = None
+        # Uploads say where they store the data, downloads are known
+        self.upload_part_path: Optional[str] = None
+
+    def expect_upload(self, part_path: str):
+        """An upload is about to write its data into part_path"""
+        self.upload_part_path = part_path
+
+    def _get_part_path(self):
+        """Where is the transferred data being written to?"""
+        if self.transfer.type in DOWNLOAD_TYPES:
+            return self.printer.download_mgr.tmp_filename()
+        return self.upload_part_path
+
+    def _wanted(self):
+        """Should we start printing the currently transferred file?"""
+        if not self.enabled or not self.transfer.in_progress:
+            return False
+        if not self.transfer.to_print or self.transfer.stop_ts > 0:
+            return False
+        if self.job.data.job_state != JobState.IDLE:
+            return False
+        return self.printer.state in {State.IDLE, State.READY}
+
+    def progress(self):
+        """Called on every transfer progress update"""
+        if self.transfer_id != self.transfer.transfer_id:
+            # A new transfer, forget about the old one
+            self.transfer_id = None
+            self.stream = None
+
+        if self.stream is not None:
+            self.stream.notify()
+            return
+        if self.transfer_id is not None or not self._wanted():
+            return
+
+        size = self.transfer.size
+        needed = min(size, STREAM_PRINT_BUFFER) if size \
+            else STREAM_PRINT_BUFFER
+        if self.transfer.transferred < needed:
+            return
+
+        # Try only once per transfer
+        self.transfer_id = self.transfer.transfer_id
+        self._start()
+
+    def _start(self):
+        """Starts the print of the file being received"""
+        part_path = self._get_part_path()
+        transfer_id = self.transfer.transfer_id
+
+        def alive():
+            return (self.transfer.in_progress
+                    and self.transfer.transfer_id == transfer_id)
+
+        try:
+            stream = GrowingFile(part_path, self.transfer.size, alive)
+        except (OSError, TypeError):
+            log.exception("Cannot open %s for printing", part_path)
+            return
+
+        log.info("Starting to print %s while it's being received",
+                 self.transfer.path)
+        self.job.deselect_file()
+        try:
+            self.command_queue.do_command(
+                StartPrint(self.transfer.path, stream=stream))
+        except CommandFailed:
+            log.exception("Failed to start printing a file in transfer")
+        # Even a failed command could have gotten the print going
+        if self.file_printer.stream is stream:
+            self.stream = stream
+        else:
+            stream.close()
+
+    def streams(self, transfer) -> bool:
+        """
+        Is the transfer being printed as it arrives?
+        Such a transfer must not give way to the print, the print would
+        only wait for it longer
+        """
+        return (self.stream is not None
+                and self.transfer_id == transfer.transfer_id)
+
+    def finished(self, transfer) -> bool:
+        """
+        The transfer has successfully finished
+        :return: True, if its file is already being printed
+        """
+        stream, self.stream = self.stream, None
+        self.upload_part_path = None
+        if stream is None or self.transfer_id != transfer.transfer_id:
+            return False
+
+        stream.finish(transfer.transferred)
+        try:
+            self.print_stats.stream_finished(stream)
+        except (OSError, ValueError):
+            log.debug("The streamed print has ended before its transfer")
+        return True
+
+    def aborted(self, reason="The transfer has been stopped"):
+        """The transfer has been stopped or has failed"""
+        stream, self.stream = self.stream, None
+        self.upload_part_path = None
+        if stream is not None:
+            stream.abort(reason)
@@ -1,4 +1,6 @@
 """Implements the PrusaLink class"""
+# The one place, where all the components get wired together
+# pylint: disable=too-many-lines
 import logging
 import os
 import re
@@ -17,7 +19,9 @@ from prusa.connect.printer.const import Source, State
 from prusa.connect.printer.files import File
 from prusa.connect.printer.models import Sheet as SDKSheet
 from ..sdk_augmentation.camera_configurator import MyCameraConfigurator
-from ..v4l2_driver import V4L2Driver
+from ..sdk_augmentation.camera_controller import MyCameraController
+from ..camera_stream import CameraStreams
+from ..timelapse import Timelapse
 
 from ..conditions import HW, ROOT_COND, UPGRADED, use_connect_errors
 from ..config import Config, Settings
@@ -25,9 +29,9 @@ from ..const import (BASE_STATES, MK25_PRINTERS, PATH_WAIT_TIMEOUT,
                      PRINTER_CONF_TYPES, PRINTER_TYPES, PRINTING_STATES,
                      SD_STORAGE_NAME)
 from ..interesting_logger import InterestingLogRotator
-from ..picamera_driver import PiCameraDriver
 from ..sdk_augmentation.printer import MyPrinter
 from ..serial.helpers import enqueue_instruction, enqueue_matchable
+from ..serial.instruction_tracer import instruction_tracer
 from ..serial.serial import SerialException
 from ..serial.serial_adapter import SerialAdapter
 from ..serial.serial_parser import SerialParser
@@ -49,8 +53,11 @@ from .lcd_printer import LCDPrinter
 from .model import Model
 from .print_stat_doubler import PrintStatDoubler
 from .print_stats import PrintStats
+from .print_while_receiving import PrintWhileReceiving
 from .printer_polling import PrinterPolling
 from .special_commands import SpecialCommands
+from .sd_copier import SDCopier
+from .startup import Startup
 from .state_manager import StateChange, StateManager
 from .structures.item_updater import WatchedItem
 from .structures.model_classes import PrintState, Telemetry
@@ -62,6 +69,7 @@ from .structures.regular_expressions import (MBL_TRIGGER_REGEX,
                                              TM_ERROR_LOG_REGEX)
 from .telemetry_passer import TelemetryPasser
 from .updatable import Thread, prctl_name
+from .upload_scheduler import UploadScheduler
 
 log = logging.getLogger(__name__)
 
@@ -83,7 +91,6 @@ class PrusaLink:
     """
 
     def __init__(self, cfg: Config, settings: Settings) -> None:
-        # pylint: disable=too-many-statements
         self.cfg: Config = cfg
         log.info('Starting adapter for port %s', self.cfg.printer.port)
         self.settings: Settings = settings
@@ -95,29 +102,93 @@ class PrusaLink:
         HW.state = CondState.OK
         self.model = Model()
 
-        self.service_discovery = ServiceDiscovery(self.cfg)
+        # The components get created by the startup steps below
+        self.serial_parser: SerialParser
+        self.serial: SerialAdapter
+        self.serial_queue: MonitoredSerialQueue
+        self.service_discovery: ServiceDiscovery
+        self.printer: MyPrinter
+        self.camera_configurator: MyCameraConfigurator
+        self.camera_streams: CameraStreams
+        self.print_stats: PrintStats
+        self.file_printer: FilePrinter
+        self.lcd_printer: LCDPrinter
+        self.job: Job
+        self.state_manager: StateManager
+        self.storage_controller: StorageController
+        self.ip_updater: IPUpdater
+        self.telemetry_passer: TelemetryPasser
+        self.printer_polling: PrinterPolling
+        self.command_queue: CommandQueue
+        self.upload_scheduler: UploadScheduler
+        self.print_while_receiving: PrintWhileReceiving
+        self.sd_copier: SDCopier
+        self.timelapse: Timelapse
+        self.special_commands: SpecialCommands
+        self.print_stat_doubler: PrintStatDoubler
+        self.auto_telemetry: AutoTelemetry
+
+        # Steps not waiting for each other start at the same time
+        self.startup = Startup()
+        self.startup.add("serial", self._start_serial)
+        self.startup.add("service_discovery", self._start_service_discovery)
+        self.startup.add("printer", self._start_printer)
+        self.startup.add("cameras", self._start_cameras, ("printer",))
+        self.startup.add("components", self._init_components,
+                         ("serial", "printer"))
+        self.startup.add("ip", self._start_ip_updater, ("components",))
+        self.startup.add("start", self._start_components, ("components",))
+        self.startup.add("camera_detection", self._start_camera_detection,
+                         ("cameras", "start"))
+        self.startup.ready_after("start")
+        self.startup.run()
+
+        log.debug("Initialization done")
+
+        debug = False
+        if debug:
+            Thread(target=self.debug_shell, name="debug_shell",
+                   daemon=True).start()
+
+    def camera_drivers(self) -> List[Any]:
+        """
+        Returns the camera driver classes. The camera libraries get loaded
+        here, not to hold up the serial port and the rest of the startup
+        """
+        # pylint: disable=import-outside-toplevel
+        from ..picamera_driver import PiCameraDriver
+        from ..v4l2_driver import V4L2Driver
+
+        V4L2Driver.continuous_capture = self.cfg.cameras.continuous_capture
+        return [V4L2Driver, PiCameraDriver]
 
+    def _start_serial(self) -> None:
+        """Opens the serial port and starts the serial queue"""
         self.serial_parser = SerialParser()
 
+        instruction_tracer.configure(self.cfg.printer.trace_instructions,
+                                     self.cfg.printer.trace_sample_rate)
         self.serial = SerialAdapter(self.serial_parser,
                                     self.model,
-                                    configured_port=cfg.printer.port,
-                                    baudrate=cfg.printer.baudrate)
+                                    configured_port=self.cfg.printer.port,
+                                    baudrate=self.cfg.printer.baudrate)
 
         self.serial_queue = MonitoredSerialQueue(self.serial,
                                                  self.serial_parser, self.cfg)
 
-        self.printer = MyPrinter()
+    def _start_service_discovery(self) -> None:
+        """Starts registering PrusaLink for the DNS-SD"""
+        self.service_discovery = ServiceDiscovery(self.cfg)
 
-        self.camera_configurator = MyCameraConfigurator(
-            config=self.settings,
-            config_file_path=self.cfg.printer.settings,
-            camera_controller=self.printer.camera_controller,
-            drivers=[V4L2Driver, PiCameraDriver]
-        )
+    def _start_printer(self) -> None:
+        """Creates the SDK printer and binds its command handlers"""
+        MyCameraController.change_threshold = \
+            self.cfg.cameras.upload_change_threshold
+        MyCameraController.keep_alive = self.cfg.cameras.upload_keep_alive * 60
+        self.printer = MyPrinter()
 
         self.printer.register_handler = self.printer_registered
-        self.printer.connection_from_settings(settings)
+        self.printer.connection_from_settings(self.settings)
 
         # Set download callbacks
         self.printer.printed_file_cb = self.printed_file_cb
@@ -140,23 +211,42 @@ class PrusaLink:
         self.printer.set_handler(CommandType.CANCEL_PRINTER_READY,
                                  self.cancel_printer_ready)
 
+    def _start_cameras(self) -> None:
+        """Loads the camera drivers, creates the camera configurator"""
+        self.camera_configurator = MyCameraConfigurator(
+            config=self.settings,
+            config_file_path=self.cfg.printer.settings,
+            camera_controller=self.printer.camera_controller,
+            drivers=self.camera_drivers()
+        )
+        self.camera_streams = CameraStreams(
+            self.printer.camera_controller,
+            max_fps=self.cfg.cameras.stream_max_fps,
+            max_width=self.cfg.cameras.stream_max_width,
+            max_clients=self.cfg.cameras.stream_max_clients)
+
+    def _init_components(self) -> None:
+        """Creates the components, binds their signals"""
+        # pylint: disable=too-many-statements
         self.serial_parser.add_handler(
             PAUSE_PRINT_REGEX, lambda sender, match: self.fw_pause_print())
         self.serial_parser.add_handler(
             RESUME_PRINT_REGEX, lambda sender, match: self.fw_resume_print())
 
         # Init components first, so they all exist for signal binding stuff
+        self.print_stats = PrintStats(self.model)
+        self.file_printer = FilePrinter(self.serial_queue, self.serial_parser,
+                                        self.model, self.cfg, self.print_stats)
         self.lcd_printer = LCDPrinter(self.serial_queue, self.serial_parser,
-                                      self.model, self.settings, self.printer)
+                                      self.model, self.settings, self.printer,
+                                      self.file_printer)
         self.job = Job(self.serial_parser, self.serial_queue, self.model,
                        self.printer)
         self.state_manager = StateManager(self.serial_parser, self.model,
                                           self.printer, self.cfg,
                                           self.settings)
-        self.print_stats = PrintStats(self.model)
-        self.file_printer = FilePrinter(self.serial_queue, self.serial_parser,
-                                        self.model, self.cfg, self.print_stats)
-        self.storage_controller = StorageController(cfg, self.serial_queue,
+        self.storage_controller = StorageController(self.cfg,
+                                                    self.serial_queue,
                                                     self.serial_parser,
                                                     self.state_manager,
                                                     self.model)
@@ -169,14 +259,28 @@ class PrusaLink:
                                               self.storage_controller.sd_card,
                                               self.settings)
         self.command_queue = CommandQueue()
+        self.upload_scheduler = UploadScheduler(self.file_printer, self.cfg)
+        self.print_while_receiving = PrintWhileReceiving(
+            self.cfg, self.printer, self.job, self.command_queue,
+            self.file_printer, self.print_stats)
+        self.sd_copier = SDCopier(self.serial_queue, self.model, self.printer,
+                                  self.job, self.command_queue,
+                                  self.storage_controller.sd_card)
+        self.timelapse = Timelapse(
+            self.cfg.timelapse.directory,
+            max_size=self.cfg.timelapse.max_size,
+            fps=self.cfg.timelapse.fps,
+            camera_controller=self.printer.camera_controller,
+            job=self.job,
+            enabled=self.cfg.timelapse.enabled)
         self.special_commands = SpecialCommands(self.serial_parser,
                                                 self.command_queue,
                                                 self.lcd_printer)
 
         # Set Transfer callbacks
         self.printer.transfer.started_cb = self.lcd_printer.notify
-        self.printer.transfer.progress_cb = self.lcd_printer.notify
-        self.printer.transfer.stopped_cb = self.lcd_printer.notify
+        self.printer.transfer.progress_cb = self.transfer_progress
+        self.printer.transfer.stopped_cb = self.transfer_stopped
         for state in ROOT_COND:
             state.add_broke_handler(lambda *_: self.lcd_printer.notify())
             state.add_fixed_handler(lambda *_: self.lcd_printer.notify())
@@ -239,7 +343,11 @@ class PrusaLink:
         self.storage_controller.folder_detached_signal.\
             connect(self.folder_dettach)
         self.storage_controller.sd_attached_signal.connect(self.sd_attach)
+        self.storage_controller.watch_files(
+            lambda: self.printer.inotify_handler)
         self.storage_controller.sd_detached_signal.connect(self.sd_dettach)
+        self.storage_controller.sd_file_changed_signal.connect(
+            self.sd_file_changed)
         self.printer_polling.printer_type.became_valid_signal.connect(
             self.printer_type_changed)
         self.printer_polling.print_state.became_valid_signal.connect(
@@ -262,10 +370,16 @@ class PrusaLink:
 
         API.add_fixed_handler(self.connection_renewed)
 
-        # get the ip, then poll the rest of the network info
-        self.ip_updater.update()
+    def _start_ip_updater(self) -> None:
+        """Gets the IP, then polls the rest of the network info"""
+        # The polling starts alongside, connect first, so it gets
+        # the network info again with the first IP
         self.ip_updater.updated_signal.connect(self.ip_updated)
+        self.ip_updater.update()
+        self.ip_updater.start()
 
+    def _start_components(self) -> None:
+        """Starts the components, the printer is ready after this"""
         # Leave the non-polled telemetry split from the rest
         self.auto_telemetry = AutoTelemetry(self.serial_parser,
                                             self.serial_queue, self.model,
@@ -274,24 +388,19 @@ class PrusaLink:
 
         self.printer_polling.start()
         self.storage_controller.start()
-        self.ip_updater.start()
         self.lcd_printer.start()
         self.command_queue.start()
         self.telemetry_passer.start()
+        self.timelapse.start()
         self.printer.start()
         # Start this last, as it might start printing right away
         self.file_printer.start()
 
+    def _start_camera_detection(self) -> None:
+        """Starts adding the cameras, if configured to"""
         if self.cfg.cameras.auto_detect:
             self.camera_configurator.start_auto_add()
 
-        log.debug("Initialization done")
-
-        debug = False
-        if debug:
-            Thread(target=self.debug_shell, name="debug_shell",
-                   daemon=True).start()
-
     # pylint: disable=too-many-branches
     def debug_shell(self) -> None:
         """
@@ -342,7 +451,10 @@ class PrusaLink:
 
         self.quit_evt.set()
         self.camera_configurator.stop_auto_add()
+        self.camera_streams.stop()
+        self.timelapse.stop()
         self.file_printer.stop()
+        self.sd_copier.stop()
         self.command_queue.stop()
         self.telemetry_passer.stop()
         self.printer.stop_loop()
@@ -372,6 +484,7 @@ class PrusaLink:
         if not fast:
             self.service_discovery.unregister()
             self.file_printer.wait_stopped()
+            self.sd_copier.wait_stopped()
             self.telemetry_passer.wait_stopped()
             self.printer.wait_stopped()
             self.printer_polling.wait_stopped()
@@ -382,6 +495,8 @@ class PrusaLink:
             self.serial_queue.wait_stopped()
             self.serial.wait_stopped()
             self.camera_configurator.wait_stopped()
+            self.camera_streams.wait_stopped()
+            self.timelapse.wait_stopped()
 
             log.debug("Remaining threads, that might prevent stopping:")
             for thread in enumerate_threads():
@@ -396,9 +511,23 @@ class PrusaLink:
             return self.job.data.selected_file_path
         return None
 
+    def transfer_progress(self):
+        """Called every time the transfer progresses"""
+        self.lcd_printer.notify()
+        self.print_while_receiving.progress()
+
+    def transfer_stopped(self):
+        """Called when the transfer gets stopped"""
+        self.lcd_printer.notify()
+        self.print_while_receiving.aborted()
+
     # Not type annotated, has problems
     def download_finished_cb(self, transfer):
         """Called when download is finished successfully"""
+        if self.print_while_receiving.finished(transfer):
+            # Already printing it
+            return TransferCallbackState.SUCCESS
+
         if not transfer.to_print:
             return TransferCallbackState.SUCCESS
 
@@ -524,6 +653,7 @@ class PrusaLink:
     def layer_trigger(self, _):
         """Passes the call to trigger to the camera controller"""
         self.printer.camera_controller.layer_trigger()
+        self.timelapse.layer_changed()
 
     def mbl_data_changed(self, data) -> None:
         """Sends the mesh bed leveling data to Connect"""
@@ -732,6 +862,17 @@ class PrusaLink:
         """Connects the sd being detached to PrusaConnect events"""
         self.printer.fs.dettach(SD_STORAGE_NAME)
 
+    def sd_file_changed(self, _, old_path: Optional[str],
+                        new_path: Optional[str],
+                        file: Optional[File]) -> None:
+        """Tells Connect about an SD file changed between two listings"""
+        data: Dict[str, Any] = {"old_path": old_path, "new_path": new_path}
+        if file is not None:
+            data["file"] = file.to_dict()
+        self.printer.event_cb(event=EventType.FILE_CHANGED,
+                              source=Source.MARLIN,
+                              **data)
+
     def instruction_confirmed(self, _) -> None:
         """
         Connects instruction confirmation from serial queue to state manager
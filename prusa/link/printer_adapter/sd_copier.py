@@ -0,0 +1,338 @@
+"""Contains implementation of the SDCopier class"""
+import logging
+import re
+from collections import deque
+from os.path import basename, getsize
+from pathlib import Path
+from threading import Event, Lock
+from time import monotonic, time
+from typing import Deque, Optional
+
+from unidecode import unidecode
+from prusa.connect.printer.const import Event as EventType
+from prusa.connect.printer.const import Source, State, TransferType
+
+from ..const import (QUIT_INTERVAL, SD_COPY_ABORT_TIMEOUT, SD_COPY_ATTEMPTS,
+                     SD_COPY_LISTING_TIMEOUT, SD_COPY_QUEUE_SIZE,
+                     SD_STORAGE_NAME)
+from ..sdk_augmentation.printer import MyPrinter
+from ..serial.helpers import wait_for_instruction
+from ..serial.instruction import Instruction, MatchableInstruction
+from ..serial.serial_queue import SerialQueue
+from ..util import get_gcode
+from .command import CommandFailed
+from .command_handlers import StartPrint
+from .command_queue import CommandQueue
+from .filesystem.sd_card import SDCard
+from .job import Job, JobState
+from .model import Model
+from .structures.model_classes import SDState
+from .structures.module_data_classes import SDCopierData
+from .structures.regular_expressions import SD_WRITE_REGEX
+from .updatable import Thread, prctl_name
+
+log = logging.getLogger(__name__)
+
+INVALID_SFN_CHARACTERS = re.compile(r"[^A-Z0-9_-]")
+
+
+class CopyFailed(RuntimeError):
+    """The copy attempt has failed"""
+
+
+class NotIdle(RuntimeError):
+    """The printer is busy, the copy can't start"""
+
+
+def short_name(filename: str, taken) -> str:
+    """
+    Returns an unused 8.3 name for the copy, M28 cannot create long ones
+    :param taken: short paths of existing files, like "/name.gco"
+    """
+    stem = INVALID_SFN_CHARACTERS.sub("", unidecode(Path(filename).stem)
+                                      .upper()) or "PRINT"
+    name = stem[:8]
+    number = 0
+    while f"/{name}.gco".lower() in taken:
+        number += 1
+        name = stem[:8 - len(str(number))] + str(number)
+    return f"{name}.GCO"
+
+
+class SDCopier:
+    """
+    Copies local files onto the printer's SD card over serial
+
+    The file is written by M28/M29, the same way as the special menu gets
+    its gcodes. While the printer writes, it would put anything it receives
+    into the file, so the serial queue sends only the copied lines.
+    Lines are numbered and checksummed, the printer asks for re-sends of
+    the broken ones. They are enqueued ahead, so the serial queue always
+    has a line to send. M28 cannot append to a file, so a failed copy is
+    started over. The copy is checked against the SD card listing.
+    For the whole copy, the commands needing the printer are refused.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, serial_queue: SerialQueue, model: Model,
+                 printer: MyPrinter, job: Job, command_queue: CommandQueue,
+                 sd_card: SDCard):
+        self.serial_queue = serial_queue
+        self.model = model
+        self.printer = printer
+        self.transfer = printer.transfer
+        self.job = job
+        self.command_queue = command_queue
+
+        self.model.sd_copier = SDCopierData(copying=False)
+        self.data = self.model.sd_copier
+        self.lock = Lock()
+
+        self.quit_evt = Event()
+        self.thread: Optional[Thread] = None
+        self.enqueued: Deque[Instruction] = deque()
+        self.listed = Event()
+        sd_card.tree_updated_signal.connect(self._tree_updated)
+
+        # Throughput of the last copy in bytes per second
+        self.rate = 0.0
+
+    def is_idle(self):
+        """Can we occupy the printer with a copy?"""
+        return (self.printer.state in {State.IDLE, State.READY}
+                and self.job.data.job_state == JobState.IDLE
+                and self.model.sd_card.sd_state == SDState.PRESENT
+                # The short names of the cached files could be wrong
+                and self.model.sd_card.confirmed)
+
+    def copy(self, path: str, to_print=False) -> str:
+        """
+        Starts copying a local file onto the SD card
+        :param path: the Connect path of the local file
+        :param to_print: print the copy once it's done
+        :return: the Connect path of the copy
+        :raises NotIdle: if the printer is not idle or copying already
+        :raises TransferRunningError: if another transfer is running
+        """
+        with self.lock:
+            if self.data.copying or not self.is_idle():
+                raise NotIdle("Copying to SD is possible only when idle")
+            self.data.copying = True
+        try:
+            os_path = self.printer.fs.get_os_path(path)
+            sfn = short_name(basename(path),
+                             self.model.sd_card.sfn_to_lfn_paths)
+            sd_path = f"/{SD_STORAGE_NAME}/{sfn}"
+
+            # Printing is up to us, not to the transfer callbacks
+            self.transfer.start(TransferType.FROM_PRINTER, sd_path,
+                                to_print=False)
+            self.transfer.size = getsize(os_path)
+            self.transfer.start_ts = time()
+            self.thread = Thread(target=self._copy,
+                                 args=(os_path, sfn, to_print),
+                                 name="sd_copier",
+                                 daemon=True)
+            self.thread.start()
+        except Exception:
+            self.data.copying = False
+            raise
+        return sd_path
+
+    def stop(self):
+        """Indicate to the copy thread to stop"""
+        self.quit_evt.set()
+
+    def wait_stopped(self):
+        """Wait for the copy thread to stop"""
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
+
+    def _tree_updated(self, sender, tree):
+        """The SD card has been listed"""
+        assert sender is not None
+        assert tree is not None
+        self.listed.set()
+
+    def _stopped(self):
+        """Has anyone stopped the copy?"""
+        return self.transfer.stop_ts > 0 or self.quit_evt.is_set()
+
+    def _copy(self, os_path, sfn, to_print):
+        """Copies the file, prints the copy if asked to"""
+        prctl_name()
+        try:
+            path = self._copy_retrying(os_path, sfn)
+        finally:
+            # The printer is free again, also for printing the copy
+            self.data.copying = False
+        if path is not None and to_print:
+            self._print(path)
+
+    def _copy_retrying(self, os_path, sfn) -> Optional[str]:
+        """
+        Copies the file, retries on failures
+        :return: the Connect path of the copy, None if it failed
+        """
+        transfer_id = self.transfer.transfer_id
+        started = monotonic()
+        short_path = f"/{sfn.lower()}"
+        try:
+            for attempt in range(1, SD_COPY_ATTEMPTS + 1):
+                try:
+                    written = self._write(os_path, sfn)
+                    path = self._wait_listed(short_path, written)
+                    break
+                except CopyFailed as exception:
+                    if self._stopped() or attempt == SD_COPY_ATTEMPTS:
+                        raise
+                    log.warning("Copy of %s to SD failed: %s. Retrying.",
+                                os_path, exception)
+        except CopyFailed as exception:
+            if self._stopped():
+                log.info("Copy of %s to SD stopped", os_path)
+                event = EventType.TRANSFER_STOPPED
+            else:
+                log.error("Copy of %s to SD failed: %s", os_path, exception)
+                event = EventType.TRANSFER_ABORTED
+            self.printer.event_cb(event, Source.USER, transfer_id=transfer_id)
+            self.transfer.type = TransferType.NO_TRANSFER
+            return None
+
+        elapsed = monotonic() - started
+        self.rate = self.transfer.size / elapsed if elapsed > 0 else 0
+        log.info("Copied %s to SD as %s in %.1f s, average rate %d B/s",
+                 os_path, path, elapsed, self.rate)
+        self.printer.event_cb(EventType.TRANSFER_FINISHED,
+                              Source.FIRMWARE,
+                              destination=path,
+                              transfer_id=transfer_id)
+        self.transfer.type = TransferType.NO_TRANSFER
+        return path
+
+    def _write(self, os_path, sfn) -> int:
+        """
+        Writes the file to the SD card once
+        :return: the least number of bytes the copy on the SD should have
+        """
+        if not self.is_idle():
+            raise CopyFailed("The printer is not idle anymore")
+        self.enqueued.clear()
+        self.serial_queue.begin_exclusive()
+        writing = False
+        try:
+            self._enqueue(Instruction("M110 N0"))
+            write_instruction = MatchableInstruction(
+                f"M28 {sfn.lower()}", capture_matching=SD_WRITE_REGEX)
+            self._enqueue(write_instruction)
+            self._wait_for(write_instruction)
+            match = write_instruction.match()
+            if match is None or match.group("ok") is None:
+                raise CopyFailed(f"The printer could not open {sfn}")
+
+            writing = True
+            written = self._write_lines(os_path)
+
+            done = Instruction("M29")
+            self._enqueue(done)
+            self._wait_for(done)
+            writing = False
+            if self._stopped():
+                delete = Instruction(f"M30 {sfn.lower()}")
+                self._enqueue(delete)
+                self._wait_for(delete)
+                raise CopyFailed("Stopped")
+            return written
+        finally:
+            if writing:
+                self._abort_write(sfn)
+            self.serial_queue.end_exclusive()
+
+    def _abort_write(self, sfn):
+        """
+        Ends the SD write left unfinished and deletes the partial file.
+        Otherwise the printer would write everything it gets into the file
+        """
+        deadline = monotonic() + SD_COPY_ABORT_TIMEOUT
+        for gcode in ("M29", f"M30 {sfn.lower()}"):
+            instruction = Instruction(gcode)
+            try:
+                self.serial_queue.enqueue_exclusive(instruction)
+            except RuntimeError:
+                # The printer got reset, it's not writing anymore
+                return
+            if not wait_for_instruction(
+                    instruction, lambda: monotonic() < deadline):
+                log.error("Could not end the SD write of %s", sfn)
+                return
+
+    def _write_lines(self, os_path) -> int:
+        """Sends the gcodes of the file, keeps some of them enqueued ahead"""
+        written = 0
+        with open(os_path, "r", encoding="utf-8", errors="replace") as file:
+            # Iterating would disable tell()
+            for line in iter(file.readline, ""):
+                gcode = get_gcode(line)
+                if gcode:
+                    self._enqueue(Instruction(gcode, to_checksum=True))
+                    # The printer writes at least a newline after each
+                    written += len(gcode) + 1
+                while len(self.enqueued) >= SD_COPY_QUEUE_SIZE:
+                    self._wait_for(self.enqueued.popleft())
+                while self.enqueued and self.enqueued[0].is_confirmed():
+                    self.enqueued.popleft()
+                self.transfer.transferred = file.tell()
+                if self._stopped():
+                    break
+        while self.enqueued:
+            self._wait_for(self.enqueued.popleft())
+        return written
+
+    def _enqueue(self, instruction: Instruction):
+        """Enqueues the instruction, fails if the printer got reset"""
+        try:
+            self.serial_queue.enqueue_exclusive(instruction)
+        except RuntimeError as exception:
+            raise CopyFailed("The printer has been reset") from exception
+        self.enqueued.append(instruction)
+
+    def _wait_for(self, instruction: Instruction):
+        """Waits for the instruction, fails if we should quit"""
+        if not wait_for_instruction(instruction,
+                                    should_wait_evt=self.quit_evt):
+            raise CopyFailed("Quitting")
+
+    def _wait_listed(self, short_path, written) -> str:
+        """
+        Waits for the SD card listing to contain the copy
+        :return: the Connect path of the copy
+        """
+        self.listed.clear()
+        self.model.sd_card.invalidated = True
+        deadline = monotonic() + SD_COPY_LISTING_TIMEOUT
+        while not self.listed.wait(QUIT_INTERVAL):
+            if monotonic() > deadline or self.quit_evt.is_set():
+                raise CopyFailed("The SD card has not been listed")
+
+        sd_card = self.model.sd_card
+        long_path = sd_card.sfn_to_lfn_paths.get(short_path)
+        if long_path is None:
+            raise CopyFailed(f"{short_path} did not show up on the SD card")
+        node = sd_card.files.get(Path(long_path).parts[1:])
+        if node is None or node.size < written:
+            raise CopyFailed(f"The copy of {short_path} is incomplete")
+        return f"/{SD_STORAGE_NAME}{long_path}"
+
+    def _print(self, path):
+        """Prints the copied file from the SD card"""
+        if not self.is_idle():
+            log.warning("Not printing the copy of %s, the printer is busy",
+                        path)
+            return
+        self.job.deselect_file()
+        self.job.select_file(path)
+        try:
+            self.command_queue.do_command(
+                StartPrint(self.job.data.selected_file_path))
+        except CommandFailed:
+            log.exception("Failed to start printing the copy on SD")
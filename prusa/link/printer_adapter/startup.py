@@ -0,0 +1,150 @@
+"""
+Contains implementation of the Startup class
+
+PrusaLink starts in steps. Each step names the steps it needs done first,
+the rest is up to the Startup - steps, which don't depend on each other,
+run at the same time on a small pool. The slow ones, like looking up
+the IP or loading the camera libraries, are then kept out of the way
+of the serial communication.
+"""
+import logging
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor
+from concurrent.futures import wait
+from time import monotonic
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from ..const import STARTUP_WORKERS
+from ..metrics import registry
+from .updatable import prctl_name
+
+log = logging.getLogger(__name__)
+
+STEP_SECONDS = registry.gauge("prusalink_startup_step_seconds",
+                              "How long did each startup step take",
+                              ("step",))
+
+
+def process_uptime() -> Optional[float]:
+    """Seconds since this process started, None if unknown"""
+    try:
+        with open("/proc/self/stat", encoding="ascii") as stat_file:
+            # The command can contain spaces, skip past it
+            fields = stat_file.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", encoding="ascii") as uptime_file:
+            uptime = float(uptime_file.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+    # The start time is the 22nd field, the first two were cut off
+    return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+
+
+class StartupStep:
+    """One step of the startup and how it went"""
+
+    def __init__(self, name: str, function: Callable[[], Any],
+                 requires: Sequence[str]):
+        self.name = name
+        self.function = function
+        self.requires = tuple(requires)
+        self.started: Optional[float] = None
+        self.duration: Optional[float] = None
+        self.error: Optional[BaseException] = None
+
+    def run(self, since: float):
+        """Runs the step, notes when it started and how long it took"""
+        started_at = monotonic()
+        self.started = started_at - since
+        try:
+            self.function()
+        finally:
+            self.duration = monotonic() - started_at
+            STEP_SECONDS.labels(self.name).set(self.duration)
+            log.debug("Startup step %s took %.3f s", self.name,
+                      self.duration)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """The step for the API"""
+        return dict(name=self.name, requires=list(self.requires),
+                    started=self.started, duration=self.duration,
+                    error=None if self.error is None else repr(self.error))
+
+
+class Startup:
+    """Runs the startup steps in the order of their prerequisites"""
+
+    def __init__(self, workers: int = STARTUP_WORKERS):
+        self.workers = workers
+        self.steps: Dict[str, StartupStep] = {}
+        self.duration: Optional[float] = None
+        # Seconds since the process start, when the ready step was done
+        self.ready: Optional[float] = None
+        self.ready_step: Optional[str] = None
+
+    def add(self, name: str, function: Callable[[], Any],
+            requires: Sequence[str] = ()):
+        """Adds a step, the ones it requires have to be added first"""
+        if name in self.steps:
+            raise ValueError(f"Step {name} is already there")
+        for required in requires:
+            if required not in self.steps:
+                raise ValueError(f"Step {name} requires unknown {required}")
+        self.steps[name] = StartupStep(name, function, requires)
+
+    def ready_after(self, name: str):
+        """The printer counts as ready, when the named step is done"""
+        self.ready_step = name
+
+    def run(self):
+        """
+        Runs all the steps, each as soon as its prerequisites are done.
+        After a step fails, no new ones start, the running ones finish
+        :raises: the exception of the first failed step
+        """
+        started_at = monotonic()
+        done: List[str] = []
+        failed: List[StartupStep] = []
+        pending = dict(self.steps)
+        running: Dict[Future, StartupStep] = {}
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix="startup",
+                                initializer=prctl_name) as executor:
+            while pending or running:
+                if not failed:
+                    for step in list(pending.values()):
+                        if all(name in done for name in step.requires):
+                            del pending[step.name]
+                            running[executor.submit(
+                                step.run, started_at)] = step
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    step.error = future.exception()
+                    if step.error is not None:
+                        log.error("Startup step %s failed: %r",
+                                  step.name, step.error)
+                        failed.append(step)
+                        continue
+                    done.append(step.name)
+                    if step.name == self.ready_step:
+                        self._log_ready()
+        self.duration = monotonic() - started_at
+        log.info("Started in %.3f s: %s", self.duration, ", ".join(
+            f"{step.name} {step.duration:.3f} s"
+            for step in self.steps.values() if step.duration is not None))
+        if failed:
+            raise failed[0].error
+
+    def _log_ready(self):
+        """Notes the time from the process start to the printer ready"""
+        self.ready = process_uptime()
+        if self.ready is not None:
+            log.info("Printer ready %.3f s after the process start",
+                     self.ready)
+
+    def report(self) -> Dict[str, Any]:
+        """The startup steps and times for the API"""
+        return dict(duration=self.duration, ready=self.ready,
+                    steps=[step.as_dict() for step in self.steps.values()])
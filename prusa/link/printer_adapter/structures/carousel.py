@@ -12,13 +12,16 @@ class LCDLine:
 
     def __init__(self, text: str, delay: float = 5.0,
                  resets_idle: bool = False,
-                 chime_gcode: Optional[List[str]] = None) -> None:
+                 chime_gcode: Optional[List[str]] = None,
+                 urgent: bool = False) -> None:
         self.text: str = text
         self.delay: float = delay
         self.chime_gcode: List[str] = []
         if chime_gcode is not None:
             self.chime_gcode = chime_gcode
         self.resets_idle = resets_idle
+        # Urgent lines are shown even if the serial link is busy
+        self.urgent = urgent
         self.ends_at = time() + self.delay
 
     def reset_end(self):
@@ -30,7 +33,8 @@ class LCDLine:
 class Screen:
     """A Screen - like an error screen, or an easter egg scrolling screen"""
 
-    def __init__(self, resets_idle=True, chime_gcode=None, order=0):
+    def __init__(self, resets_idle=True, chime_gcode=None, order=0,
+                 urgent=False):
         """
         :param resets_idle: Do the messages from this screen reset the idle
                             timer?
@@ -38,8 +42,11 @@ class Screen:
         :param order: This is static, but could be made dynamic.
                       The order of screens in case there's more with the
                       same priority. Smallest goes first
+        :param urgent: Are the lines of this screen to be shown even if
+                       the serial link is busy printing?
         """
         self.resets_idle = resets_idle
+        self.urgent = urgent
         self.chime_gcode = []
         if chime_gcode is not None:
             self.chime_gcode = chime_gcode
@@ -112,6 +119,7 @@ class Carousel:
                     self.current_screen.to_chime = False
                     line.chime_gcode = self.current_screen.chime_gcode
                 line.resets_idle = self.current_screen.resets_idle
+                line.urgent = self.current_screen.urgent
                 yield line
 
     def get_next(self):
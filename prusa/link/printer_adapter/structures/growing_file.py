@@ -0,0 +1,126 @@
+"""Contains implementation of the GrowingFile class"""
+import os
+from threading import Event
+from typing import Callable, Optional
+
+from ...const import QUIT_INTERVAL
+
+
+class StreamAborted(Exception):
+    """The file stopped growing before it was complete"""
+
+
+class GrowingFile:
+    """
+    Reads gcode lines from a file, which is still being written to.
+
+    Only whole lines are returned. If the reader catches up with the writer,
+    it waits for more data. The writer side tells it when the file is
+    complete using finish(), or that it will never be, using abort().
+    In case the writer dies without saying anything, the alive callable
+    has to start returning False for the reader to notice.
+    """
+
+    def __init__(self,
+                 path: str,
+                 total_size: Optional[int] = None,
+                 alive: Callable[[], bool] = lambda: True):
+        self.path = path
+        self.total_size = total_size
+        self.alive = alive
+
+        self.file = open(path, "rb")  # pylint: disable=consider-using-with
+        self.changed = Event()
+        self.finished = Event()
+        self.final_size: Optional[int] = None
+        self.abort_reason: Optional[str] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        """Closes the underlying file"""
+        self.file.close()
+
+    @property
+    def closed(self):
+        """Is the underlying file closed?"""
+        return self.file.closed
+
+    def fileno(self):
+        """Returns the underlying file descriptor"""
+        return self.file.fileno()
+
+    def reopen(self):
+        """
+        Opens the same file once more, with its own offset.
+        Works even after the file got renamed or deleted.
+        """
+        return open(f"/proc/self/fd/{self.fileno()}", encoding='utf-8',
+                    errors='replace')
+
+    @property
+    def size(self):
+        """The current size of the file, or the expected one if known"""
+        if self.total_size is not None:
+            return self.total_size
+        return os.fstat(self.fileno()).st_size
+
+    def tell(self):
+        """The byte position of the reader"""
+        return self.file.tell()
+
+    def notify(self):
+        """The writer calls this, when it has written new data"""
+        self.changed.set()
+
+    def finish(self, final_size: int):
+        """The writer is done, the file should end at final_size bytes"""
+        self.final_size = final_size
+        self.finished.set()
+        self.changed.set()
+
+    def abort(self, reason: str):
+        """The writer failed, the file will never be complete"""
+        self.abort_reason = reason
+        self.changed.set()
+
+    def readline(self, keep_waiting: Callable[[], bool] = lambda: True):
+        """
+        Returns the next whole line, waits for it if it's not there yet.
+        Returns an empty string at the end of a complete file, or when
+        keep_waiting says we should not wait anymore
+        :raises StreamAborted: if the file isn't and won't be complete
+        """
+        while True:
+            self.changed.clear()
+            # Sample the flag before reading, so the data is on disk for sure
+            finished = self.finished.is_set()
+            position = self.file.tell()
+            line = self.file.readline()
+
+            if line.endswith(b"\n"):
+                return line.decode("utf-8")
+            if finished:
+                self._check_integrity()
+                return line.decode("utf-8")
+
+            self.file.seek(position)
+            if self.abort_reason is not None:
+                raise StreamAborted(self.abort_reason)
+            if not self.alive() and not self.finished.is_set():
+                raise StreamAborted("The transfer ended unexpectedly")
+            if not keep_waiting():
+                return ""
+
+            self.changed.wait(QUIT_INTERVAL)
+
+    def _check_integrity(self):
+        """Has the reader really read everything the writer wrote?"""
+        position = self.file.tell()
+        if position != self.final_size:
+            raise StreamAborted(f"Read {position} B out of "
+                                f"{self.final_size} B transferred")
@@ -10,10 +10,15 @@ from typing import Any, Callable, Iterable, Optional, Set
 
 from blinker import Signal  # type: ignore
 
+from ...metrics import registry
 from ..updatable import prctl_name
 
 log = logging.getLogger(__name__)
 
+GATHER_SECONDS = registry.histogram("prusalink_item_gather_seconds",
+                                    "How long it took to gather an item",
+                                    ("item",))
+
 
 class SideEffectOnly(Exception):
     """An exception to raise in a gatherer that has nothing to return,
@@ -411,7 +416,8 @@ class ItemUpdater:
 
         log.debug("Gathering new value for item %s", item.name)
         try:
-            value = item.gather_function()
+            with GATHER_SECONDS.labels(item.name).time():
+                value = item.gather_function()
         # pylint: disable=broad-except
         except SideEffectOnly:
             # Special case for gatherers with just side effects
@@ -118,6 +118,14 @@ class SDCardData(BaseModel):
     sfn_to_lfn_paths: Dict[str, str]
     lfn_to_sfn_paths: Dict[str, str]
     mixed_to_lfn_paths: Dict[str, str]
+    fingerprint: Optional[str]
+    # The files were listed by the printer, not served from the cache
+    confirmed: bool
+
+
+class SDCopierData(BaseModel):
+    """Data of the SDCopier class"""
+    copying: bool
 
 
 class StorageData(BaseModel):
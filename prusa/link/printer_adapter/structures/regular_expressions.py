@@ -5,6 +5,9 @@ OPEN_RESULT_REGEX = re.compile(
     r"^((?P<ok>File opened): (?P<sdn_lfn>.*) Size: (?P<size>\d+))"
     r"|(?P<nok>open failed).*")
 
+SD_WRITE_REGEX = re.compile(
+    r"^(?P<ok>Writing to file: (?P<sfn>.*))|(?P<nok>open failed, File: .*)$")
+
 PRINTER_TYPE_REGEX = re.compile(r"^(?P<code>\d{3,5})$")
 FW_REGEX = re.compile(r"^(?P<version>\d+\.\d+\.\d+-.*)$")
 SN_REGEX = re.compile(r"^(?P<sn>^CZPX\d{4}X\d{3}X.\d{5})|"
@@ -16,6 +16,7 @@ from ..const import (JITTER_THRESHOLD, PRINTING_STATES,
                      TELEMETRY_IDLE_INTERVAL, TELEMETRY_PRINTING_INTERVAL,
                      TELEMETRY_SLEEP_AFTER, TELEMETRY_SLEEPING_INTERVAL,
                      TELEMETRY_REFRESH_INTERVAL)
+from ..metrics import registry
 from ..util import loop_until
 from .model import Model
 from .structures.mc_singleton import MCSingleton
@@ -24,6 +25,11 @@ from .updatable import prctl_name
 
 log = logging.getLogger(__name__)
 
+TELEMETRY_SENT = registry.counter("prusalink_telemetry_sent_total",
+                                  "Telemetry messages handed to the SDK")
+TELEMETRY_VALUES = registry.counter("prusalink_telemetry_values_total",
+                                    "Telemetry values handed to the SDK")
+
 # beyond this many things waiting to get sent by the SDK,
 # we'll stop sending telemetry
 QUEUE_LENGTH_LIMIT = 4
@@ -140,6 +146,8 @@ class TelemetryPasser(metaclass=MCSingleton):
             self._to_send = {}
 
         self.printer.telemetry(**telemetry)
+        TELEMETRY_SENT.inc()
+        TELEMETRY_VALUES.inc(len(telemetry))
 
     def _is_appropriate_for_state(self, key):
         """
@@ -0,0 +1,196 @@
+"""
+Contains implementation of the UploadScheduler, the Upload and
+the TokenBucket classes
+
+Uploads are throttled only while PrusaLink prints from a file over serial,
+and only as much as the serial stream needs. The feedback comes from the
+file printer and from the system load.
+"""
+import logging
+import os
+from threading import Lock
+from time import monotonic, sleep
+from typing import List, Optional
+
+from ..config import Config
+from ..const import (UPLOAD_FEEDBACK_INTERVAL, UPLOAD_MAX_LOAD,
+                     UPLOAD_MIN_RATE, UPLOAD_RATE_STEP)
+from .file_printer import FilePrinter
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    A classic token bucket. Tokens are bytes, they are refilled at `rate`
+    bytes per second up to `burst` bytes. Taking more tokens than available
+    puts the bucket into debt, the returned value says how long to wait
+    for the debt to be repaid.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.refilled_at = monotonic()
+
+    def refill(self, now: float):
+        """Adds the tokens accumulated since the last refill"""
+        elapsed = now - self.refilled_at
+        self.refilled_at = now
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+
+    def take(self, amount: int, now: float) -> float:
+        """
+        Takes the amount of tokens
+        :return: how many seconds to wait before proceeding
+        """
+        self.refill(now)
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0
+        return -self.tokens / self.rate
+
+    def reset(self):
+        """Fills the bucket up"""
+        self.tokens = float(self.burst)
+        self.refilled_at = monotonic()
+
+
+class Upload:
+    """
+    The pace of one upload
+
+    When the serial stream is at risk - the print queue is running dry
+    while the printer planner is not fed, or the CPU is overloaded - the rate
+    gets halved. When everything is fine, it doubles every second up to
+    the upload's share of the configured maximum.
+    With no maximum configured, the limit is dropped entirely, once it
+    stops being the thing that limits the upload.
+    """
+
+    def __init__(self, scheduler: "UploadScheduler", burst: int):
+        self.scheduler = scheduler
+        self.lock = Lock()
+
+        self.bucket = TokenBucket(rate=UPLOAD_MIN_RATE, burst=burst)
+        # None means no limit
+        self.rate: Optional[float] = None
+
+        now = monotonic()
+        self.effective_rate = 0.
+        self.started_at = now
+        self.uploaded = 0
+        self.sampled_at = now
+        self.sampled_bytes = 0
+
+    def limit(self, rate: Optional[float]):
+        """Sets the rate limit, None means no limit"""
+        self.rate = rate
+        if rate is not None:
+            self.bucket.rate = rate
+
+    @property
+    def average_rate(self):
+        """The average upload rate since the upload start in bytes/s"""
+        elapsed = monotonic() - self.started_at
+        if not elapsed:
+            return 0.
+        return self.uploaded / elapsed
+
+    def _feedback(self, now: float):
+        """Adjusts the rate limit according to the current conditions"""
+        elapsed = now - self.sampled_at
+        self.effective_rate = self.sampled_bytes / elapsed
+        self.sampled_at = now
+        self.sampled_bytes = 0
+
+        if self.scheduler.at_risk():
+            if self.rate is None:
+                self.rate = self.effective_rate
+            self.rate = max(UPLOAD_MIN_RATE, self.rate / 2)
+            log.debug("Serial print at risk, limiting upload to %d B/s",
+                      self.rate)
+        elif self.rate is not None:
+            self.rate += max(UPLOAD_RATE_STEP, self.rate) * elapsed
+            max_rate = self.scheduler.rate_share()
+            if max_rate:
+                self.rate = min(self.rate, max_rate)
+            elif self.rate > 2 * self.effective_rate:
+                log.debug("Upload rate limit lifted")
+                self.rate = None
+        if self.rate is not None:
+            self.bucket.rate = self.rate
+
+    def consume(self, size: int, throttle: bool):
+        """
+        Accounts for the written data and sleeps if the upload needs
+        to be slowed down
+        :param size: how many bytes have been written
+        :param throttle: is there a serial print to protect?
+        """
+        with self.lock:
+            now = monotonic()
+            self.uploaded += size
+            self.sampled_bytes += size
+            if now - self.sampled_at >= UPLOAD_FEEDBACK_INTERVAL:
+                if throttle:
+                    self._feedback(now)
+                else:
+                    self.effective_rate = \
+                        self.sampled_bytes / (now - self.sampled_at)
+                    self.sampled_at = now
+                    self.sampled_bytes = 0
+            if not throttle or self.rate is None:
+                return
+            wait = self.bucket.take(size, now)
+        if wait:
+            sleep(wait)
+
+
+class UploadScheduler:
+    """
+    Paces the upload writes while a serial print is running
+
+    Each upload keeps its own pace, the configured maximum rate gets
+    split between the running ones.
+    """
+
+    def __init__(self, file_printer: FilePrinter, cfg: Config):
+        self.file_printer = file_printer
+        self.max_rate = cfg.http.upload_rate
+        self.burst = cfg.http.upload_burst
+        self.lock = Lock()
+        self.uploads: List[Upload] = []
+
+    def start(self) -> Upload:
+        """Starts pacing a new upload"""
+        with self.lock:
+            upload = Upload(self, self.burst)
+            self.uploads.append(upload)
+            upload.limit(self.rate_share())
+            return upload
+
+    def stop(self, upload: Upload):
+        """The upload has ended"""
+        with self.lock:
+            if upload in self.uploads:
+                self.uploads.remove(upload)
+
+    def rate_share(self) -> Optional[float]:
+        """The maximum rate of one upload, None means no limit"""
+        if not self.max_rate:
+            return None
+        return self.max_rate / max(1, len(self.uploads))
+
+    @property
+    def effective_rate(self):
+        """The current rate of all the running uploads in bytes/s"""
+        return sum(upload.effective_rate for upload in tuple(self.uploads))
+
+    def at_risk(self):
+        """Is the serial print in danger of being starved?"""
+        if self.file_printer.print_at_risk():
+            return True
+        load = os.getloadavg()[0] / (os.cpu_count() or 1)
+        return load > UPLOAD_MAX_LOAD
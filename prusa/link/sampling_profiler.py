@@ -0,0 +1,143 @@
+"""
+Contains implementation of the SamplingProfiler class - an on demand
+profiler cheap enough to be used on a running printer
+
+Every few milliseconds, it looks at where all the threads are and counts
+the stacks. Nothing runs between the samples and nothing at all when
+not profiling.
+"""
+import json
+import sys
+import threading
+from collections import Counter
+from os.path import basename, dirname
+from threading import Lock
+from time import monotonic, sleep
+from typing import Any, Dict, List, Tuple
+
+from .const import PROFILER_INTERVAL
+
+Frame = Tuple[str, str, int]
+
+
+class ProfilerBusy(RuntimeError):
+    """There's a profile being taken already"""
+
+
+def thread_names() -> Dict[int, str]:
+    """System names of the threads, as set by prctl_name()"""
+    names = {thread.ident: f"pl#{thread.name}"
+             for thread in threading.enumerate() if thread.ident is not None}
+    names[threading.main_thread().ident] = "pl#main"
+    return names
+
+
+def frame_file(filename: str) -> str:
+    """Shortens the file name to the package and the module"""
+    return f"{basename(dirname(filename))}/{basename(filename)}"
+
+
+def frame_label(frame: Frame) -> str:
+    """A frame as shown in the collapsed stacks"""
+    function, file, line = frame
+    return f"{function} ({file}:{line})"
+
+
+class StackSamples:
+    """How many times was each thread seen with each stack"""
+
+    def __init__(self):
+        self.samples: Counter = Counter()
+        self.count = 0
+        self.duration = 0.0
+
+    def add(self, own: int):
+        """Counts the current stacks of all the threads but our own"""
+        names = thread_names()
+        # pylint: disable=protected-access
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, frame_file(code.co_filename),
+                              code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples[(names.get(ident, f"pl#{ident}"),
+                          tuple(stack))] += 1
+        self.count += 1
+
+    def collapsed(self) -> str:
+        """
+        The samples as collapsed stacks - the thread and the frames
+        separated by semicolons, then the count. For flamegraph.pl
+        and most of the flame graph viewers
+        """
+        lines = []
+        for (thread, stack), count in sorted(self.samples.items()):
+            frames = ";".join(frame_label(frame) for frame in stack)
+            lines.append(f"{thread};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> str:
+        """The samples as a speedscope file, a profile for every thread"""
+        frames: List[Frame] = []
+        indexes: Dict[Frame, int] = {}
+        profiles: Dict[str, Dict[str, Any]] = {}
+        for (thread, stack), count in sorted(self.samples.items()):
+            profile = profiles.setdefault(thread, dict(
+                type="sampled", name=thread, unit="seconds",
+                startValue=0, endValue=self.duration,
+                samples=[], weights=[]))
+            sample = []
+            for frame in stack:
+                if frame not in indexes:
+                    indexes[frame] = len(frames)
+                    frames.append(frame)
+                sample.append(indexes[frame])
+            profile["samples"].append(sample)
+            # The sampling itself takes time too, spread it over the samples
+            profile["weights"].append(count * self.duration / self.count)
+        return json.dumps({
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": [dict(name=function, file=file, line=line)
+                                  for function, file, line in frames]},
+            "profiles": list(profiles.values()),
+            "name": "PrusaLink",
+            "exporter": "prusalink"})
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of all the threads but the sampling one
+    at the given interval. Only one profile can be taken at a time.
+    """
+
+    def __init__(self, interval: float = PROFILER_INTERVAL):
+        self.interval = interval
+        self.lock = Lock()
+
+    def profile(self, duration: float) -> StackSamples:
+        """
+        Samples for the duration in seconds, blocks the calling thread
+        :raises ProfilerBusy: if there's another profile being taken
+        """
+        if not self.lock.acquire(blocking=False):
+            raise ProfilerBusy("Already profiling")
+        try:
+            samples = StackSamples()
+            own = threading.get_ident()
+            started_at = monotonic()
+            end_at = started_at + duration
+            while monotonic() < end_at:
+                samples.add(own)
+                sleep(self.interval)
+            samples.duration = monotonic() - started_at
+            return samples
+        finally:
+            self.lock.release()
+
+
+sampling_profiler = SamplingProfiler()
@@ -1,18 +1,28 @@
 """Implements a threaded modification of the CameraConfigurator class"""
 import logging
 from threading import Thread
-from time import sleep
+from time import monotonic, sleep
 from typing import Optional
 
+import pyudev  # type: ignore
+
 from prusa.connect.printer.camera_configurator import CameraConfigurator
-from ..const import CAMERA_SCAN_INTERVAL
+from ..const import (CAMERA_INIT_DELAY, CAMERA_RESCAN_INTERVAL,
+                     CAMERA_SCAN_INTERVAL, QUIT_INTERVAL)
 from ..printer_adapter.updatable import prctl_name
 
 log = logging.getLogger("my_camera_configurator")
 
+CAMERA_SUBSYSTEMS = ("video4linux", "media")
+
 
 class MyCameraConfigurator(CameraConfigurator):
-    """Add an auto adding thread to the configurator"""
+    """Add an auto adding thread to the configurator
+
+    Cameras are re-scanned when udev reports a video or media device
+    change. The drivers remember what they found out about the device
+    nodes, so a re-scan opens only the changed ones. Without udev events,
+    the cameras are re-scanned periodically"""
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -23,10 +33,47 @@ class MyCameraConfigurator(CameraConfigurator):
         """If called, runs the camera auto-adding loop"""
         prctl_name()
         self.auto_add_running = True
+        monitor = self._get_monitor()
         while self.auto_add_running:
             log.debug("Auto-loading cameras")
             self._load_cameras()
-            sleep(CAMERA_SCAN_INTERVAL)
+            self._wait_for_change(monitor)
+
+    @staticmethod
+    def _get_monitor() -> Optional[pyudev.Monitor]:
+        """Returns a started udev monitor of camera devices, if possible"""
+        try:
+            monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+            for subsystem in CAMERA_SUBSYSTEMS:
+                monitor.filter_by(subsystem)
+            monitor.start()
+        except OSError as exception:
+            log.warning("Cannot watch for cameras being plugged in, "
+                        "scanning every %s s instead: %s",
+                        CAMERA_SCAN_INTERVAL, exception)
+            return None
+        return monitor
+
+    def _wait_for_change(self, monitor: Optional[pyudev.Monitor]) -> None:
+        """Waits for a camera device change, or until a re-scan is due"""
+        if monitor is None:
+            rescan_at = monotonic() + CAMERA_SCAN_INTERVAL
+        else:
+            rescan_at = monotonic() + CAMERA_RESCAN_INTERVAL
+        while self.auto_add_running and monotonic() < rescan_at:
+            if monitor is None:
+                sleep(QUIT_INTERVAL)
+                continue
+            device = monitor.poll(timeout=QUIT_INTERVAL)
+            if device is None:
+                continue
+            log.debug("Camera device %s %s", device.device_node,
+                      device.action)
+            # A device comes with more nodes and udev sets them up
+            # for a while, scan once it's done
+            while monitor.poll(timeout=CAMERA_INIT_DELAY) is not None:
+                pass
+            return
 
     def start_auto_add(self) -> None:
         """Starts the auto add thread"""
@@ -0,0 +1,106 @@
+"""
+Implements a modification of the CameraController class, which does not
+upload snapshots that look the same as the last uploaded one
+"""
+import logging
+from time import monotonic
+from typing import TYPE_CHECKING, Dict, Optional
+
+from prusa.connect.printer.camera import Snapshot
+from prusa.connect.printer.camera_controller import CameraController
+
+from ..const import CHANGE_PIXEL_NOISE
+from ..util import small_luma
+
+if TYPE_CHECKING:
+    import numpy as np
+
+log = logging.getLogger("my_camera_controller")
+
+
+class ChangeGate:
+    """
+    Lets a snapshot through only if enough of it has changed since the
+    last one let through, or if that one is older than keep_alive seconds
+
+    The snapshots are compared by their luma decoded at an eighth
+    of the size, which the JPEG decoder does nearly for free.
+    """
+
+    def __init__(self, threshold: float, keep_alive: float):
+        self.threshold = threshold
+        self.keep_alive = keep_alive
+        self.reference: Optional["np.ndarray"] = None
+        self.passed_at = 0.0
+
+        self.captured = 0
+        self.skipped = 0
+        self.uploaded = 0
+
+    def changed(self, data: bytes) -> float:
+        """Returns the part of the snapshot that changed, from 0 to 1"""
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+
+        luma = small_luma(data)
+        reference, self.reference = self.reference, luma
+        if reference is None or reference.shape != luma.shape:
+            return 1.0
+        difference = np.abs(luma.astype(np.int16) - reference)
+        return float(np.mean(difference > CHANGE_PIXEL_NOISE))
+
+    def passes(self, data: bytes) -> bool:
+        """Should the snapshot be uploaded?"""
+        if self.threshold <= 0:
+            return True
+        reference = self.reference
+        try:
+            changed = self.changed(data)
+        except Exception:  # pylint: disable=broad-except
+            log.exception("Cannot compare the snapshot, uploading it")
+            return True
+        if changed >= self.threshold \
+                or monotonic() - self.passed_at >= self.keep_alive:
+            self.passed_at = monotonic()
+            return True
+        # Compare to the uploaded one, so slow changes add up
+        self.reference = reference
+        return False
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the snapshot counters"""
+        return dict(captured=self.captured,
+                    skipped=self.skipped,
+                    uploaded=self.uploaded)
+
+
+class MyCameraController(CameraController):
+    """Gates the snapshot uploads of every camera by a ChangeGate"""
+
+    # Set from the config, the part of the snapshot that has to change
+    # and how often to upload at least
+    change_threshold = 0.0
+    keep_alive = 10 * 60.0
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.gates: Dict[str, ChangeGate] = {}
+
+    def gate(self, camera_id: str) -> ChangeGate:
+        """Returns the change gate of the camera"""
+        return self.gates.setdefault(
+            camera_id, ChangeGate(self.change_threshold, self.keep_alive))
+
+    def photo_handler(self, snapshot: Snapshot) -> None:
+        """Puts the snapshot into the queue for sending, if it's worth it"""
+        gate = self.gate(snapshot.camera_id)
+        gate.captured += 1
+        if not snapshot.is_sendable():
+            return
+        if not gate.passes(snapshot.data):
+            gate.skipped += 1
+            log.debug("Snapshot of %s has not changed, not uploading it",
+                      snapshot.camera_id)
+            return
+        gate.uploaded += 1
+        self.snapshot_queue.put(snapshot)
@@ -1,7 +1,6 @@
 """Contains implementation of the augmented Printer class from the SDK"""
 from logging import getLogger
 from pathlib import Path
-from time import sleep
 from typing import Any, Dict
 
 from prusa.connect.printer import Printer as SDKPrinter
@@ -20,6 +19,7 @@ from ..printer_adapter.model import Model
 from ..printer_adapter.structures.mc_singleton import MCSingleton
 from ..printer_adapter.updatable import Thread, prctl_name
 from ..util import file_is_on_sd
+from .camera_controller import MyCameraController
 from .command_handler import CommandHandler
 
 log = getLogger("connect-printer")
@@ -33,6 +33,8 @@ class MyPrinter(SDKPrinter, metaclass=MCSingleton):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        self.camera_controller = MyCameraController(self.conn, self.server,
+                                                    self.send_cb)
         self.lcd_printer = LCDPrinter.get_instance()
         self.download_thread = Thread(target=self.download_loop,
                                       name="download")
@@ -40,8 +42,6 @@ class MyPrinter(SDKPrinter, metaclass=MCSingleton):
         self.nozzle_diameter = None
         self.command_handler = CommandHandler(self.command)
         self.loop_thread = Thread(target=self.loop, name="loop")
-        self.__inotify_running = False
-        self.inotify_thread = Thread(target=self.inotify_loop, name="inotify")
         self.snapshot_thread = Thread(target=self.snapshot_loop,
                                       name="snapshot_sender",
                                       daemon=True)
@@ -123,11 +123,10 @@ class MyPrinter(SDKPrinter, metaclass=MCSingleton):
         """Start SDK related threads.
 
         * loop
-        * inotify
+
+        The inotify handler is called by the StorageWatcher
         """
-        self.__inotify_running = True
         self.loop_thread.start()
-        self.inotify_thread.start()
         self.download_thread.start()
         self.snapshot_thread.start()
 
@@ -136,9 +135,7 @@ class MyPrinter(SDKPrinter, metaclass=MCSingleton):
 
         * command handler
         * loop
-        * inotify
         """
-        self.__inotify_running = False
         self.download_mgr.stop_loop()
         self.stop_loop()
         self.queue.put(None)  # Trick the SDK into quitting fast
@@ -150,9 +147,7 @@ class MyPrinter(SDKPrinter, metaclass=MCSingleton):
 
         * command handler
         * loop
-        * inotify
         """
-        self.inotify_thread.join()
         self.loop_thread.join()
         self.download_thread.join()
         self.snapshot_thread.join()
@@ -162,16 +157,6 @@ class MyPrinter(SDKPrinter, metaclass=MCSingleton):
         prctl_name()
         super().loop()
 
-    def inotify_loop(self):
-        """Inotify_handler in loop."""
-        prctl_name()
-        while self.__inotify_running:
-            try:
-                self.inotify_handler()
-                sleep(0.2)
-            except Exception:  # pylint: disable=broad-except
-                log.exception('Unhandled exception')
-
     def download_loop(self):
         """Handler for download loop"""
         prctl_name()
@@ -8,6 +8,8 @@ from threading import Event
 from time import time
 from typing import List, Optional
 
+from .instruction_tracer import instruction_tracer
+
 log = logging.getLogger(__name__)
 
 
@@ -44,6 +46,12 @@ class Instruction:
         self.sent_at: Optional[float] = None
         self.time_to_confirm: Optional[float] = None
 
+        # Which queue it went through and since when, for the metrics
+        self.queue_class = "other"
+        self.enqueued_at: Optional[float] = None
+        # Set when the instruction_tracer samples the instruction
+        self.trace_id: Optional[int] = None
+
     def __str__(self):
         return f"Instruction '{self.message.strip()}'"
 
@@ -61,6 +69,12 @@ class Instruction:
         self.confirmed_event.set()
         return True
 
+    def enqueued(self, queue_class: str):
+        """Writes down which queue the instruction went to and when"""
+        self.queue_class = queue_class
+        self.enqueued_at = time()
+        instruction_tracer.start(self)
+
     def sent(self):
         """
         Sets the instruction sent Event and writes the timestamp,
@@ -0,0 +1,147 @@
+"""
+Contains implementation of the InstructionTracer class
+
+Stamps the stages of an instruction's life into a ring allocated upfront,
+so it can stay on during long prints:
+enqueued -> dequeued by the sender -> written to the serial port ->
+the first line read after that -> confirmed
+"""
+from array import array
+from itertools import count
+from time import perf_counter_ns
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from ..const import TRACE_RING_SIZE
+
+if TYPE_CHECKING:
+    from .instruction import Instruction
+
+ENQUEUED, DEQUEUED, WRITTEN, FIRST_OUTPUT, CONFIRMED = range(5)
+STAGES = 5
+
+# What the time between the stamps is spent on
+PHASES = (
+    (ENQUEUED, DEQUEUED, "queue"),
+    (DEQUEUED, WRITTEN, "write"),
+    (WRITTEN, FIRST_OUTPUT, "firmware"),
+    (FIRST_OUTPUT, CONFIRMED, "confirmation"),
+)
+
+
+class InstructionTracer:
+    """
+    Traces every n-th instruction according to the sample rate.
+    Traces are numbered, one lives in the slot trace_id % size until
+    a newer one takes the slot over, stamps of the old one are ignored.
+    """
+
+    def __init__(self, size: int = TRACE_RING_SIZE):
+        self.size = size
+        self.enabled = False
+        self.every = 1
+        self.seen = count()
+        self.traced = count()
+        self.stamps = array("q", bytes(8 * STAGES * size))
+        self.trace_ids = array("q", [-1]) * size
+        self.messages: List[Optional[str]] = [None] * size
+        self.queues: List[Optional[str]] = [None] * size
+        # The trace of the instruction waiting for its first output
+        self.waiting: Optional[int] = None
+
+    def configure(self, enabled: bool, sample_rate: float = 1.0):
+        """Turns the tracing on or off, sets what part of the
+        instructions gets traced"""
+        self.every = max(1, round(1 / sample_rate)) if sample_rate > 0 else 1
+        self.enabled = enabled and sample_rate > 0
+
+    def start(self, instruction: "Instruction"):
+        """Stamps an instruction being enqueued, if it gets sampled"""
+        if not self.enabled:
+            return
+        if next(self.seen) % self.every:
+            return
+        trace_id = next(self.traced)
+        slot = trace_id % self.size
+        self.trace_ids[slot] = trace_id
+        start = slot * STAGES
+        self.stamps[start:start + STAGES] = array("q", bytes(8 * STAGES))
+        self.messages[slot] = instruction.message
+        self.queues[slot] = instruction.queue_class
+        self.stamps[start + ENQUEUED] = perf_counter_ns()
+        instruction.trace_id = trace_id
+
+    def _start(self, trace_id: Optional[int]) -> Optional[int]:
+        """Where the stamps of the trace start, None if it's gone"""
+        if trace_id is None:
+            return None
+        slot = trace_id % self.size
+        if self.trace_ids[slot] != trace_id:
+            return None
+        return slot * STAGES
+
+    def stamp(self, trace_id: Optional[int], stage: int):
+        """Stamps the stage of the traced instruction"""
+        start = self._start(trace_id)
+        if start is None:
+            return
+        # A line read after the confirmation is not the first output
+        if stage == FIRST_OUTPUT and self.stamps[start + CONFIRMED]:
+            return
+        self.stamps[start + stage] = perf_counter_ns()
+
+    def writing(self, trace_id: Optional[int]):
+        """The instruction is about to be written, waits for its first
+        output. Set before the write, a fast reply could come before
+        the write returns"""
+        self.waiting = trace_id
+
+    def written(self, trace_id: Optional[int]):
+        """Stamps the instruction written"""
+        self.stamp(trace_id, WRITTEN)
+
+    def line_read(self):
+        """Stamps the first output of the written instruction"""
+        trace_id = self.waiting
+        start = self._start(trace_id)
+        # Lines read before the write ended are of the previous ones
+        if start is not None and self.stamps[start + WRITTEN]:
+            self.waiting = None
+            self.stamp(trace_id, FIRST_OUTPUT)
+
+    def confirmed(self, trace_id: Optional[int]):
+        """Stamps the instruction confirmed"""
+        if self.waiting == trace_id:
+            self.waiting = None
+        self.stamp(trace_id, CONFIRMED)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """
+        The traced instructions as Chrome trace events, a complete event
+        for every phase, a track for every queue. Opens in chrome://tracing
+        or in Perfetto
+        """
+        events: List[Dict[str, Any]] = []
+        tracks: Dict[Optional[str], int] = {}
+        for slot in range(self.size):
+            if self.trace_ids[slot] < 0:
+                continue
+            stamps = self.stamps[slot * STAGES:(slot + 1) * STAGES]
+            for begin, end, phase in PHASES:
+                if not stamps[begin] or not stamps[end]:
+                    continue
+                queue = self.queues[slot]
+                events.append(dict(
+                    name=phase, cat="instruction", ph="X", pid=1,
+                    tid=tracks.setdefault(queue, len(tracks) + 1),
+                    ts=stamps[begin] / 1000,
+                    dur=(stamps[end] - stamps[begin]) / 1000,
+                    args=dict(message=self.messages[slot],
+                              trace_id=self.trace_ids[slot])))
+        events.sort(key=lambda event: event["ts"])
+        events.extend(dict(name="thread_name", ph="M", pid=1, tid=tid,
+                           args=dict(name=f"{queue} queue"))
+                      for queue, tid in tracks.items())
+        return dict(traceEvents=events, displayTimeUnit="ms")
+
+
+instruction_tracer = InstructionTracer()
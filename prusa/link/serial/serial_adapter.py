@@ -16,6 +16,7 @@ from prusa.connect.printer.conditions import CondState
 from ..conditions import SERIAL
 from ..const import PRINTER_BOOT_WAIT, SERIAL_REOPEN_TIMEOUT, PRINTER_TYPES, \
     PRUSA_VENDOR_ID, RESET_PIN
+from ..metrics import registry
 from ..printer_adapter.model import Model
 from ..printer_adapter.structures.mc_singleton import MCSingleton
 from ..printer_adapter.structures.module_data_classes import Port, \
@@ -23,12 +24,24 @@ from ..printer_adapter.structures.module_data_classes import Port, \
 from ..printer_adapter.structures.regular_expressions import \
     PRINTER_TYPE_REGEX, FW_REGEX, BUSY_REGEX, ATTENTION_REGEX, VALID_SN_REGEX
 from ..printer_adapter.updatable import Thread, prctl_name
+from .instruction_tracer import instruction_tracer
 from .serial import SerialException, Serial
 from .serial_parser import SerialParser
 from ..util import decode_line
 
 log = logging.getLogger(__name__)
 
+SERIAL_LINES = registry.counter("prusalink_serial_lines_total",
+                                "Lines read from and written to the printer",
+                                ("direction",))
+SERIAL_BYTES = registry.counter("prusalink_serial_bytes_total",
+                                "Bytes read from and written to the printer",
+                                ("direction",))
+LINES_READ, LINES_WRITTEN = (SERIAL_LINES.labels("read"),
+                             SERIAL_LINES.labels("written"))
+BYTES_READ, BYTES_WRITTEN = (SERIAL_BYTES.labels("read"),
+                             SERIAL_BYTES.labels("written"))
+
 
 class PortAdapter:
     """Use the Port class, but allow to pass a Serial instance with it"""
@@ -282,6 +295,11 @@ class SerialAdapter(metaclass=MCSingleton):
                        "so stuff doesn't break"
             try:
                 raw_line = self.serial.readline()
+                # Nothing was read before the timeout
+                if raw_line:
+                    instruction_tracer.line_read()
+                    LINES_READ.inc()
+                BYTES_READ.inc(len(raw_line))
                 line = decode_line(raw_line)
             except (SerialException, OSError):
                 log.exception("Failed when reading from the printer. "
@@ -330,6 +348,8 @@ class SerialAdapter(metaclass=MCSingleton):
                         "Serial error when sending") from error
                 else:
                     sent = True
+                    LINES_WRITTEN.inc()
+                    BYTES_WRITTEN.inc(len(message))
                     log.debug("Sent to printer: %s", message)
 
     def _reset_pi(self):
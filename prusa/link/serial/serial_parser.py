@@ -15,10 +15,15 @@ from typing import Any, Callable, Dict, Union, Optional, Match
 from blinker import Signal  # type: ignore
 from sortedcontainers import SortedKeyList  # type: ignore
 
+from ..metrics import registry
 from ..printer_adapter.structures.mc_singleton import MCSingleton
 
 log = logging.getLogger(__name__)
 
+PARSER_MATCHES = registry.counter("prusalink_parser_matches_total",
+                                  "Printer lines matched by each pattern",
+                                  ("pattern",))
+
 
 class RegexPairing:
     """
@@ -30,6 +35,7 @@ class RegexPairing:
         self.regexp: re.Pattern = regexp
         self.signal: Signal = Signal()
         self.priority: Union[float, int] = priority
+        self.matches = PARSER_MATCHES.labels(regexp.pattern)
 
     def __str__(self) -> str:
         receiver_count = len(self.signal.receivers)
@@ -81,8 +87,10 @@ class SerialParser(metaclass=MCSingleton):
                     break
 
         if chosen_pairing is not None:
+            chosen_pairing.matches.inc()
             chosen_pairing.fire(match=match)
         else:
+            PARSER_MATCHES.labels("").inc()
             log.debug("Match not found for %s", line)
 
     def add_handler(self,
@@ -19,6 +19,7 @@ from ..config import Config
 from ..const import (HISTORY_LENGTH, MAX_INT, QUIT_INTERVAL, RX_SIZE,
                      SERIAL_QUEUE_MONITOR_INTERVAL, SERIAL_QUEUE_TIMEOUT)
 from ..interesting_logger import InterestingLogRotator
+from ..metrics import registry
 from ..printer_adapter.structures.mc_singleton import MCSingleton
 from ..printer_adapter.structures.regular_expressions import (
     ATTENTION_REGEX, BUSY_REGEX, CONFIRMATION_REGEX, HEATING_HOTEND_REGEX,
@@ -26,6 +27,7 @@ from ..printer_adapter.structures.regular_expressions import (
 from ..printer_adapter.updatable import Thread, prctl_name
 from ..util import loop_until
 from .instruction import Instruction, MatchableInstruction
+from .instruction_tracer import DEQUEUED, instruction_tracer
 from .is_planner_fed import IsPlannerFed
 from .serial import SerialException
 from .serial_adapter import SerialAdapter
@@ -33,6 +35,18 @@ from .serial_parser import SerialParser
 
 log = logging.getLogger(__name__)
 
+INSTRUCTION_WAIT = registry.histogram(
+    "prusalink_instruction_wait_seconds",
+    "Time from enqueueing an instruction to sending it", ("queue",))
+INSTRUCTION_CONFIRM = registry.histogram(
+    "prusalink_instruction_confirm_seconds",
+    "Time from sending an instruction to its confirmation", ("queue",))
+RESENDS = registry.counter("prusalink_serial_resends_total",
+                           "Re-sends requested by the printer")
+PLANNER_THRESHOLD = registry.gauge(
+    "prusalink_planner_fed_threshold_seconds",
+    "Confirmation time over which the printer planner is considered fed")
+
 
 class SerialQueue(metaclass=MCSingleton):
     """
@@ -63,6 +77,11 @@ class SerialQueue(metaclass=MCSingleton):
         # This one shall contain time critical instructions
         self.priority_queue: Deque[Instruction] = deque()
 
+        # While a file is written to the SD card, the printer would write
+        # anything it receives into it. Only instructions from this queue
+        # get sent then, the other queues wait.
+        self.exclusive_queue: Optional[Deque[Instruction]] = None
+
         # Instruction that is currently being handled
         self.current_instruction: Optional[Instruction] = None
 
@@ -102,6 +121,8 @@ class SerialQueue(metaclass=MCSingleton):
         self.serial_parser.add_handler(RESEND_REGEX, self._resend_handler)
 
         self.is_planner_fed = IsPlannerFed(cfg)
+        PLANNER_THRESHOLD.set_function(
+            lambda: self.is_planner_fed.threshold)
 
         self.quit_evt = Event()
         self.send_event = Event()
@@ -155,6 +176,10 @@ class SerialQueue(metaclass=MCSingleton):
             return self.rx_yeet_slot
         if self.recovery_list:
             return self.recovery_list[-1]
+        if self.exclusive_queue is not None:
+            if self.exclusive_queue:
+                return self.exclusive_queue[-1]
+            return None
         if self.priority_queue:
             if self.is_planner_fed() and self.queue:
                 return self.queue[-1]
@@ -180,6 +205,9 @@ class SerialQueue(metaclass=MCSingleton):
             self.rx_yeet_slot = None
         elif self.recovery_list:
             self.current_instruction = self.recovery_list.pop()
+        elif self.exclusive_queue is not None:
+            if self.exclusive_queue:
+                self.current_instruction = self.exclusive_queue.pop()
         elif self.priority_queue:
             if self.is_planner_fed() and self.queue:
                 # Invalidate, so the unimportant queue doesn't go all at once
@@ -199,7 +227,11 @@ class SerialQueue(metaclass=MCSingleton):
 
     def is_empty(self):
         """Determines whether all queues and slots for writing are empty"""
-        return not self.queue and not self.priority_queue and \
+        if self.exclusive_queue is not None:
+            queues_empty = not self.exclusive_queue
+        else:
+            queues_empty = not self.queue and not self.priority_queue
+        return queues_empty and \
             not self.recovery_list and self.rx_yeet_slot is None\
             and self.m110_workaround_slot is None
 
@@ -270,6 +302,7 @@ class SerialQueue(metaclass=MCSingleton):
 
         self._next_instruction()
         instruction = self.current_instruction
+        instruction_tracer.stamp(instruction.trace_id, DEQUEUED)
 
         if instruction.data is None:
             if instruction.to_checksum:
@@ -302,13 +335,20 @@ class SerialQueue(metaclass=MCSingleton):
 
         self._hookup_output_capture()
         self.current_instruction.sent()
+        if instruction.enqueued_at is not None:
+            INSTRUCTION_WAIT.labels(instruction.queue_class).observe(
+                instruction.sent_at - instruction.enqueued_at)
+        instruction_tracer.writing(instruction.trace_id)
         self.serial_adapter.write(self.current_instruction.data)
+        instruction_tracer.written(instruction.trace_id)
 
     def _enqueue(self, instruction: Instruction, to_front=False):
         """Internal method for enqueuing when already locked"""
         if to_front:
+            instruction.enqueued("priority")
             self.priority_queue.appendleft(instruction)
         else:
+            instruction.enqueued("regular")
             self.queue.appendleft(instruction)
 
     def enqueue_one(self, instruction: Instruction, to_front=False):
@@ -346,6 +386,43 @@ class SerialQueue(metaclass=MCSingleton):
 
         self._try_writing()
 
+    def begin_exclusive(self):
+        """
+        From now on, send only the instructions enqueued by
+        enqueue_exclusive, until end_exclusive is called
+        """
+        with self.write_lock:
+            self.exclusive_queue = deque()
+
+    def enqueue_exclusive(self, instruction: Instruction):
+        """Enqueue an instruction of the exclusive sender"""
+        with self.write_lock:
+            if self.exclusive_queue is None:
+                raise RuntimeError("The serial queue is not exclusive")
+            log.debug("%s enqueued exclusively", instruction)
+            instruction.enqueued("exclusive")
+            self.exclusive_queue.appendleft(instruction)
+
+        self._try_writing()
+
+    def end_exclusive(self):
+        """
+        Let the other queues send again, throws out whatever
+        the exclusive sender did not get to send
+        """
+        with self.write_lock:
+            self._end_exclusive()
+
+        self._try_writing()
+
+    def _end_exclusive(self):
+        """Internal method for ending the exclusivity when already locked"""
+        leftover = self.exclusive_queue or deque()
+        self.exclusive_queue = None
+        for instruction in leftover:
+            instruction.sent()
+            instruction.confirm(force=True)
+
     # --- Static capture handlers ---
 
     def _confirmation_handler(self, sender, match: re.Match):
@@ -362,6 +439,7 @@ class SerialQueue(metaclass=MCSingleton):
         """
         assert sender is not None
         number = int(match.group("cmd_number"))
+        RESENDS.inc()
         log.info("Resend of %s requested. Current is %s", number,
                  self.message_number)
         if self.message_number >= number:
@@ -396,6 +474,7 @@ class SerialQueue(metaclass=MCSingleton):
                         instruction_from_history.message,
                         to_checksum=True,
                         data=instruction_from_history.data)
+                    instruction.enqueued("recovery")
                     self.recovery_list.append(instruction)
 
     def _confirmed(self, force=False):
@@ -418,11 +497,17 @@ class SerialQueue(metaclass=MCSingleton):
                 # If the instruction did not refuse to be confirmed
                 # Yes, that needs to happen
                 log.debug("%s confirmed", instruction)
+                if not force:
+                    INSTRUCTION_CONFIRM.labels(
+                        instruction.queue_class).observe(
+                            instruction.time_to_confirm)
+                instruction_tracer.confirmed(instruction.trace_id)
 
                 self._teardown_output_capture()
 
-                if instruction.to_checksum:
+                if instruction.to_checksum and self.exclusive_queue is None:
                     # Only check those times for check-summed instructions
+                    # SD card writes do not say anything about the planner
                     self.is_planner_fed.process_value(
                         instruction.time_to_confirm)
 
@@ -537,6 +622,8 @@ class SerialQueue(metaclass=MCSingleton):
         """
         prctl_name()
         with self.write_lock:
+            # The printer is not writing to the SD card after a reset
+            self._end_exclusive()
             self._flush_queues()
 
             final_instruction = None
@@ -5,17 +5,18 @@ As of now only DNS-SD is supported
 import logging
 import socket
 from time import sleep
+from typing import TYPE_CHECKING, Optional
 from urllib.error import HTTPError, URLError
 from urllib.request import Request, urlopen
 
-import zeroconf
-from zeroconf import NonUniqueNameException, ServiceInfo, Zeroconf
-
 from .config import Config
 from .const import SELF_PING_RETRY_INTERVAL, SELF_PING_TIMEOUT, instance_id
 from .interesting_logger import InterestingLogRotator
 from .printer_adapter.updatable import Thread, prctl_name
 
+if TYPE_CHECKING:
+    from zeroconf import Zeroconf
+
 log = logging.getLogger(__name__)
 
 
@@ -26,11 +27,8 @@ class ServiceDiscovery:
     """
 
     def __init__(self, config: Config):
-        """Loads configuration and inits Zeroconf"""
-        # Leave out service discovery logs from the interesting log
-        # was sending too many messages
-        InterestingLogRotator.get_instance().skip_logger(zeroconf._logger.log)
-        self.zeroconf = Zeroconf()
+        """Loads configuration, Zeroconf gets loaded by the thread"""
+        self.zeroconf: Optional["Zeroconf"] = None
         self.port = config.http.port
         self.hostname = socket.gethostname()
         self.number = 0
@@ -65,6 +63,15 @@ class ServiceDiscovery:
         and one _prusa-link because why not
         """
         prctl_name()
+        # Importing zeroconf is slow, keep it out of the startup
+        # pylint: disable=import-outside-toplevel
+        import zeroconf
+
+        # Leave out service discovery logs from the interesting log
+        # was sending too many messages
+        InterestingLogRotator.get_instance().skip_logger(zeroconf._logger.log)
+        self.zeroconf = zeroconf.Zeroconf()
+
         # Wait for our own instance to be reachable on the configured port
         # if not, just try again
         while not self.is_on_port(self.port):
@@ -89,7 +96,8 @@ class ServiceDiscovery:
 
     def unregister(self):
         """Unregisters all services"""
-        self.zeroconf.unregister_all_services()
+        if self.zeroconf is not None:
+            self.zeroconf.unregister_all_services()
 
     def _register_service(self, name, service_type, port):
         """
@@ -100,6 +108,9 @@ class ServiceDiscovery:
             http://www.dns-sd.org/ServiceTypes.html
             https://www.iana.org/assignments/service-names-port-numbers/service-names-port-numbers.xml
         """
+        # pylint: disable=import-outside-toplevel
+        from zeroconf import NonUniqueNameException, ServiceInfo
+
         number = self.number
         while True:
             port_part = self._get_port_part(port)
@@ -0,0 +1,326 @@
+"""
+Contains implementation of the Timelapse class, which takes a frame on
+every layer change and makes a video out of them after the print
+"""
+import logging
+import os
+import re
+import shutil
+from collections import deque
+from datetime import datetime
+from os.path import (basename, commonpath, getmtime, getsize, isdir, isfile,
+                     join, realpath, splitext)
+from threading import Condition, Event, Lock
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from prusa.connect.printer.camera import Camera
+from prusa.connect.printer.camera_controller import CameraController
+from prusa.connect.printer.const import CapabilityType
+
+from .avi import write_mjpeg_avi
+from .const import QUIT_INTERVAL, TIMELAPSE_RENDER_NICENESS
+from .printer_adapter.job import Job, JobState
+from .printer_adapter.updatable import Thread, prctl_name
+from .util import ensure_directory
+
+log = logging.getLogger(__name__)
+
+INVALID_NAME_CHARACTERS = re.compile(r"[^\w.-]+")
+VIDEO_EXTENSION = ".avi"
+
+
+class Timelapse:
+    """
+    Takes a frame by the first camera on every layer change of a print,
+    keeps them in a directory per print and after the print, makes
+    a Motion-JPEG AVI out of them in a low priority thread.
+
+    The directory never grows over max_size, the oldest videos make room
+    for new frames. If there's no video left to delete, frames are skipped.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, directory: str, max_size: int, fps: float,
+                 camera_controller: CameraController, job: Job,
+                 enabled: bool = True):
+        self.directory = directory
+        self.max_size = max_size
+        self.fps = fps
+        self.camera_controller = camera_controller
+        self.job = job
+        self.enabled = enabled
+
+        self.lock = Lock()
+        self.quit_evt = Event()
+        self.layer_evt = Event()
+        self.render_condition = Condition(self.lock)
+        self.to_render: Deque[str] = deque()
+        self.recording: Optional[str] = None
+        self.rendering: Optional[str] = None
+        self.frame_number = 0
+        self.out_of_space = False
+        self.size = 0
+
+        self.capture_thread = Thread(target=self._capture,
+                                     name="timelapse_capture",
+                                     daemon=True)
+        self.render_thread = Thread(target=self._render_loop,
+                                    name="timelapse_render",
+                                    daemon=True)
+        job.job_id_updated_signal.connect(self.job_changed)
+
+    def start(self):
+        """Renders the leftovers and starts recording, if enabled"""
+        if not self.enabled:
+            return
+        ensure_directory(self.directory)
+        for name in os.listdir(self.directory):
+            if name.endswith(".tmp"):
+                os.remove(join(self.directory, name))
+        with self.lock:
+            self.size = self._used_space()
+            for name in self._recordings():
+                self.to_render.append(name)
+        self.capture_thread.start()
+        self.render_thread.start()
+
+    def stop(self):
+        """Stop recording and rendering, unfinished renders start over"""
+        self.quit_evt.set()
+        with self.render_condition:
+            self.render_condition.notify_all()
+
+    def wait_stopped(self):
+        """Wait for the threads to quit"""
+        for thread in (self.capture_thread, self.render_thread):
+            if thread.is_alive():
+                thread.join()
+
+    def layer_changed(self):
+        """Takes a frame in the capture thread, so the print does not wait"""
+        if self.enabled and self.recording is not None:
+            self.layer_evt.set()
+
+    def job_changed(self, _, job_id=None):
+        """Starts a recording with a new job, renders it when it ends"""
+        # pylint: disable=unused-argument
+        if not self.enabled:
+            return
+        job_state = self.job.data.job_state
+        with self.lock:
+            if job_state == JobState.IN_PROGRESS and self.recording is None:
+                self._start_recording()
+            elif job_state == JobState.IDLE and self.recording is not None:
+                self._finish_recording()
+
+    def videos(self) -> List[Dict[str, Any]]:
+        """Lists the rendered videos"""
+        if not isdir(self.directory):
+            return []
+        videos = []
+        for name in os.listdir(self.directory):
+            path = join(self.directory, name)
+            if name.endswith(VIDEO_EXTENSION) and not isdir(path):
+                videos.append(dict(name=name, bytes=getsize(path),
+                                   date=getmtime(path)))
+        return sorted(videos, key=lambda video: video["date"])
+
+    def unrendered(self) -> List[Dict[str, Any]]:
+        """Lists the recordings, which are not videos yet"""
+        unrendered = []
+        with self.lock:
+            for name in self._recordings():
+                path = join(self.directory, name)
+                unrendered.append(dict(
+                    name=name,
+                    bytes=sum(getsize(join(path, frame))
+                              for frame in os.listdir(path)),
+                    date=getmtime(path),
+                    recording=name == self.recording,
+                    rendering=name == self.rendering,
+                    processing=name in self.to_render))
+        return sorted(unrendered, key=lambda recording: recording["date"])
+
+    def video_path(self, name: str) -> Optional[str]:
+        """Returns the path of the rendered video, None if there's none"""
+        path = self._path(name)
+        if path is None or not name.endswith(VIDEO_EXTENSION) \
+                or not isfile(path):
+            return None
+        return path
+
+    def delete(self, name: str) -> bool:
+        """
+        Deletes a video or a recording, which is not being worked on
+        :return: False if there's no such thing or it's busy
+        """
+        path = self._path(name)
+        with self.lock:
+            if path is None or name in {self.recording, self.rendering}:
+                return False
+            if not (name.endswith(VIDEO_EXTENSION) and isfile(path)
+                    or name in self._recordings()):
+                return False
+            if name in self.to_render:
+                self.to_render.remove(name)
+            self.size -= self._remove(path)
+        return True
+
+    def _path(self, name: str) -> Optional[str]:
+        """
+        Returns the path of an item right in the timelapse directory,
+        None for names pointing anywhere else, like ".." does
+        """
+        if name in {"", ".", ".."} or basename(name) != name:
+            return None
+        directory = realpath(self.directory)
+        path = realpath(join(directory, name))
+        if path == directory or commonpath((directory, path)) != directory:
+            return None
+        return path
+
+    def _recordings(self) -> List[str]:
+        """Names of the recording directories"""
+        if not isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if isdir(join(self.directory, name)))
+
+    def _used_space(self) -> int:
+        """Sums up the sizes of everything in the timelapse directory"""
+        size = 0
+        for root, _, files in os.walk(self.directory):
+            size += sum(getsize(join(root, name)) for name in files)
+        return size
+
+    @staticmethod
+    def _remove(path) -> int:
+        """Removes a video or a recording, returns the freed space"""
+        if isdir(path):
+            size = sum(getsize(join(path, name)) for name in os.listdir(path))
+            shutil.rmtree(path)
+        else:
+            size = getsize(path)
+            os.remove(path)
+        return size
+
+    def _start_recording(self):
+        """Makes a directory for the frames of the print"""
+        file_name = basename(self.job.data.selected_file_path or "print")
+        stem = INVALID_NAME_CHARACTERS.sub("_", splitext(file_name)[0])
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.recording = f"{stem}_{timestamp}"
+        self.frame_number = 0
+        self.out_of_space = False
+        ensure_directory(join(self.directory, self.recording))
+        log.info("Recording a timelapse %s", self.recording)
+
+    def _finish_recording(self):
+        """Hands the recording over to the rendering"""
+        name, self.recording = self.recording, None
+        if self.frame_number:
+            self.to_render.append(name)
+            self.render_condition.notify_all()
+        else:
+            os.rmdir(join(self.directory, name))
+
+    def _camera(self) -> Optional[Camera]:
+        """The first camera able to take pictures"""
+        for camera in self.camera_controller.cameras_in_order:
+            if camera.supports(CapabilityType.IMAGING):
+                return camera
+        return None
+
+    def _capture(self):
+        """Takes a frame for every layer change"""
+        prctl_name()
+        while not self.quit_evt.is_set():
+            if not self.layer_evt.wait(QUIT_INTERVAL):
+                continue
+            self.layer_evt.clear()
+            try:
+                self._take_frame()
+            except Exception:  # pylint: disable=broad-except
+                log.exception("Failed to take a timelapse frame")
+
+    def _take_frame(self):
+        """Takes a frame and saves it to the current recording"""
+        camera = self._camera()
+        recording = self.recording
+        if camera is None or recording is None:
+            return
+        snapshot = camera.take_a_photo()
+        if snapshot is None or not snapshot.data:
+            return
+        data = snapshot.data
+
+        with self.lock:
+            if recording != self.recording:
+                return
+            if not self._make_room(len(data)):
+                if not self.out_of_space:
+                    log.warning("Timelapse directory is full, skipping "
+                                "frames of %s", recording)
+                self.out_of_space = True
+                return
+            self.frame_number += 1
+            path = join(self.directory, recording,
+                        f"{self.frame_number:06d}.jpg")
+            with open(path, "wb") as file:
+                file.write(data)
+            self.size += len(data)
+
+    def _make_room(self, needed: int) -> bool:
+        """Deletes the oldest videos until there's the needed space"""
+        videos = self.videos()
+        while self.size + needed > self.max_size:
+            if not videos:
+                return False
+            oldest = videos.pop(0)
+            log.info("Deleting timelapse %s to make room", oldest["name"])
+            self.size -= self._remove(join(self.directory, oldest["name"]))
+        return True
+
+    def _render_loop(self):
+        """Renders the finished recordings one by one"""
+        prctl_name()
+        # On Linux, this lowers the priority of this thread only
+        os.nice(TIMELAPSE_RENDER_NICENESS)
+        while not self.quit_evt.is_set():
+            with self.render_condition:
+                while not self.to_render and not self.quit_evt.is_set():
+                    self.render_condition.wait()
+                if self.quit_evt.is_set():
+                    return
+                self.rendering = self.to_render.popleft()
+            try:
+                self._render(self.rendering)
+            except Exception:  # pylint: disable=broad-except
+                log.exception("Failed to render the timelapse %s",
+                              self.rendering)
+            finally:
+                with self.lock:
+                    self.rendering = None
+
+    def _frames(self, path) -> Iterator[bytes]:
+        """Reads the frames one by one, stops if we should quit"""
+        for name in sorted(os.listdir(path)):
+            if self.quit_evt.is_set():
+                return
+            with open(join(path, name), "rb") as file:
+                yield file.read()
+
+    def _render(self, name):
+        """Makes the video out of the recording, removes the recording"""
+        path = join(self.directory, name)
+        video_path = path + VIDEO_EXTENSION
+        with open(video_path + ".tmp", "wb") as file:
+            frames = write_mjpeg_avi(file, self._frames(path), self.fps)
+        if self.quit_evt.is_set():
+            os.remove(video_path + ".tmp")
+            return
+        os.replace(video_path + ".tmp", video_path)
+        with self.lock:
+            self.size += getsize(video_path)
+            self.size -= self._remove(path)
+        log.info("Rendered the timelapse %s out of %d frames", name, frames)
@@ -5,20 +5,19 @@ import multiprocessing
 import os
 import socket
 import typing
+from functools import lru_cache
 from hashlib import sha256
 from pathlib import Path
-from threading import Event
+from threading import Event, Lock
 from time import time
-from typing import Callable, Union
+from typing import TYPE_CHECKING, Callable, Dict, Tuple, Union
 
-import numpy as np
 import unidecode
 
-from turbojpeg import TurboJPEG, TJSAMP_422  # type: ignore
-
 from .const import SD_STORAGE_NAME
 
-jpeg = TurboJPEG()
+if TYPE_CHECKING:
+    import numpy as np
 
 log = logging.getLogger(__name__)
 
@@ -208,17 +207,111 @@ def decode_line(line: bytes):
     return line.decode("cp437").strip().replace('\x00', '')
 
 
-def from_422_to_jpeg(data: bytes, width, height):
+@lru_cache(maxsize=None)
+def get_jpeg():
+    """
+    Returns the TurboJPEG instance. Loading it pulls in numpy and the
+    library, which takes seconds on a Pi Zero, so not until a picture
+    gets encoded or decoded
+    """
+    # pylint: disable=import-outside-toplevel
+    from turbojpeg import TurboJPEG  # type: ignore
+    return TurboJPEG()
+
+
+class YUYVConverter:
+    """
+    Converts packed YUYV 4:2:2 frames to JPEG
+
+    TurboJPEG encodes only planar YUV, so Y, U and V get copied into
+    their planes one after another instead of interweaving. The planes
+    are allocated once per resolution and reused for every frame.
+    The frame can be shrunk on the way by skipping pixels, which costs
+    less than the full size conversion.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        # (width, height, scale): planar buffer
+        self._buffers: Dict[Tuple[int, int, int], "np.ndarray"] = {}
+
+    @staticmethod
+    def scaled_size(width, height, scale=1) -> Tuple[int, int]:
+        """Returns the size of the converted frame"""
+        if scale < 1 or width % (2 * scale):
+            raise ValueError(f"Cannot shrink width {width} {scale} times")
+        return width // scale, -(-height // scale)
+
+    def to_jpeg(self, data, width, height, scale=1) -> bytes:
+        """
+        Returns the YUYV frame as a JPEG
+        :param scale: shrink the frame this many times in each direction
+        """
+        # pylint: disable=import-outside-toplevel
+        import numpy as np
+        from turbojpeg import TJSAMP_422  # type: ignore
+
+        out_width, out_height = self.scaled_size(width, height, scale)
+        rows = np.frombuffer(data, np.uint8).reshape(height, width * 2)
+        rows = rows[::scale]
+        with self._lock:
+            buffer = self._buffers.get((width, height, scale))
+            if buffer is None:
+                buffer = np.empty((out_width * out_height * 2,), np.uint8)
+                self._buffers[(width, height, scale)] = buffer
+            luma_size = out_width * out_height
+            chroma_size = luma_size // 2
+            luma = buffer[:luma_size].reshape(out_height, out_width)
+            blue = buffer[luma_size:luma_size + chroma_size].reshape(
+                out_height, out_width // 2)
+            red = buffer[luma_size + chroma_size:].reshape(
+                out_height, out_width // 2)
+            # Y0 U Y1 V - every second byte is luma, then U and V alternate
+            np.copyto(luma, rows[:, 0::2 * scale])
+            np.copyto(blue, rows[:, 1::4 * scale])
+            np.copyto(red, rows[:, 3::4 * scale])
+            return get_jpeg().encode_from_yuv(buffer, out_height, out_width,
+                                              jpeg_subsample=TJSAMP_422)
+
+
+yuyv_converter = YUYVConverter()
+
+
+def from_422_to_jpeg(data, width, height):
     """Extracts Y, U and V, then puts them one after another instead of
     interweaving"""
-    data_array = np.frombuffer(data, np.uint8)
-    size = len(data)
-    yuv_array = np.empty((size,), dtype=np.uint8)
-    yuv_array[:size//2] = data_array[0::2]
-    yuv_array[size//2: size//4*3] = data_array[1::4]
-    yuv_array[size//4*3:] = data_array[3::4]
-    return jpeg.encode_from_yuv(yuv_array, height, width,
-                                jpeg_subsample=TJSAMP_422)
+    return yuyv_converter.to_jpeg(data, width, height)
+
+
+def downscale_jpeg(data: bytes, max_width: int) -> bytes:
+    """Shrinks the JPEG to max_width using the scaling of the decoder,
+    which is much cheaper than resizing the decoded image.
+    Zero max_width means no limit"""
+    if not max_width:
+        return data
+    jpeg = get_jpeg()
+    width = jpeg.decode_header(data)[0]
+    if width <= max_width:
+        return data
+    factors = [(numerator, denominator)
+               for numerator, denominator in jpeg.scaling_factors
+               if numerator < denominator]
+    fitting = [factor for factor in factors
+               if width * factor[0] // factor[1] <= max_width]
+    if fitting:
+        factor = max(fitting, key=lambda factor: factor[0] / factor[1])
+    else:
+        factor = min(factors, key=lambda factor: factor[0] / factor[1])
+    return jpeg.encode(jpeg.decode(data, scaling_factor=factor))
+
+
+def small_luma(data: bytes) -> "np.ndarray":
+    """Returns the luma of the JPEG at an eighth of its size, the decoder
+    needs just the first coefficient of each block for that"""
+    # pylint: disable=import-outside-toplevel
+    from turbojpeg import TJPF_GRAY  # type: ignore
+    return get_jpeg().decode(data, pixel_format=TJPF_GRAY,
+                             scaling_factor=(1, 8))
 
 
 def is_potato_cpu():
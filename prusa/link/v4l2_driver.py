@@ -2,16 +2,27 @@
 import ctypes
 import fcntl
 import logging
+import select
 from glob import glob
+from threading import Condition, Event
+from time import monotonic
+from typing import Callable, Optional, Tuple
 
 import v4l2py  # type: ignore
 import v4l2py.raw  # type: ignore
-from v4l2py.device import PixelFormat, Device  # type: ignore
+from v4l2py.device import (IOC, Capability, PixelFormat,  # type: ignore
+                           fopen, read_capabilities)
 
-from prusa.connect.printer.camera_driver import CameraDriver
 from prusa.connect.printer.camera import Resolution
 from prusa.connect.printer.const import CapabilityType, NotSupported
-from .util import from_422_to_jpeg
+
+from .camera_workers import (ENCODE_SECONDS, WorkerCameraDriver,
+                             encode_pool, remaining)
+from .const import (CAMERA_CAPTURE_DEADLINE, CAPTURE_BUFFERS,
+                    CAPTURE_FRAME_TIMEOUT, QUIT_INTERVAL)
+from .device_cache import DeviceCache
+from .printer_adapter.updatable import Thread, prctl_name
+from .util import YUYVConverter
 
 log = logging.getLogger(__name__)
 
@@ -51,26 +62,203 @@ def read_media_device_info(path):
     return info
 
 
-def get_media_device_path(device: Device):
-    """Gets the media device path for a video device
+def read_capture_device_info(path) -> Optional[Tuple[str, str]]:
+    """Returns the name and bus info of a video capture device,
+    None for other video devices"""
+    with fopen(path) as file:
+        capabilities = read_capabilities(file.fileno())
+    if Capability.VIDEO_CAPTURE not in Capability(capabilities.device_caps):
+        return None
+    return (capabilities.card.decode("UTF-8"),
+            capabilities.bus_info.decode("UTF-8"))
+
+
+# Scans open only the device nodes, which changed since the last one
+VIDEO_DEVICE_CACHE = DeviceCache()
+MEDIA_DEVICE_CACHE = DeviceCache()
+
+
+def get_media_device_info(bus_info, filename):
+    """Gets the media device info for a video device
 
     Pairs /dev/video* to /dev/media*"""
-    bus_info = device.info.bus_info
     paths = glob("/dev/media*")
+    MEDIA_DEVICE_CACHE.keep_only(paths)
     for path in paths:
         try:
-            info = read_media_device_info(path)
+            info = MEDIA_DEVICE_CACHE.get(path, read_media_device_info)
         except PermissionError:
             log.exception("Failed getting a media device for %s. "
                           "This is commonly caused by the linux user "
                           "not being a member of the 'video' group",
-                          device.filename)
+                          filename)
+        except OSError:
+            log.debug("Media device %s is not readable", path)
         else:
             if bus_info == info.bus_info.decode("UTF-8"):
-                return path
+                return info
     return None
 
 
+class Frame:
+    """A captured frame, still sitting in its mmap'd driver buffer"""
+
+    def __init__(self, sequence, index, size):
+        self.sequence = sequence
+        self.index = index
+        self.size = size
+        self.readers = 0
+        self.superseded = False
+
+
+class FrameGrabber:
+    """
+    Keeps capturing from a V4L2 stream, holding on to the newest frame only
+
+    The newest frame stays dequeued in its mmap'd buffer and goes back
+    to the driver once a newer one arrives and nobody reads it anymore,
+    so the camera always has a buffer to fill. The JPEG is made only
+    when asked for and kept for the frame, concurrent requests wait for
+    the one encode.
+    """
+
+    def __init__(self, stream, encode: Callable[[memoryview], bytes],
+                 name: str):
+        self.buffers = stream.buffers
+        self.encode = encode
+
+        self.condition = Condition()
+        self.quit_evt = Event()
+        self.error: Optional[Exception] = None
+        self.latest: Optional[Frame] = None
+        self.sequence = 0
+        self.encoding: Optional[int] = None
+        self.jpeg: Tuple[int, bytes] = (0, b"")
+
+        self.thread = Thread(target=self._capture, name=name, daemon=True)
+
+    def start(self):
+        """Start capturing"""
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop capturing and wait for the readers,
+        the buffers can be closed after this
+        """
+        self.quit_evt.set()
+        self.thread.join()
+        with self.condition:
+            self.condition.notify_all()
+            while self.latest is not None and self.latest.readers:
+                self.condition.wait()
+
+    def get_jpeg(self, newer_than: int = 0,
+                 timeout: float = CAPTURE_FRAME_TIMEOUT) -> Tuple[int, bytes]:
+        """
+        Returns the newest frame as a JPEG, encodes it if nobody did
+        :param newer_than: wait for a frame with a higher sequence number
+        :return: the sequence number of the frame and the JPEG
+        :raises TimeoutError: if no such frame came in time
+        """
+        deadline = monotonic() + timeout
+        with self.condition:
+            while True:
+                if self.error is not None:
+                    raise self.error
+                frame = self.latest
+                if frame is not None and frame.sequence > newer_than:
+                    if self.jpeg[0] == frame.sequence:
+                        return self.jpeg
+                    if self.encoding != frame.sequence:
+                        break
+                left = deadline - monotonic()
+                if left <= 0 or self.quit_evt.is_set():
+                    raise TimeoutError("No frame captured in time")
+                self.condition.wait(left)
+            self.encoding = frame.sequence
+            frame.readers += 1
+
+        try:
+            data = self._encode(frame)
+        except BaseException:
+            self._encoded(frame)
+            raise
+        self._encoded(frame, data)
+        return frame.sequence, data
+
+    def _encoded(self, frame: Frame, data: Optional[bytes] = None) -> None:
+        """
+        Releases the encoded frame and publishes its JPEG before waking
+        the waiters, so they don't encode the same frame again
+        """
+        with self.condition:
+            frame.readers -= 1
+            if frame.superseded and not frame.readers:
+                self._give_back(frame.index)
+            if data is not None and self.jpeg[0] < frame.sequence:
+                self.jpeg = (frame.sequence, data)
+            if self.encoding == frame.sequence:
+                self.encoding = None
+            self.condition.notify_all()
+
+    def _encode(self, frame: Frame) -> bytes:
+        """Encodes the frame straight from its buffer"""
+        buffer = self.buffers.buffers[frame.index]
+        view = memoryview(buffer.mmap)[:frame.size]
+        try:
+            with ENCODE_SECONDS.time():
+                return self.encode(view)
+        finally:
+            view.release()
+
+    def _give_back(self, index):
+        """Queue the buffer for the driver to fill again"""
+        # pylint: disable=protected-access
+        v4l2_buffer = self.buffers.buffers[index]._v4l2_buffer()
+        self.buffers._ioctl(IOC.QBUF, v4l2_buffer)
+
+    def _capture(self):
+        """The capturing loop"""
+        prctl_name()
+        device = self.buffers.device
+        # The first frame tends to be stale
+        discard = True
+        try:
+            while not self.quit_evt.is_set():
+                readable, _, _ = select.select((device,), (), (),
+                                               QUIT_INTERVAL)
+                if not readable:
+                    continue
+                # pylint: disable=protected-access
+                v4l2_buffer = self.buffers.buffers[0]._v4l2_buffer()
+                self.buffers._ioctl(IOC.DQBUF, v4l2_buffer)
+                if discard:
+                    discard = False
+                    self._give_back(v4l2_buffer.index)
+                    continue
+                self._replace_latest(v4l2_buffer)
+        except OSError as exception:
+            log.exception("Capturing from %s failed", device.filename)
+            with self.condition:
+                self.error = exception
+                self.condition.notify_all()
+
+    def _replace_latest(self, v4l2_buffer):
+        """Hold on to the new frame, give back the previous one"""
+        with self.condition:
+            previous = self.latest
+            self.sequence += 1
+            self.latest = Frame(self.sequence, v4l2_buffer.index,
+                                v4l2_buffer.bytesused)
+            if previous is not None:
+                if previous.readers:
+                    previous.superseded = True
+                else:
+                    self._give_back(previous.index)
+            self.condition.notify_all()
+
+
 def param_change(func):
     """Wraps any settings change with a stop and start of the video
     stream, so the camera driver does not return it's busy"""
@@ -84,10 +272,12 @@ def param_change(func):
     return inner
 
 
-class V4L2Driver(CameraDriver):
+class V4L2Driver(WorkerCameraDriver):
     """Linux V4L2 USB webcam driver"""
 
     name = "V4L2"
+    # Set from the config, capture all the time to have a fresh frame ready
+    continuous_capture = False
     REQUIRES_SETTINGS = {
         "path": "Path to the V4L2 device like '/dev/video1'"
     }
@@ -97,29 +287,36 @@ class V4L2Driver(CameraDriver):
         """Implements the mandated scan method, returns available USB
         cameras"""
         available = {}
-        devices = v4l2py.device.iter_video_capture_devices()
-        for device in devices:
+        paths = sorted(glob("/dev/video*"))
+        VIDEO_DEVICE_CACHE.keep_only(paths)
+        for path in paths:
+            try:
+                device_info = VIDEO_DEVICE_CACHE.get(
+                    path, read_capture_device_info)
+            except OSError:
+                log.debug("Video device %s is not readable", path)
+                continue
+            if device_info is None:
+                continue
+            name, bus_info = device_info
+
             # Disqualify picameras - they need special treatment
-            if device.info.bus_info == "platform:bcm2835-isp":
+            if bus_info == "platform:bcm2835-isp":
                 continue
 
-            media_device_path = get_media_device_path(device)
-            if media_device_path is None:
+            info = get_media_device_info(bus_info, path)
+            if info is None:
                 continue
 
-            path = str(device.filename)
-            name = device.info.card
             try:
-                info = read_media_device_info(media_device_path)
                 serial = info.serial.decode("ascii")
-            except (OSError, PermissionError):
+            except UnicodeDecodeError:
                 log.exception("Getting camera sn failed for camera %s at %s",
                               name, path)
                 continue
-            else:
-                camera_id = " ".join((name, serial))
-                log.info("Camera id is %s", camera_id)
-                available[camera_id] = dict(path=path, name=name)
+            camera_id = " ".join((name, serial))
+            log.info("Camera id is %s", camera_id)
+            available[camera_id] = dict(path=path, name=name)
         return available
 
     def __init__(self, camera_id, config, unavailable_cb):
@@ -129,6 +326,9 @@ class V4L2Driver(CameraDriver):
         self._resolution_to_format = {}
         self.device = None
         self.stream = None
+        self.grabber: Optional[FrameGrabber] = None
+        # Each camera has its own, so they don't wait for each other
+        self.converter = YUYVConverter()
 
     def _connect(self):
         """Connects to the V4L2 camera"""
@@ -180,33 +380,73 @@ class V4L2Driver(CameraDriver):
 
     def _start_stream(self):
         """Initiates stream from the webcam"""
-        self.stream = v4l2py.device.VideoStream(self.device.video_capture)
+        if not self.continuous_capture:
+            self.stream = v4l2py.device.VideoStream(self.device.video_capture)
+            self.device.video_capture.start()
+            return
+
+        self.stream = v4l2py.device.VideoStream(self.device.video_capture,
+                                                buffer_size=CAPTURE_BUFFERS)
         self.device.video_capture.start()
+        self.grabber = FrameGrabber(self.stream, self._encoder(),
+                                    name="frame_grabber")
+        self.grabber.start()
 
     def _stop_stream(self):
         """Stops the camera stream"""
+        if self.grabber is not None:
+            self.grabber.stop()
+            self.grabber = None
+
         if self.device is not None:
             self.device.video_capture.stop()
 
         if self.stream is not None:
             self.stream.close()
 
-    def take_a_photo(self):
-        """Since using the threaded camera class, this takes a photo the
-        blocking way"""
-        self.stream.read()  # Throw the old data out
-        data = self.stream.read()
-
+    def _encoder(self) -> Callable[[memoryview], bytes]:
+        """Returns a function making a JPEG out of the current format"""
         video_format = self.device.video_capture.get_format()
         width = video_format.width
         height = video_format.height
-        pixel_format = video_format.pixel_format
 
-        str_pixel_format = PIX_FMT_TO_STRING[pixel_format]
-        if str_pixel_format == "YUYV":
-            data = from_422_to_jpeg(data, width, height)
+        if PIX_FMT_TO_STRING[video_format.pixel_format] == "YUYV":
+            return lambda data: self.converter.to_jpeg(data, width, height)
+        return bytes
+
+    def get_jpeg(self, newer_than: int = 0) -> Tuple[int, bytes]:
+        """
+        Returns the newest continuously captured frame as a JPEG
+        :return: the sequence number of the frame and the JPEG
+        """
+        if self.grabber is None:
+            raise NotSupported("Camera is not capturing continuously")
+        return self.grabber.get_jpeg(newer_than)
 
-        return data
+    def take_a_photo(self):
+        """Takes a photo the blocking way, in the worker of this camera.
+        YUYV frames are encoded by the shared pool
+        :raises TimeoutError: if the photo is not done by the deadline"""
+        deadline = monotonic() + CAMERA_CAPTURE_DEADLINE
+        if self.grabber is not None:
+            return self.grabber.get_jpeg(timeout=remaining(deadline))[1]
+
+        self._read(deadline)  # Throw the old data out
+        data = self._read(deadline)
+
+        encoder = self._encoder()
+        if encoder is bytes:
+            return data
+        return encode_pool.encode(encoder, data, deadline)
+
+    def _read(self, deadline):
+        """Reads a frame from the stream, waits until the deadline"""
+        readable, _, _ = select.select((self.device,), (), (),
+                                       remaining(deadline))
+        if not readable:
+            raise TimeoutError(f"Camera {self.camera_id} did not capture "
+                               "a frame in time")
+        return self.stream.raw_read()
 
     @param_change
     def set_resolution(self, resolution):
@@ -217,6 +457,7 @@ class V4L2Driver(CameraDriver):
 
     def disconnect(self):
         """Disconnects from the camera"""
+        self.stop_worker()
         if self.device is None:
             return
         try:
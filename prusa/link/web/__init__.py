@@ -1,13 +1,17 @@
 """Init file for web application module."""
 import logging
+from functools import partial
 from time import sleep
 from wsgiref.simple_server import make_server
 
 import prctl  # type: ignore
 
 from .lib.auth import REALM
-from .lib.classes import RequestHandler, ThreadingServer
-from .lib.core import app
+from .lib.classes import (PersistentRequestHandler, PoolServer,
+                          RequestHandler, SingleServer, ThreadingServer)
+from .lib.core import STATIC_DIR, app
+from .lib.static import StaticIndex
+from .lib.thumbnails import ThumbnailCache
 from .lib.wizard import Wizard
 from .link_info import link_info
 
@@ -47,25 +51,45 @@ def init(daemon):
     if app.settings.is_wizard_needed():
         app.wizard = Wizard(app)
 
+    app.static = StaticIndex(STATIC_DIR)
+    app.static.build()
+    app.thumbnails = ThumbnailCache(app.cfg.http.thumbnail_cache_size,
+                                    app.cfg.http.thumbnail_dir or None)
+
     if app.cfg.http.link_info:
         log.warning('Page /link-info is enabled!')
         app.set_route('/link-info', link_info)
 
 
+def get_server_classes(cfg):
+    """Return server and request handler classes for configured server."""
+    if cfg.http.server == "pool":
+        return (partial(PoolServer,
+                        workers=cfg.http.workers,
+                        queue_size=cfg.http.queue_size,
+                        keep_alive=cfg.http.keep_alive),
+                PersistentRequestHandler)
+    if cfg.http.server == "single":
+        return SingleServer, RequestHandler
+    return ThreadingServer, RequestHandler
+
+
 def run_http(daemon, foreground=False):
     """Run http thread"""
     prctl.set_name("pl#http")
-    log.info('Starting server for http://%s:%d', daemon.cfg.http.address,
-             daemon.cfg.http.port)
+    log.info('Starting %s server for http://%s:%d', daemon.cfg.http.server,
+             daemon.cfg.http.address, daemon.cfg.http.port)
 
     init(daemon)
+    server_class, handler_class = get_server_classes(daemon.cfg)
     while True:
+        httpd = None
         try:
             httpd = make_server(daemon.cfg.http.address,
                                 daemon.cfg.http.port,
                                 app,
-                                server_class=ThreadingServer,
-                                handler_class=RequestHandler)
+                                server_class=server_class,
+                                handler_class=handler_class)
 
             httpd.timeout = 0.5
             httpd.serve_forever()
@@ -77,6 +101,9 @@ def run_http(daemon, foreground=False):
             if foreground:
                 log.info("Shutdown http")
                 return 1
+        finally:
+            if httpd is not None:
+                httpd.server_close()
         sleep(1)
 
 
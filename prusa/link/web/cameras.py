@@ -3,12 +3,13 @@ from time import time, sleep
 from datetime import datetime, timedelta
 
 from poorwsgi import state
-from poorwsgi.response import JSONResponse, Response
+from poorwsgi.response import GeneratorResponse, JSONResponse, Response
 
 from prusa.connect.printer.camera import Camera
 from prusa.connect.printer.const import CameraAlreadyConnected, \
     NotSupported, CameraNotDetected, ConfigError, CapabilityType, PHOTO_TIMEOUT
 
+from ..camera_stream import TooManyStreams
 from ..const import HEADER_DATETIME_FORMAT
 
 from .lib.core import app
@@ -16,11 +17,28 @@ from .lib.auth import check_api_digest
 from ..const import CAMERA_REGISTER_TIMEOUT, QUIT_INTERVAL, TIME_FOR_SNAPSHOT
 
 
+STREAM_BOUNDARY = "frame"
+
+
 def format_header(header):
     """Return datetime header in correct format"""
     return header.strftime(HEADER_DATETIME_FORMAT)
 
 
+def multipart_frames(frames):
+    """Wraps JPEG frames into parts of a multipart MJPEG stream"""
+    try:
+        for frame in frames:
+            yield (f"--{STREAM_BOUNDARY}\r\n"
+                   "Content-Type: image/jpeg\r\n"
+                   f"Content-Length: {len(frame)}\r\n\r\n").encode()
+            yield frame
+            yield b"\r\n"
+    finally:
+        # Frees the stream slot right when the client leaves
+        frames.close()
+
+
 def photo_by_camera_id(camera_id, req):
     """Returns the response for two endpoints
     "snap" on the first camera in order and "snap" on a specific camera"""
@@ -105,7 +123,8 @@ def list_cameras(_):
             connected=connected,
             detected=camera_id in camera_configurator.detected,
             stored=camera_id in camera_configurator.stored,
-            registered=registered
+            registered=registered,
+            snapshots=camera_controller.gate(camera_id).stats()
         )
         camera_list.append(list_item)
 
@@ -154,6 +173,33 @@ def take_photo_by_camera_id(_, camera_id):
         return Response(photo, content_type='image/jpeg')
 
 
+@app.route("/api/v1/cameras/<camera_id>/stream", method=state.METHOD_GET)
+@check_api_digest
+def camera_stream(_, camera_id):
+    """Streams the specified camera as multipart MJPEG,
+    answers 503, when there are stream_max_clients streams already"""
+    camera_controller = app.daemon.prusa_link.printer.camera_controller
+    if camera_id not in camera_controller:
+        return JSONResponse(status_code=state.HTTP_NOT_FOUND,
+                            message=f"Camera with id: {camera_id} is"
+                                    f" not available")
+    camera = camera_controller.get_camera(camera_id)
+    if not camera.supports(CapabilityType.IMAGING):
+        return JSONResponse(status_code=state.HTTP_CONFLICT,
+                            message=f"Camera with id: {camera_id} "
+                                    f"cannot take pictures")
+    try:
+        frames = app.daemon.prusa_link.camera_streams.frames(camera_id)
+    except TooManyStreams:
+        return JSONResponse(status_code=state.HTTP_SERVICE_UNAVAILABLE,
+                            message="Too many camera streams, try later")
+    return GeneratorResponse(
+        multipart_frames(frames),
+        content_type="multipart/x-mixed-replace; "
+                     f"boundary={STREAM_BOUNDARY}",
+        headers={'Cache-Control': 'no-store'})
+
+
 @app.route("/api/v1/cameras/<camera_id>", method=state.METHOD_GET)
 @check_api_digest
 def camera_config(_, camera_id):
@@ -1,6 +1,5 @@
 """/api/files endpoint handlers"""
 import logging
-from base64 import decodebytes
 from datetime import datetime
 from functools import wraps
 from hashlib import md5
@@ -15,7 +14,7 @@ from magic import Magic
 
 from poorwsgi import state
 from poorwsgi.request import FieldStorage
-from poorwsgi.response import FileResponse, JSONResponse, Response
+from poorwsgi.response import JSONResponse, Response
 from poorwsgi.results import hbytes
 from prusa.connect.printer import const
 from prusa.connect.printer.const import Source, StorageType
@@ -31,10 +30,14 @@ from ..const import LOCAL_STORAGE_NAME, PATH_WAIT_TIMEOUT, \
 from ..printer_adapter.command_handlers import StartPrint
 from ..printer_adapter.job import Job, JobState
 from ..printer_adapter.prusa_link import TransferCallbackState
+from ..printer_adapter.sd_copier import NotIdle
 from .lib.auth import check_api_digest
+from .lib.commands import command_response, wait_for_command
 from .lib.core import app
 from .lib.files import (file_to_api, gcode_analysis, get_os_path, local_refs,
                         sdcard_refs, sort_files)
+from .lib.response import bytes_response, file_response, not_modified
+from .lib.thumbnails import BIG, SMALL
 
 log = logging.getLogger(__name__)
 
@@ -99,7 +102,9 @@ class GCodeFile(FileIO):
         self.__uploaded = 0
         self.job_data = job.data
         self.printer = app.daemon.prusa_link.printer
+        self.scheduler = app.daemon.prusa_link.upload_scheduler
         super().__init__(filepath, 'w+b')
+        self.upload = self.scheduler.start()
 
     @property
     def uploaded(self):
@@ -113,16 +118,17 @@ class GCodeFile(FileIO):
                      transfer_id=self.transfer.transfer_id)
             self.transfer.type = const.TransferType.NO_TRANSFER
             raise conditions.TransferStopped()
-        if self.printer.state == const.State.PRINTING \
-                and not self.job_data.from_sd:
-            sleep(0.01)
         size = super().write(data)
+        self.upload.consume(size, throttle=throttled(self.transfer))
         self.__uploaded += size
         self.transfer.transferred = self.__uploaded
         return size
 
     def close(self):
         super().close()
+        self.scheduler.stop(self.upload)
+        log.info("Upload finished, average rate %d B/s",
+                 self.upload.average_rate)
         event_cb = app.daemon.prusa_link.printer.event_cb
         event_cb(const.Event.TRANSFER_FINISHED,
                  const.Source.CONNECT,
@@ -414,19 +420,24 @@ def api_start_print(req, target, path):
             job.select_file(path)
 
             if req.json.get('print', False):
+                if app.daemon.prusa_link.model.sd_copier.copying:
+                    raise conditions.NotStateToPrint()
                 command_queue = app.daemon.prusa_link.command_queue
-                command_queue.do_command(
+                adapter = command_queue.submit(
                     StartPrint(job.data.selected_file_path, source=Source.WUI))
+                return command_response(req, adapter)
             return Response(status_code=state.HTTP_NO_CONTENT)
 
     elif command == 'print':
         if job.data.job_state == JobState.IDLE:
+            if app.daemon.prusa_link.model.sd_copier.copying:
+                raise conditions.NotStateToPrint()
             job.set_file_path(path,
                               path_incomplete=False,
                               prepend_sd_storage=False)
             command_queue = app.daemon.prusa_link.command_queue
-            command_queue.do_command(StartPrint(path, source=Source.WUI))
-            return Response(status_code=state.HTTP_NO_CONTENT)
+            return command_response(req, command_queue.submit(
+                StartPrint(path, source=Source.WUI)))
 
         # job_state != IDLE
         raise conditions.CurrentlyPrinting()
@@ -439,7 +450,6 @@ def api_start_print(req, target, path):
 @check_api_digest
 def api_downloads(req, target, path):
     """Downloads intended gcode."""
-    # pylint: disable=unused-argument
     if target == 'sdcard':
         raise conditions.SDCardNotSupported()
     if target != 'local':
@@ -452,7 +462,7 @@ def api_downloads(req, target, path):
         raise conditions.FileNotFound()
 
     headers = {"Content-Disposition": f"attachment;filename=\"{filename}\""}
-    return FileResponse(os_path, headers=headers)
+    return file_response(req, os_path, headers=headers)
 
 
 @app.route('/api/files/<target>/<path:re:.+(?!/raw)>')
@@ -513,6 +523,43 @@ def api_file_info(req, target, path):
     return JSONResponse(**result, headers=headers)
 
 
+def throttled(transfer):
+    """Should the transfer give way to the print?"""
+    prusa_link = app.daemon.prusa_link
+    return prusa_link.printer.state == const.State.PRINTING \
+        and not Job.get_instance().data.from_sd \
+        and not prusa_link.print_while_receiving.streams(transfer)
+
+
+def receive_file(req, part_path, transfer):
+    """Write the request body into part_path, return its size."""
+    scheduler = app.daemon.prusa_link.upload_scheduler
+    upload = scheduler.start()
+
+    uploaded = 0
+    # checksum = sha256() # - # We don't use this value yet
+    try:
+        with open(part_path, 'w+b') as temp:
+            block = min(app.cached_size, req.content_length)
+            data = req.read(block)
+            while data:
+                if transfer.stop_ts > 0:
+                    raise conditions.TransferStopped()
+                size = temp.write(data)
+                upload.consume(size, throttle=throttled(transfer))
+                uploaded += size
+                transfer.transferred = uploaded
+                # checksum.update(data) # - we don't use the value yet
+                block = min(app.cached_size, req.content_length-uploaded)
+                if block > 1:
+                    data = req.read(block)
+                else:
+                    data = b''
+    finally:
+        scheduler.stop(upload)
+    return uploaded
+
+
 @app.route('/api/v1/files/<storage>/<path:re:.+(?!/raw)>',
            method=state.METHOD_PUT)
 @check_api_digest
@@ -557,60 +604,107 @@ def api_file_upload(req, storage, path):
 
     print_after_upload = req.headers.get('Print-After-Upload') or False
 
-    uploaded = 0
-    # checksum = sha256() # - # We don't use this value yet
-
     # Create folders within the path
     Path(split(abs_path)[0]).mkdir(parents=True, exist_ok=True)
 
     filename = basename(abs_path)
     part_path = partfilepath(filename)
+    print_path = join(f'/{LOCAL_STORAGE_NAME}', path)
+    check_filename(filename)
+    check_foldername(print_path)
 
-    with open(part_path, 'w+b') as temp:
-        block = min(app.cached_size, req.content_length)
-        data = req.read(block)
-        while data:
-            uploaded += temp.write(data)
-            # checksum.update(data) # - we don't use the value yet
-            block = min(app.cached_size, req.content_length-uploaded)
-            if block > 1:
-                data = req.read(block)
-            else:
-                data = b''
-
-    # Mine a real mime_type from the file using magic
-    if req.mime_type == 'application/octet-stream':
-        mime_type = Magic(mime=True).from_file(abs_path)
-        if mime_type not in allowed_types:
-            unlink(abs_path)
-            raise conditions.UnsupportedMediaError()
-
-    if not overwrite:
-        if exists(abs_path):
-            raise conditions.FileAlreadyExists()
-
-    replace(part_path, abs_path)
+    transfer = app.daemon.prusa_link.printer.transfer
+    try:
+        transfer.start(const.TransferType.FROM_CLIENT,
+                       print_path,
+                       to_print=bool(print_after_upload))
+        transfer.size = req.content_length
+        transfer.start_ts = time()
+    except TransferRunningError as err:
+        raise conditions.TransferConflict() from err
+
+    receiving = app.daemon.prusa_link.print_while_receiving
+    receiving.expect_upload(part_path)
+    try:
+        receive_file(req, part_path, transfer)
+
+        # Mine a real mime_type from the file using magic
+        if req.mime_type == 'application/octet-stream':
+            mime_type = Magic(mime=True).from_file(abs_path)
+            if mime_type not in allowed_types:
+                unlink(abs_path)
+                raise conditions.UnsupportedMediaError()
+
+        if not overwrite:
+            if exists(abs_path):
+                raise conditions.FileAlreadyExists()
+
+        replace(part_path, abs_path)
+        if receiving.finished(transfer):
+            # The print has started during the upload
+            print_after_upload = False
+    except Exception:
+        receiving.aborted("The upload has failed")
+        raise
+    finally:
+        transfer.type = const.TransferType.NO_TRANSFER
 
     if print_after_upload:
         printer_state = app.daemon.prusa_link.printer.state
-        if printer_state in [const.State.IDLE, const.State.READY]:
+        if printer_state in [const.State.IDLE, const.State.READY] \
+                and not app.daemon.prusa_link.model.sd_copier.copying:
             tries = 0
-            print_path = join(f'/{LOCAL_STORAGE_NAME}', path)
-
             while not app.daemon.prusa_link.printer.fs.get(print_path):
                 sleep(0.1)
                 tries += 1
                 if tries >= 10:
                     raise conditions.RequestTimeout()
 
-            app.daemon.prusa_link.command_queue.do_command(
-                StartPrint(print_path))
+            # The file is uploaded, even if the print takes long to start
+            wait_for_command(req, app.daemon.prusa_link.command_queue.submit(
+                StartPrint(print_path)))
         else:
             raise conditions.NotStateToPrint()
 
     return Response(status_code=state.HTTP_CREATED)
 
 
+@app.route('/api/v1/files/<storage>/<path:re:.+>/copy-to-sd',
+           method=state.METHOD_POST)
+@check_api_digest
+def api_copy_to_sd(req, storage, path):
+    """Copy a local file to the SD card and optionally print it from there"""
+    if storage not in ('local', 'sdcard'):
+        raise conditions.StorageNotExist()
+
+    if storage == 'sdcard':
+        raise conditions.DestinationSameAsSource()
+
+    print_path = join(f'/{LOCAL_STORAGE_NAME}', path)
+    if not get_os_path(print_path):
+        raise conditions.FileNotFound()
+
+    prusa_link = app.daemon.prusa_link
+    if not prusa_link.sd_ready():
+        raise conditions.StorageNotExist()
+    if not prusa_link.sd_copier.is_idle():
+        raise conditions.NotStateToPrint()
+
+    print_after_copy = req.headers.get('Print-After-Copy') or "?0"
+    if print_after_copy not in ("?0", "?1"):
+        raise conditions.InvalidBooleanHeader()
+
+    try:
+        sd_path = prusa_link.sd_copier.copy(print_path,
+                                            to_print=print_after_copy == "?1")
+    except NotIdle as err:
+        raise conditions.NotStateToPrint() from err
+    except TransferRunningError as err:
+        raise conditions.TransferConflict() from err
+
+    return JSONResponse(path=sd_path, status_code=state.HTTP_CREATED)
+
+
 @app.route('/api/v1/files/<storage>/<path:re:.+(?!/raw)>',
            method=state.METHOD_DELETE)
 @check_api_digest
@@ -669,6 +763,14 @@ def api_delete(req, target, path):
     return Response(status_code=state.HTTP_NO_CONTENT)
 
 
+def transfer_rate(transfer):
+    """Return the current transfer speed in bytes per second."""
+    if transfer.type == const.TransferType.FROM_CLIENT:
+        return app.daemon.prusa_link.upload_scheduler.effective_rate
+    elapsed = time() - transfer.start_ts
+    return transfer.transferred / elapsed if elapsed > 0 else 0
+
+
 @app.route('/api/download')
 @app.route('/api/transfer')
 @check_api_digest
@@ -689,6 +791,7 @@ def api_transfer_info(req):
                 "progress": transfer.progress
                 and round(transfer.progress / 100, 4),
                 "remaining_time": transfer.time_remaining(),
+                "rate": int(transfer_rate(transfer)),
                 "to_select": transfer.to_select,
                 "to_print": transfer.to_print
             })
@@ -815,23 +918,33 @@ def api_download_abort(req):
 @app.route('/api/thumbnails/<path:re:.+>.orig.png')
 @check_api_digest
 def api_thumbnails(req, path):
-    """Returns preview from cache file."""
-    # pylint: disable=unused-argument
-    headers = {'Cache-Control': 'private, max-age=604800'}
+    """Returns the biggest preview from cache file."""
+    return thumbnail_response(req, path, BIG)
+
+
+@app.route('/api/thumbnails/<path:re:.+>.small.png')
+@check_api_digest
+def api_thumbnails_small(req, path):
+    """Returns the smallest preview from cache file."""
+    return thumbnail_response(req, path, SMALL)
+
+
+def thumbnail_response(req, path, size):
+    """Returns preview of the size from thumbnail cache."""
     os_path = get_os_path('/' + path)
-    if not os_path or not exists(os_path):
+    if not os_path:
         raise conditions.FileNotFound()
+    try:
+        etag = app.thumbnails.etag(os_path, size)
+    except OSError as err:
+        raise conditions.FileNotFound() from err
 
-    meta = FDMMetaData(get_os_path('/' + path))
-    if not meta.is_cache_fresh():
-        raise conditions.FileNotFound()
+    headers = {'Cache-Control': 'private, max-age=604800', 'ETag': etag}
+    if not_modified(req, etag):
+        return Response(status_code=state.HTTP_NOT_MODIFIED, headers=headers)
 
-    meta.load_cache()
-    if not meta.thumbnails:
+    data = app.thumbnails.get(os_path, size, etag)
+    if data is None:
         raise conditions.FileNotFound()
-
-    biggest = b''
-    for data in meta.thumbnails.values():
-        if len(data) > len(biggest):
-            biggest = data
-    return Response(decodebytes(biggest), headers=headers)
+    return bytes_response(req, data, "image/png", headers=headers,
+                          validator=etag)
@@ -3,16 +3,39 @@
 Main server classes for handling request.
 """
 import logging
+from collections import deque
+from queue import Empty, Full, Queue
+from selectors import EVENT_READ, DefaultSelector
+from socket import SHUT_RDWR, socketpair
 from socketserver import ThreadingMixIn
+from threading import Lock
+from time import monotonic
 from wsgiref.simple_server import ServerHandler, WSGIRequestHandler, WSGIServer
 
 from ... import __application__, __version__
+from ...const import HTTP_SOCKET_TIMEOUT, QUIT_INTERVAL
+from ...printer_adapter.updatable import Thread, prctl_name
+from .response import FileRange
 
 MAX_REQUEST_SIZE = 2048
+SERVICE_UNAVAILABLE = (b"HTTP/1.1 503 Service Unavailable\r\n"
+                       b"Content-Length: 0\r\n"
+                       b"Retry-After: 1\r\n"
+                       b"Connection: close\r\n\r\n")
 log = logging.getLogger(__name__)
 
 
-class ThreadingServer(ThreadingMixIn, WSGIServer):
+class SingleServer(WSGIServer):
+    """WSGIServer which handles one request at a time.
+
+    * additional error handler
+    """
+
+    def handle_error(self, request, client_address):
+        log.exception("Error for client %s", client_address[0])
+
+
+class ThreadingServer(ThreadingMixIn, SingleServer):
     """WSGIServer which run request in thread.
 
     * additional error handler
@@ -20,8 +43,165 @@ class ThreadingServer(ThreadingMixIn, WSGIServer):
     daemon_threads = True
     multithread = True
 
-    def handle_error(self, request, client_address):
-        log.exception("Error for client %s", client_address[0])
+
+class Connection:
+    """Client connection, which can serve more than one request."""
+
+    def __init__(self, sock, client_address):
+        self.socket = sock
+        self.client_address = client_address
+        self.rfile = sock.makefile('rb', -1)
+        self.wfile = sock.makefile('wb', -1)
+        self.idle_since = monotonic()
+
+    def has_buffered(self):
+        """Return True if next request data was already read."""
+        self.socket.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.socket.settimeout(HTTP_SOCKET_TIMEOUT)
+
+    def close(self):
+        """Close the connection."""
+        for file in (self.rfile, self.wfile):
+            try:
+                file.close()
+            except OSError:
+                pass
+        try:
+            self.socket.shutdown(SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+
+
+class PoolServer(SingleServer):
+    """WSGIServer with a fixed number of worker threads.
+
+    Accepted connections wait for a free worker in a bounded queue. When the
+    queue is full, clients get 503 Service Unavailable right away.
+    Connections are kept alive between requests. Idle ones are watched by
+    one thread, which closes them after keep_alive seconds.
+    """
+    multithread = True
+
+    def __init__(self, server_address, handler_class, workers=4,
+                 queue_size=16, keep_alive=5.0):
+        # pylint: disable=too-many-arguments
+        super().__init__(server_address, handler_class)
+        self.keep_alive = keep_alive
+        self.running = True
+        self.work_queue: Queue = Queue(maxsize=queue_size)
+
+        self.idle_lock = Lock()
+        self.parked: deque = deque()
+        self.wakeup_read, self.wakeup_write = socketpair()
+
+        self.threads = [
+            Thread(target=self._work, name=f"http_worker{i}", daemon=True)
+            for i in range(workers)
+        ]
+        self.threads.append(
+            Thread(target=self._watch_idle, name="http_idle", daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def process_request(self, request, client_address):
+        """Queue the new connection for a worker."""
+        request.settimeout(HTTP_SOCKET_TIMEOUT)
+        self._dispatch(Connection(request, client_address))
+
+    def _dispatch(self, connection):
+        """Pass the connection to a worker, or refuse it."""
+        try:
+            self.work_queue.put_nowait(connection)
+        except Full:
+            log.warning("Too many requests, refusing %s",
+                        connection.client_address[0])
+            try:
+                connection.socket.sendall(SERVICE_UNAVAILABLE)
+            except OSError:
+                pass
+            connection.close()
+
+    def _work(self):
+        """Serve connections from the queue."""
+        prctl_name()
+        while self.running:
+            try:
+                connection = self.work_queue.get(timeout=QUIT_INTERVAL)
+            except Empty:
+                continue
+            self._serve(connection)
+
+    def _serve(self, connection):
+        """Serve requests until the connection is idle or closed."""
+        try:
+            while True:
+                handler = self.RequestHandlerClass(connection,
+                                                   connection.client_address,
+                                                   self)
+                if getattr(handler, "close_connection", True):
+                    break
+                if not connection.has_buffered():
+                    self._park(connection)
+                    return
+        except OSError as exc:
+            log.debug("Connection from %s lost: %s",
+                      connection.client_address[0], exc)
+        except Exception:  # pylint: disable=broad-except
+            self.handle_error(connection.socket, connection.client_address)
+        connection.close()
+
+    def _park(self, connection):
+        """Hand the idle connection over to the idle watcher."""
+        connection.idle_since = monotonic()
+        with self.idle_lock:
+            self.parked.append(connection)
+        self.wakeup_write.send(b"\0")
+
+    def _watch_idle(self):
+        """Wait for idle connections to send a request or time out."""
+        prctl_name()
+        with DefaultSelector() as selector:
+            selector.register(self.wakeup_read, EVENT_READ)
+            while self.running:
+                with self.idle_lock:
+                    while self.parked:
+                        connection = self.parked.popleft()
+                        selector.register(connection.socket, EVENT_READ,
+                                          connection)
+
+                for key, _ in selector.select(timeout=QUIT_INTERVAL):
+                    if key.data is None:
+                        self.wakeup_read.recv(4096)
+                        continue
+                    selector.unregister(key.fileobj)
+                    self._dispatch(key.data)
+
+                now = monotonic()
+                for key in list(selector.get_map().values()):
+                    if key.data is None:
+                        continue
+                    if now - key.data.idle_since > self.keep_alive:
+                        selector.unregister(key.fileobj)
+                        key.data.close()
+
+            for key in list(selector.get_map().values()):
+                if key.data is not None:
+                    key.data.close()
+
+    def server_close(self):
+        """Stop the workers too."""
+        super().server_close()
+        self.running = False
+        for thread in self.threads:
+            thread.join()
+        self.wakeup_read.close()
+        self.wakeup_write.close()
 
 
 class LinkHandler(ServerHandler):
@@ -34,10 +214,81 @@ class LinkHandler(ServerHandler):
         """Just skip old stderr functionality."""
         log.exception("Error handling")
 
+    def sendfile(self):
+        """Send file result by sendfile system call.
+
+        Besides FileRange, files wrapped by wsgi.file_wrapper are sent from
+        their current position, if the Content-Length is known."""
+        if self.request_handler is None:
+            return False
+        file = self.result.filelike
+        if isinstance(self.result, FileRange):
+            offset, length = self.result.offset, self.result.length
+        else:
+            try:
+                file.fileno()
+                offset = file.tell()
+                length = int(self.headers['Content-Length'])
+            except (AttributeError, OSError, TypeError, ValueError):
+                return False
+
+        if not self.headers_sent:
+            self.bytes_sent = length
+            self.send_headers()
+        self._flush()
+        if length:
+            self.request_handler.connection.sendfile(file, offset, length)
+        return True
+
+
+class PersistentLinkHandler(LinkHandler):
+    """Answers with HTTP/1.1 and decides if the connection can stay open."""
+
+    http_version = "1.1"
+
+    def cleanup_headers(self):
+        """Close the connection if the response or request could not be
+        delimited."""
+        super().cleanup_headers()
+        request_handler = self.request_handler
+        delimited = 'Content-Length' in self.headers \
+            or self.status[:3] in ('204', '304')
+        # The application does not have to read the whole body
+        has_body = int(self.environ.get('CONTENT_LENGTH') or 0) > 0 \
+            or 'HTTP_TRANSFER_ENCODING' in self.environ
+        if not delimited or has_body:
+            request_handler.close_connection = True
+        if request_handler.close_connection:
+            self.headers['Connection'] = 'close'
+
+    def is_head(self):
+        """Return True for HEAD requests, which get no response body."""
+        return self.environ.get('REQUEST_METHOD') == 'HEAD'
+
+    def write(self, data):
+        """Write the data, only the headers for HEAD requests.
+
+        Otherwise the body would be read as the start of the next
+        response on the same connection."""
+        if not self.is_head():
+            super().write(data)
+        elif not self.headers_sent:
+            self.bytes_sent = len(data)
+            self.send_headers()
+
+    def sendfile(self):
+        """Send only the headers of file responses to HEAD requests."""
+        if not self.is_head():
+            return super().sendfile()
+        if not self.headers_sent:
+            self.send_headers()
+        return True
+
 
 class RequestHandler(WSGIRequestHandler):
     """For custom handle, log_message and log_error methods."""
     server_version = f"{__application__}/{__version__}"
+    handler_class = LinkHandler
 
     # pylint: disable=redefined-builtin
     def log_message(self, format, *args):
@@ -52,7 +303,11 @@ class RequestHandler(WSGIRequestHandler):
         """Handle a single HTTP request"""
 
         self.raw_requestline = self.rfile.readline(MAX_REQUEST_SIZE)
+        if not self.raw_requestline:  # Client closed the connection
+            self.close_connection = True
+            return
         if len(self.raw_requestline) > MAX_REQUEST_SIZE:
+            self.close_connection = True
             self.requestline = ''
             self.request_version = ''
             self.command = ''
@@ -63,7 +318,7 @@ class RequestHandler(WSGIRequestHandler):
             log.error("Parse request error.")
             return
 
-        handler = LinkHandler(
+        handler = self.handler_class(
             self.rfile,
             self.wfile,
             self.get_stderr(),
@@ -72,3 +327,20 @@ class RequestHandler(WSGIRequestHandler):
         )
         handler.request_handler = self  # backpointer for logging
         handler.run(self.server.get_app())
+
+
+class PersistentRequestHandler(RequestHandler):
+    """RequestHandler for PoolServer, which keeps the connection open."""
+    protocol_version = "HTTP/1.1"
+    handler_class = PersistentLinkHandler
+
+    def setup(self):
+        """Use the files of a connection, which outlives this handler."""
+        self.connection = self.request.socket
+        self.rfile = self.request.rfile
+        self.wfile = self.request.wfile
+
+    def finish(self):
+        """Send the response, but do not close the connection."""
+        if not self.wfile.closed:
+            self.wfile.flush()
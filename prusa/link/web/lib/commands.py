@@ -0,0 +1,46 @@
+"""Responses to the requests enqueuing printer commands
+
+Commands like starting a print can take long. Waiting for them would hold
+the HTTP thread, so when not done in a moment, the request gets HTTP 202
+with the URL, where the state of the command can be polled. Clients
+sending Prefer: respond-async get that right away.
+"""
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from poorwsgi import state
+from poorwsgi.response import JSONResponse, Response
+
+from ...const import COMMAND_RESPONSE_TIMEOUT
+from ...printer_adapter.command_queue import CommandAdapter
+
+
+def status_url(adapter: CommandAdapter) -> str:
+    """The URL of the command state"""
+    return f"/api/v1/commands/{adapter.number}"
+
+
+def wait_for_command(req, adapter: CommandAdapter) -> bool:
+    """
+    Waits a moment for the command, unless the client prefers not to
+    :return: True if it's done
+    :raises CommandFailed: when the command failed in time
+    """
+    respond_async = "respond-async" in req.headers.get("Prefer", "")
+    try:
+        adapter.result(0 if respond_async else COMMAND_RESPONSE_TIMEOUT)
+    except FutureTimeoutError:
+        return False
+    return True
+
+
+def command_response(req, adapter: CommandAdapter):
+    """
+    Returns HTTP 204 when the command is done in time, HTTP 202 with
+    the status URL, when it's still queued or running
+    :raises CommandFailed: when the command failed in time
+    """
+    if wait_for_command(req, adapter):
+        return Response(status_code=state.HTTP_NO_CONTENT)
+    return JSONResponse(status_code=state.HTTP_ACCEPTED,
+                        headers={"Location": status_url(adapter)},
+                        **adapter.status())
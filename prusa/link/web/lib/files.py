@@ -32,14 +32,15 @@ def get_os_path(abs_path):
 
 def local_refs(path, thumbnails):
     """Make refs structure for file on local storage."""
-    thumbnail = None
+    thumbnail_small = thumbnail_big = None
     if thumbnails:
-        thumbnail = f"/api/thumbnails{path}.orig.png"
+        thumbnail_small = f"/api/thumbnails{path}.small.png"
+        thumbnail_big = f"/api/thumbnails{path}.orig.png"
     return {
         'resource': f"/api/files/local{path}",
         'download': f"/api/files/local{path}/raw",
-        'thumbnailSmall': None,
-        'thumbnailBig': thumbnail,
+        'thumbnailSmall': thumbnail_small,
+        'thumbnailBig': thumbnail_big,
     }
 
 
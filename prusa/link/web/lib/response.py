@@ -0,0 +1,166 @@
+"""Responses with HTTP Range support
+
+Files are returned wrapped in FileRange, so the WSGI handler can send them
+with the sendfile system call instead of copying them through Python.
+"""
+import mimetypes
+from os import fstat
+from typing import Optional, Tuple
+from wsgiref.util import FileWrapper
+
+from poorwsgi import state
+from poorwsgi.headers import Headers, time_to_http
+from poorwsgi.response import BaseResponse, HTTPException, Response
+
+BLOCK_SIZE = 64 * 1024
+
+
+class FileRange(FileWrapper):
+    """Iterable over a part of the file, which is what is sent to client.
+
+    LinkHandler sends it by sendfile, iterating is the fallback."""
+
+    def __init__(self, filelike, offset: int, length: int):
+        super().__init__(filelike, BLOCK_SIZE)
+        self.offset = offset
+        self.length = length
+
+    def __iter__(self):
+        self.filelike.seek(self.offset)
+        remaining = self.length
+        while remaining > 0:
+            data = self.filelike.read(min(self.blksize, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+class FileRangeResponse(BaseResponse):
+    """Response returning the whole opened file or its part."""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, file, offset: int, length: int,
+                 content_type: str, headers: Headers,
+                 status_code: int = state.HTTP_OK):
+        super().__init__(content_type=content_type, headers=headers,
+                         status_code=status_code)
+        self.file = file
+        self.offset = offset
+        self._content_length = length
+        self.headers['Content-Length'] = str(length)
+
+    def __end_of_response__(self):
+        return FileRange(self.file, self.offset, self._content_length)
+
+
+def get_range(req, size: int,
+              validator: Optional[str] = None) -> Optional[Tuple[int, int]]:
+    """Return the first and the last byte of requested range.
+
+    Only one range in bytes is supported, for anything else, None is
+    returned, which means the whole content. So is for If-Range
+    header, which does not match the validator.
+
+    :raises HTTPException: with 416 response if the range is out of content
+    """
+    value = req.headers.get('Range')
+    if not value or req.method not in ('GET', 'HEAD'):
+        return None
+    if_range = req.headers.get('If-Range')
+    if if_range and if_range != validator:
+        return None
+
+    units, _, spec = value.partition('=')
+    first, dash, last = spec.strip().partition('-')
+    if units.strip().lower() != 'bytes' or not dash:
+        return None
+    if not (first.isdigit() or first == '') or \
+            not (last.isdigit() or last == ''):
+        return None  # more ranges, or invalid one
+
+    if first:
+        start = int(first)
+        end = int(last) if last else size - 1
+        if last and end < start:
+            return None
+    elif last:
+        # the last N bytes, zero of them can't be satisfied
+        start = max(0, size - int(last)) if int(last) else size
+        end = size - 1
+    else:
+        return None
+
+    if start >= size:
+        raise HTTPException(
+            Response(status_code=state.HTTP_RANGE_NOT_SATISFIABLE,
+                     headers={'Content-Range': f'bytes */{size}'}))
+    return start, min(end, size - 1)
+
+
+def partial_headers(headers: Headers, byte_range, size: int) -> int:
+    """Set the range headers, return the response status code."""
+    headers['Accept-Ranges'] = 'bytes'
+    if byte_range is None:
+        return state.HTTP_OK
+    headers['Content-Range'] = f'bytes {byte_range[0]}-{byte_range[1]}/{size}'
+    return state.HTTP_PARTIAL_CONTENT
+
+
+def file_response(req, path, content_type=None, headers=None):
+    """Return file or its requested range.
+
+    Used instead of poorwsgi FileResponse, which reads a range into memory.
+    """
+    if content_type is None:
+        content_type = mimetypes.guess_type(path)[0] \
+            or 'application/octet-stream'
+
+    file = open(path, 'rb')  # pylint: disable=consider-using-with
+    try:
+        stat = fstat(file.fileno())
+        headers = Headers(headers or {})
+        if 'Last-Modified' not in headers:
+            headers['Last-Modified'] = time_to_http(stat.st_mtime)
+        byte_range = get_range(req, stat.st_size,
+                               headers.get('ETag', headers['Last-Modified']))
+    except BaseException:
+        file.close()
+        raise
+
+    status_code = partial_headers(headers, byte_range, stat.st_size)
+    offset, length = 0, stat.st_size
+    if byte_range is not None:
+        offset, length = byte_range[0], byte_range[1] - byte_range[0] + 1
+    return FileRangeResponse(file, offset, length, content_type, headers,
+                             status_code)
+
+
+def bytes_response(req, data: bytes, content_type, headers=None,
+                   validator=None):
+    """Return data in memory or its requested range."""
+    byte_range = get_range(req, len(data), validator)
+    headers = Headers(headers or {})
+    status_code = partial_headers(headers, byte_range, len(data))
+    if byte_range is not None:
+        data = data[byte_range[0]:byte_range[1] + 1]
+    return Response(data, content_type=content_type, headers=headers,
+                    status_code=status_code)
+
+
+def not_modified(req, etag: str) -> bool:
+    """Does the If-None-Match header match the etag?"""
+    value = req.headers.get('If-None-Match')
+    if not value:
+        return False
+    if value.strip() == '*':
+        return True
+    # weak comparison
+    etag = etag[2:] if etag.startswith('W/') else etag
+    for item in value.split(','):
+        item = item.strip()
+        if item.startswith('W/'):
+            item = item[2:]
+        if item == etag:
+            return True
+    return False
@@ -0,0 +1,188 @@
+"""Static files of the web user interface
+
+All files are indexed at startup with their strong ETags. Compressed
+siblings (.br, .gz) are served to clients accepting them. Missing or stale
+siblings are generated when the index is built, if the static directory
+is writable.
+"""
+import gzip
+import logging
+import mimetypes
+import re
+from hashlib import sha256
+from os import replace, stat, unlink, walk
+from os.path import exists, join, normpath, relpath
+from typing import Dict, Optional, Tuple
+
+from poorwsgi import state
+from poorwsgi.response import HTTPException, Response
+
+from .response import file_response, not_modified
+
+try:
+    import brotli  # type: ignore
+except ImportError:
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+# webpack style content hash in the file name
+FINGERPRINT_REGEX = re.compile(r"(^|[._-])[0-9a-f]{16,}\.")
+COMPRESSIBLE = ("text/", "application/javascript", "application/json",
+                "application/xml", "image/svg+xml", "image/vnd.microsoft.icon",
+                "image/x-icon")
+MIN_COMPRESS_SIZE = 512
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+# encoding: suffix, in order of preference
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+
+def compress_gzip(data: bytes) -> bytes:
+    """Gzip the data, without time in header, so the output is stable"""
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def compress_brotli(data: bytes) -> bytes:
+    """Compress the data using brotli"""
+    return brotli.compress(data)
+
+
+COMPRESSORS = {"gzip": compress_gzip}
+if brotli is not None:
+    COMPRESSORS["br"] = compress_brotli
+
+
+def accepted_encoding(req, available):
+    """Return the best encoding from available accepted by client."""
+    accepted: Dict[str, float] = {}
+    for item in req.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    for encoding in ENCODINGS:
+        if encoding in available \
+                and accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+class StaticFile:
+    """Indexed static file and its compressed siblings."""
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, path: str, content_type: str, etag: str,
+                 immutable: bool):
+        self.path = path
+        self.content_type = content_type
+        self.etag = etag
+        self.immutable = immutable
+        # encoding: (path, etag)
+        self.encodings: Dict[str, Tuple[str, str]] = {}
+
+
+class StaticIndex:
+    """In-memory index of static files."""
+
+    def __init__(self, root: str):
+        self.root = root
+        self.files: Dict[str, StaticFile] = {}
+
+    def build(self, compress=True):
+        """Index the static directory, compress the files if needed."""
+        files = {}
+        suffixes = tuple(ENCODINGS.values())
+        for dirpath, _, filenames in walk(self.root):
+            for filename in filenames:
+                if filename.endswith(suffixes):
+                    continue
+                path = join(dirpath, filename)
+                try:
+                    files['/' + relpath(path, self.root)] = \
+                        self.index_file(path, filename, compress)
+                except OSError as err:
+                    log.warning("Can't index static file %s: %s", path, err)
+        self.files = files
+        log.info("Indexed %d static files", len(files))
+
+    @staticmethod
+    def index_file(path, filename, compress):
+        """Create StaticFile for path, compress it if possible."""
+        with open(path, 'rb') as file:
+            data = file.read()
+        digest = sha256(data).hexdigest()[:20]
+        content_type = mimetypes.guess_type(filename)[0] \
+            or 'application/octet-stream'
+        entry = StaticFile(path, content_type, f'"{digest}"',
+                           bool(FINGERPRINT_REGEX.search(filename)))
+
+        compressible = content_type.startswith(COMPRESSIBLE) \
+            and len(data) >= MIN_COMPRESS_SIZE
+        mtime = stat(path).st_mtime
+        for encoding, suffix in ENCODINGS.items():
+            sibling = path + suffix
+            fresh = exists(sibling) and stat(sibling).st_mtime >= mtime
+            if not fresh and compress and compressible \
+                    and encoding in COMPRESSORS:
+                fresh = StaticIndex.write_sibling(
+                    sibling, COMPRESSORS[encoding](data))
+            if fresh:
+                entry.encodings[encoding] = \
+                    (sibling, f'"{digest}-{suffix[1:]}"')
+        return entry
+
+    @staticmethod
+    def write_sibling(path, data):
+        """Atomically write compressed file, return True on success."""
+        tmp_path = path + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as file:
+                file.write(data)
+            replace(tmp_path, path)
+            return True
+        except OSError as err:
+            log.debug("Can't write compressed static file %s: %s", path, err)
+            if exists(tmp_path):
+                unlink(tmp_path)
+            return False
+
+    def get(self, path) -> Optional[StaticFile]:
+        """Return indexed file for URL path."""
+        return self.files.get(normpath('/' + path.lstrip('/')))
+
+    def response(self, req, path=None):
+        """Return the static file or its best compressed sibling."""
+        entry = self.get(path or req.path)
+        if entry is None:
+            raise HTTPException(state.HTTP_NOT_FOUND)
+
+        os_path, etag = entry.path, entry.etag
+        encoding = accepted_encoding(req, entry.encodings)
+        if encoding:
+            os_path, etag = entry.encodings[encoding]
+
+        headers = {
+            'ETag': etag,
+            'Cache-Control': IMMUTABLE if entry.immutable else REVALIDATE}
+        if entry.encodings:
+            headers['Vary'] = 'Accept-Encoding'
+        if not_modified(req, etag):
+            return Response(status_code=state.HTTP_NOT_MODIFIED,
+                            headers=headers)
+
+        if encoding:
+            headers['Content-Encoding'] = encoding
+        try:
+            return file_response(req, os_path, entry.content_type, headers)
+        except FileNotFoundError as err:
+            log.warning("Static file %s disappeared", os_path)
+            raise HTTPException(state.HTTP_NOT_FOUND) from err
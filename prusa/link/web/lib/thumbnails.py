@@ -0,0 +1,141 @@
+"""Cache of decoded thumbnails
+
+Thumbnails are stored base64 encoded in the metadata cache of each gcode.
+Loading the metadata and decoding the image for every request is slow,
+so decoded images are kept in a bounded LRU cache and optionally on disk.
+They are identified by the gcode path, its modification time and size,
+so a changed file never gets an old thumbnail.
+"""
+import logging
+import re
+from base64 import decodebytes
+from collections import OrderedDict
+from hashlib import sha256
+from os import listdir, makedirs, replace, stat, unlink
+from os.path import getmtime, join
+from threading import Lock
+from typing import Dict, Optional
+
+from prusa.connect.printer.metadata import FDMMetaData
+
+from ...const import THUMBNAIL_DISK_FILES
+
+log = logging.getLogger(__name__)
+
+SMALL = "small"
+BIG = "orig"
+DIMENSIONS_REGEX = re.compile(r"(\d+)x(\d+)")
+
+
+def thumbnail_area(key: str) -> int:
+    """Return the area of thumbnail from its metadata key like 220x124"""
+    match = DIMENSIONS_REGEX.search(key)
+    if not match:
+        return 0
+    return int(match.group(1)) * int(match.group(2))
+
+
+def pick_thumbnail(thumbnails: Dict[str, bytes], size: str) -> bytes:
+    """Return the smallest or the biggest thumbnail."""
+    if size == SMALL:
+        key = min(thumbnails, key=thumbnail_area)
+    else:
+        key = max(thumbnails, key=thumbnail_area)
+    return thumbnails[key]
+
+
+class ThumbnailCache:
+    """LRU cache of decoded thumbnails bounded by their total size."""
+
+    def __init__(self, max_size: int, directory: Optional[str] = None):
+        self.max_size = max_size
+        self.directory = directory
+        self.lock = Lock()
+        self.cache: OrderedDict = OrderedDict()
+        self.cached_size = 0
+
+        if directory:
+            try:
+                makedirs(directory, exist_ok=True)
+            except OSError as err:
+                log.warning("Thumbnail cache directory is not usable: %s",
+                            err)
+                self.directory = None
+
+    @staticmethod
+    def etag(os_path: str, size: str) -> str:
+        """Return ETag identifying the thumbnail of the actual file.
+
+        :raises OSError: if the file does not exist
+        """
+        stat_ = stat(os_path)
+        key = f"{os_path}:{stat_.st_mtime_ns}:{stat_.st_size}:{size}"
+        return f'"{sha256(key.encode()).hexdigest()[:20]}"'
+
+    def get(self, os_path: str, size: str, etag: str) -> Optional[bytes]:
+        """Return the decoded thumbnail or None if the file has none."""
+        with self.lock:
+            data = self.cache.get(etag)
+            if data is not None:
+                self.cache.move_to_end(etag)
+                return data
+
+        data = self.load(etag)
+        if data is None:
+            data = self.decode(os_path, size)
+            if data is None:
+                return None
+            self.save(etag, data)
+
+        with self.lock:
+            if etag not in self.cache:
+                self.cache[etag] = data
+                self.cached_size += len(data)
+            while self.cached_size > self.max_size and len(self.cache) > 1:
+                _, old = self.cache.popitem(last=False)
+                self.cached_size -= len(old)
+        return data
+
+    @staticmethod
+    def decode(os_path: str, size: str) -> Optional[bytes]:
+        """Load thumbnail from the metadata cache."""
+        meta = FDMMetaData(os_path)
+        if not meta.is_cache_fresh():
+            return None
+        meta.load_cache()
+        if not meta.thumbnails:
+            return None
+        return decodebytes(pick_thumbnail(meta.thumbnails, size))
+
+    def disk_path(self, etag: str) -> str:
+        """Return path of the thumbnail in the disk cache."""
+        return join(self.directory, etag.strip('"') + ".png")
+
+    def load(self, etag: str) -> Optional[bytes]:
+        """Load the thumbnail from disk cache."""
+        if not self.directory:
+            return None
+        try:
+            with open(self.disk_path(etag), "rb") as file:
+                return file.read()
+        except OSError:
+            return None
+
+    def save(self, etag: str, data: bytes):
+        """Save the thumbnail to disk cache and forget the oldest ones."""
+        if not self.directory:
+            return
+        path = self.disk_path(etag)
+        try:
+            with open(path + ".tmp", "wb") as file:
+                file.write(data)
+            replace(path + ".tmp", path)
+
+            files = [join(self.directory, name)
+                     for name in listdir(self.directory)]
+            if len(files) > THUMBNAIL_DISK_FILES:
+                files.sort(key=getmtime)
+                for old in files[:len(files) - THUMBNAIL_DISK_FILES]:
+                    unlink(old)
+        except OSError as err:
+            log.debug("Can't save thumbnail to disk cache: %s", err)
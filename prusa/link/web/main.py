@@ -1,35 +1,45 @@
 """Main pages and core API"""
 import logging
+from datetime import datetime
 from os import listdir
 from os.path import basename, getmtime, getsize, join
 from socket import gethostname
 from subprocess import Popen
 from sys import version
+from time import time
 
-from pkg_resources import working_set
 from poorwsgi import state
 from poorwsgi.digest import check_digest
-from poorwsgi.response import (EmptyResponse, FileResponse, JSONResponse,
-                               Response)
+from poorwsgi.response import EmptyResponse, JSONResponse, Response
 from prusa.connect.printer import __version__ as sdk_version
 from prusa.connect.printer.const import Source, State
 from prusa.connect.printer.metadata import get_metadata
 
 from .. import __version__, conditions
 from ..const import (GZ_SUFFIX, LOCAL_STORAGE_NAME, LOGS_FILES, LOGS_PATH,
-                     instance_id, LimitsMK3S)
+                     PROFILER_MAX_DURATION, instance_id, LimitsMK3S)
+from ..metrics import registry
 from ..printer_adapter.command import CommandFailed
 from ..printer_adapter.command_handlers import (PausePrint, ResumePrint,
                                                 SetReady, StartPrint,
                                                 StopPrint)
 from ..printer_adapter.job import Job, JobState
+from ..sampling_profiler import ProfilerBusy, sampling_profiler
+from ..serial.instruction_tracer import instruction_tracer
 from .lib.auth import REALM, check_api_digest, check_config
+from .lib.commands import command_response
 from .lib.core import app
 from .lib.files import gcode_analysis, gcode_analysis_sd, get_os_path
+from .lib.response import file_response
 from .lib.view import package_to_api
 
 log = logging.getLogger(__name__)
 
+REQUEST_SECONDS = registry.histogram(
+    "prusalink_http_request_seconds",
+    "How long it took to handle an HTTP request, without streaming the body",
+    ("method", "route", "status"))
+
 PRINTER_STATES = {
     State.IDLE: "Operational",
     State.READY: "Operational",
@@ -89,8 +99,13 @@ def instance(req):
 @check_digest(REALM)
 def index(req):
     """Return status page"""
-    # pylint: disable=unused-argument
-    return FileResponse(join(app.document_root, 'index.html'))
+    return app.static.response(req, '/index.html')
+
+
+@app.default(method=state.METHOD_GET | state.METHOD_HEAD)
+def static_file(req):
+    """Return static file of the web user interface"""
+    return app.static.response(req)
 
 
 @app.route('/sockjs/websocket')
@@ -124,7 +139,6 @@ def api_logs(req):
 @check_api_digest
 def api_log(req, filename):
     """Returns content of intended log file"""
-    # pylint: disable=unused-argument
     if not filename.startswith(LOGS_FILES):
         return Response(status_code=state.HTTP_NOT_FOUND)
 
@@ -132,7 +146,88 @@ def api_log(req, filename):
     headers_ = {}
     if path_.endswith(GZ_SUFFIX):
         headers_ = {"Content-Encoding": "gzip"}
-    return FileResponse(path_, content_type="text/plain", headers=headers_)
+    return file_response(req, path_, content_type="text/plain",
+                         headers=headers_)
+
+
+@app.after_response()
+def measure_request(req, res):
+    """Observes the request handling time per route"""
+    REQUEST_SECONDS.labels(req.method, req.uri_rule or "unknown",
+                           str(res.status_code)).observe(
+                               time() - req.start_time)
+    return res
+
+
+@app.route('/metrics')
+@check_api_digest
+def api_metrics(req):
+    """Returns the metrics in the Prometheus text format"""
+    # pylint: disable=unused-argument
+    return Response(registry.expose(),
+                    content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.route('/api/v1/profile')
+@check_api_digest
+def api_profile(req):
+    """Samples the stacks of all the threads for the given seconds, returns
+    them as collapsed stacks or as a speedscope file"""
+    output = req.args.get("format", "collapsed")
+    if output not in ("collapsed", "speedscope"):
+        return JSONResponse(
+            status_code=state.HTTP_BAD_REQUEST,
+            title='UNKNOWN FORMAT',
+            message='Choose either: "collapsed" or "speedscope".')
+    try:
+        seconds = float(req.args.get("seconds", 10))
+    except ValueError:
+        seconds = -1
+    if not 0 < seconds <= PROFILER_MAX_DURATION:
+        return JSONResponse(
+            status_code=state.HTTP_BAD_REQUEST,
+            title='INVALID DURATION',
+            message=f'Seconds have to be between 0 and '
+                    f'{PROFILER_MAX_DURATION}.')
+    try:
+        samples = sampling_profiler.profile(seconds)
+    except ProfilerBusy:
+        return JSONResponse(status_code=state.HTTP_CONFLICT,
+                            title='ALREADY PROFILING',
+                            message='Another profile is being taken.')
+
+    if output == "speedscope":
+        return Response(samples.speedscope(),
+                        content_type="application/json",
+                        headers={"Content-Disposition":
+                                 'attachment; filename="prusalink.speedscope'
+                                 '.json"'})
+    return Response(samples.collapsed(), content_type="text/plain")
+
+
+@app.route('/api/v1/trace')
+@check_api_digest
+def api_trace(req):
+    """Returns the traced instructions as Chrome trace events"""
+    # pylint: disable=unused-argument
+    if not instruction_tracer.enabled:
+        return JSONResponse(
+            status_code=state.HTTP_CONFLICT,
+            title='TRACING DISABLED',
+            message='Set trace_instructions in the printer section '
+                    'of the config to trace the instructions.')
+    return JSONResponse(headers={"Content-Disposition":
+                                 'attachment; filename="prusalink.trace'
+                                 '.json"'},
+                        **instruction_tracer.chrome_trace())
+
+
+@app.route('/api/v1/startup')
+@check_api_digest
+def api_startup(req):
+    """Returns how long did the startup steps take"""
+    # pylint: disable=unused-argument
+    return JSONResponse(**app.daemon.prusa_link.startup.report())
 
 
 @app.route('/api/v1/info')
@@ -177,7 +272,9 @@ def api_version(req):
     }
 
     if req.args.get('system'):
-        # pylint: disable=not-an-iterable
+        # pkg_resources scans all the installed packages on import
+        # pylint: disable=import-outside-toplevel, not-an-iterable
+        from pkg_resources import working_set
         retval['python'] = [package_to_api(pkg) for pkg in working_set]
         retval['system'] = {'python': version}
         try:
@@ -306,15 +403,64 @@ def api_cancel_ready(req):
     return Response(status_code=state.HTTP_CONFLICT)
 
 
+def format_size(size):
+    """Returns the size in a human readable form, like OctoPrint does."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}TB"
+
+
+def timelapse_item(item):
+    """Returns the timelapse video or recording in the API format."""
+    item = dict(item)
+    item['size'] = format_size(item['bytes'])
+    item['date'] = datetime.fromtimestamp(item['date']).strftime(
+        "%Y-%m-%d %H:%M")
+    return item
+
+
 @app.route('/api/timelapse')
 @check_api_digest
 def api_timelapse(req):
     """Returns timelapse information."""
     # pylint: disable=unused-argument
-    return JSONResponse(config={'type': 'off'},
-                        enabled=False,
-                        files=[],
-                        unrendered=[])
+    timelapse = app.daemon.prusa_link.timelapse
+    files = []
+    for video in timelapse.videos():
+        item = timelapse_item(video)
+        item['url'] = f"/downloads/timelapse/{video['name']}"
+        files.append(item)
+    return JSONResponse(config={'type': 'zchange'
+                                if timelapse.enabled else 'off'},
+                        enabled=timelapse.enabled,
+                        files=files,
+                        unrendered=[timelapse_item(recording) for recording
+                                    in timelapse.unrendered()])
+
+
+@app.route('/api/timelapse/<filename>', method=state.METHOD_DELETE)
+@check_api_digest
+def api_timelapse_delete(req, filename):
+    """Deletes a timelapse video or recording"""
+    # pylint: disable=unused-argument
+    timelapse = app.daemon.prusa_link.timelapse
+    if filename in {timelapse.recording, timelapse.rendering}:
+        return Response(status_code=state.HTTP_CONFLICT)
+    if not timelapse.delete(filename):
+        raise conditions.FileNotFound()
+    return Response(status_code=state.HTTP_NO_CONTENT)
+
+
+@app.route('/downloads/timelapse/<filename>')
+@check_api_digest
+def api_timelapse_download(req, filename):
+    """Returns the timelapse video"""
+    path_ = app.daemon.prusa_link.timelapse.video_path(filename)
+    if path_ is None:
+        raise conditions.FileNotFound()
+    return file_response(req, path_, content_type="video/x-msvideo")
 
 
 @app.route('/api/job')
@@ -402,6 +548,7 @@ def api_job_command(req):
     command = req.json.get("command")
     command_queue = app.daemon.prusa_link.command_queue
 
+    adapter = None
     try:
         if command == "pause":
             if job_data.job_state != JobState.IN_PROGRESS:
@@ -409,18 +556,20 @@ def api_job_command(req):
 
             action = req.json.get("action")
             if action == 'pause' and printer_state == State.PRINTING:
-                command_queue.do_command(PausePrint(source=Source.WUI))
+                adapter = command_queue.submit(PausePrint(source=Source.WUI))
             elif action == 'resume' and printer_state == State.PAUSED:
-                command_queue.do_command(ResumePrint(source=Source.WUI))
+                adapter = command_queue.submit(ResumePrint(source=Source.WUI))
             elif action == 'toogle':
                 if printer_state == State.PAUSED:
-                    command_queue.do_command(ResumePrint(source=Source.WUI))
+                    adapter = command_queue.submit(
+                        ResumePrint(source=Source.WUI))
                 elif printer_state == State.PRINTING:
-                    command_queue.do_command(PausePrint(source=Source.WUI))
+                    adapter = command_queue.submit(
+                        PausePrint(source=Source.WUI))
 
         elif command == "cancel":
             if job_data.job_state == JobState.IN_PROGRESS:
-                command_queue.do_command(StopPrint(source=Source.WUI))
+                adapter = command_queue.submit(StopPrint(source=Source.WUI))
             elif job_data.job_state == JobState.IDLE:
                 job.deselect_file()
             else:
@@ -429,9 +578,14 @@ def api_job_command(req):
         elif command == "start":
             if job_data.job_state != JobState.IDLE:
                 raise conditions.CurrentlyPrinting()
+            if app.daemon.prusa_link.model.sd_copier.copying:
+                raise conditions.NotStateToPrint()
             if job_data.selected_file_path:
-                command_queue.do_command(
+                adapter = command_queue.submit(
                     StartPrint(job.data.selected_file_path, source=Source.WUI))
+
+        if adapter is not None:
+            return command_response(req, adapter)
     except CommandFailed as err:
         return JSONResponse(status_code=state.HTTP_INTERNAL_SERVER_ERROR,
                             title='COMMAND FAILED',
@@ -441,6 +595,19 @@ def api_job_command(req):
     return Response(status_code=state.HTTP_NO_CONTENT)
 
 
+@app.route('/api/v1/commands/<number:int>')
+@check_api_digest
+def api_command_state(req, number):
+    """Returns the state of a recently enqueued command"""
+    # pylint: disable=unused-argument
+    adapter = app.daemon.prusa_link.command_queue.get_command(number)
+    if adapter is None:
+        return JSONResponse(status_code=state.HTTP_NOT_FOUND,
+                            title='COMMAND NOT FOUND',
+                            message='The command is unknown or too old.')
+    return JSONResponse(**adapter.status())
+
+
 @app.route("/api/system/commands")
 @check_api_digest
 def api_system_commands(req):
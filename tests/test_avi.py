@@ -0,0 +1,70 @@
+"""Tests of the Motion-JPEG AVI writer used for timelapses"""
+import struct
+from io import BytesIO
+
+import pytest
+
+from prusa.link.avi import jpeg_size, write_mjpeg_avi  # type:ignore
+
+
+def fake_jpeg(width, height, payload=b""):
+    """Just the markers the writer cares about"""
+    sof = struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    return (b"\xff\xd8"
+            + b"\xff\xe0" + struct.pack(">H", 4) + b"JF"
+            + b"\xff\xc0" + sof
+            + payload + b"\xff\xd9")
+
+
+def chunks(data, start, end):
+    """Yields fourcc, offset and size of the chunks in the range"""
+    while start < end:
+        fourcc, size = struct.unpack("<4sI", data[start:start + 8])
+        yield fourcc, start, size
+        start += 8 + size + size % 2
+
+
+def test_jpeg_size():
+    """The size is read from the start of frame marker"""
+    assert jpeg_size(fake_jpeg(640, 480)) == (640, 480)
+    with pytest.raises(ValueError):
+        jpeg_size(b"GIF89a")
+
+
+def test_structure():
+    """Sizes, counts and the index are filled in"""
+    frames = [fake_jpeg(320, 240, b"x" * size) for size in (10, 11, 12)]
+    file = BytesIO()
+    assert write_mjpeg_avi(file, iter(frames), fps=10) == 3
+    data = file.getvalue()
+
+    assert data[:4] == b"RIFF" and data[8:12] == b"AVI "
+    assert struct.unpack("<I", data[4:8])[0] == len(data) - 8
+    (hdrl, _, _), (movi, movi_at, movi_size), (idx1, idx1_at, idx1_size) = \
+        list(chunks(data, 12, len(data)))
+    assert (hdrl, movi, idx1) == (b"LIST", b"LIST", b"idx1")
+    assert data[movi_at + 8:movi_at + 12] == b"movi"
+
+    # total frames, width and height in the main header
+    assert struct.unpack("<I", data[48:52])[0] == 3
+    assert struct.unpack("<II", data[64:72]) == (320, 240)
+
+    frame_chunks = list(chunks(data, movi_at + 12, movi_at + 8 + movi_size))
+    assert [size for _, _, size in frame_chunks] == \
+        [len(frame) for frame in frames]
+    for (fourcc, offset, size), frame in zip(frame_chunks, frames):
+        assert fourcc == b"00dc"
+        assert data[offset + 8:offset + 8 + size] == frame
+
+    index = [struct.unpack("<4sIII", data[at:at + 16])
+             for at in range(idx1_at + 8, idx1_at + 8 + idx1_size, 16)]
+    assert [(offset + movi_at + 8, size)
+            for _, _, offset, size in index] == \
+        [(offset, size) for _, offset, size in frame_chunks]
+
+
+def test_no_frames():
+    """Nothing is written without frames"""
+    file = BytesIO()
+    assert write_mjpeg_avi(file, iter([]), fps=10) == 0
+    assert not file.getvalue()
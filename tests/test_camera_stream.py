@@ -0,0 +1,97 @@
+"""Tests of sharing the camera frames among the stream clients"""
+from queue import Empty, Queue
+from types import SimpleNamespace
+
+import pytest
+
+from prusa.link.camera_stream import (  # type:ignore
+    CameraStream, CameraStreams, TooManyStreams)
+from prusa.link.web.cameras import multipart_frames  # type:ignore
+
+TIMEOUT = 5
+
+
+class FakeCamera:
+    """A camera taking a photo each time the test lets it"""
+
+    def __init__(self, camera_id):
+        self.camera_id = camera_id
+        self._driver = SimpleNamespace()
+        self.shots: Queue = Queue()
+        self.taken = 0
+
+    def take_a_photo(self):
+        """Waits to be allowed a shot, returns the numbered photo"""
+        try:
+            self.shots.get(timeout=TIMEOUT)
+        except Empty:
+            return None
+        self.taken += 1
+        return SimpleNamespace(data=f"{self.camera_id} {self.taken}".encode())
+
+    def shoot(self, count=1):
+        """Allows the camera to take count photos"""
+        for _ in range(count):
+            self.shots.put(None)
+
+
+@pytest.fixture(name="cameras")
+def fixture_cameras():
+    """Two fake cameras, let go at the end"""
+    cameras = {camera_id: FakeCamera(camera_id) for camera_id in "ab"}
+    yield cameras
+    for camera in cameras.values():
+        camera.shoot(10)
+
+
+def test_shared_capture(cameras):
+    """Both clients get the same frames, each is captured once"""
+    camera = cameras["a"]
+    stream = CameraStream(camera, max_fps=0, max_width=0)
+    first, second = stream.frames(), stream.frames()
+
+    camera.shoot()
+    assert next(first) == b"a 1"
+    assert next(second) == b"a 1"
+    assert stream.clients == 2
+
+    camera.shoot()
+    assert next(second) == b"a 2"
+    assert next(first) == b"a 2"
+    assert camera.taken == 2
+
+    first.close()
+    second.close()
+    assert stream.clients == 0
+    stream.stop()
+    camera.shoot(10)
+    stream.wait_stopped()
+
+
+def test_client_limit(cameras):
+    """A client over the limit is refused, a client leaving makes room"""
+    controller = SimpleNamespace(get_camera=cameras.__getitem__)
+    streams = CameraStreams(controller, max_fps=0, max_width=0,
+                            max_clients=2)
+    response = multipart_frames(streams.frames("a"))
+    other = streams.frames("b")
+    with pytest.raises(TooManyStreams):
+        streams.frames("a")
+
+    cameras["a"].shoot()
+    assert next(response).startswith(b"--")
+    assert next(response) == b"a 1"
+    assert streams.clients == 2
+    response.close()
+    assert streams.clients == 1
+    assert streams.streams["a"].clients == 0
+
+    again = streams.frames("a")
+    assert streams.clients == 2
+    for frames in (again, other):
+        frames.close()
+
+    streams.stop()
+    for camera in cameras.values():
+        camera.shoot(10)
+    streams.wait_stopped()
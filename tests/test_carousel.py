@@ -142,3 +142,17 @@ def test_lines():
     carousel.disable(screen_a)
     carousel.disable(screen_c)
     assert carousel.get_next() is None
+
+
+def test_urgent():
+    """Tests that the lines of urgent screens are marked as such"""
+    screen_a = Screen(order=1)
+    screen_b = Screen(order=2, urgent=True)
+    carousel = Carousel(screens=[screen_a, screen_b])
+    carousel.set_text(screen_a, "A")
+    carousel.set_text(screen_b, "B")
+    carousel.enable(screen_a)
+    carousel.enable(screen_b)
+    assert not carousel.get_next().urgent
+    assert carousel.get_next().urgent
+    assert not LCDLine("message").urgent
@@ -0,0 +1,102 @@
+"""Tests of the command queue"""
+from threading import Event
+
+import pytest
+
+from prusa.link.printer_adapter.command import (  # type:ignore
+    Command, CommandFailed)
+from prusa.link.printer_adapter.command_handlers import (  # type:ignore
+    PausePrint, ResumePrint, StartPrint, StopPrint)
+from prusa.link.printer_adapter.command_queue import (  # type:ignore
+    CommandQueue)
+
+
+class Blocking(Command):
+    """Runs until stopped or released"""
+    command_name = "blocking"
+    preemptible = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = Event()
+        self.release = Event()
+
+    def _run_command(self):
+        self.started.set()
+        while self.running and not self.release.wait(0.01):
+            pass
+        if not self.running:
+            self.failed("Command interrupted")
+
+
+class Noted(Command):
+    """Notes down that it ran"""
+    command_name = "noted"
+
+    def __init__(self, done, name, **kwargs):
+        super().__init__(**kwargs)
+        self.done = done
+        self.name = name
+
+    def _run_command(self):
+        self.done.append(self.name)
+        return dict(name=self.name)
+
+
+def test_priorities_and_coalescing():
+    """Tests that urgent commands go first and the same ones coalesce"""
+    done = []
+    queue = CommandQueue()
+    blocking = Blocking()
+    queue.enqueue_command(blocking)
+    queue.start()
+    assert blocking.started.wait(1)
+
+    normal = queue.enqueue_command(Noted(done, "normal"))
+    for_connect = Noted(done, "for_connect", command_id=42)
+    for_connect.coalesce = True
+    for_connect = queue.enqueue_command(for_connect)
+    coalescing = Noted(done, "first")
+    coalescing.coalesce = True
+    first = queue.enqueue_command(coalescing)
+    second = Noted(done, "second")
+    second.coalesce = True
+    assert queue.enqueue_command(second) is first
+    assert for_connect is not first
+
+    urgent_command = Noted(done, "urgent")
+    urgent_command.priority = 0
+    urgent = queue.enqueue_command(urgent_command)
+
+    assert urgent.result(1)["name"] == "urgent"
+    assert normal.result(1)["name"] == "normal"
+    assert first.result(1)["name"] == "first"
+    assert done == ["urgent", "normal", "for_connect", "first"]
+    # Each caller gets its own result to change
+    assert queue.wait_for(first) is not queue.wait_for(first)
+    # The urgent one preempted the blocking one
+    assert queue.get_command(1).status()["state"] == "FAILED"
+    assert queue.get_command(first.number).status()["state"] == "FINISHED"
+    queue.stop()
+
+
+def test_cancelling_queued():
+    """Tests that stop and pause drop the queued start and resume"""
+    queue = CommandQueue()
+    blocking = Blocking()
+    blocking.preemptible = False
+    queue.enqueue_command(blocking)
+    queue.start()
+    assert blocking.started.wait(1)
+
+    resume = queue.enqueue_command(ResumePrint())
+    queue.enqueue_command(PausePrint())
+    start = queue.enqueue_command(StartPrint("/local/file.gcode"))
+    queue.enqueue_command(StopPrint())
+
+    for adapter in (resume, start):
+        with pytest.raises(CommandFailed):
+            adapter.result(0)
+        assert adapter.status()["state"] == "FAILED"
+    blocking.release.set()
+    queue.stop()
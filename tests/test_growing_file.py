@@ -0,0 +1,86 @@
+"""Tests of the GrowingFile used for printing files still in transfer"""
+from threading import Thread
+from time import sleep
+
+import pytest
+
+from prusa.link.printer_adapter.structures.growing_file import (  # type:ignore
+    GrowingFile, StreamAborted)
+
+
+def test_whole_lines(tmp_path):
+    """Only whole lines are returned, the rest waits for the writer"""
+    path = tmp_path / "file.gcode"
+    with open(path, "wb") as writer:
+        writer.write(b"G28\nG1 X1")
+        writer.flush()
+        with GrowingFile(str(path)) as stream:
+            assert stream.readline() == "G28\n"
+            assert stream.readline(keep_waiting=lambda: False) == ""
+            assert stream.tell() == 4
+
+            writer.write(b"0\n")
+            writer.flush()
+            stream.notify()
+            assert stream.readline() == "G1 X10\n"
+
+
+def test_finish(tmp_path):
+    """The last line does not need a newline once the file is complete"""
+    path = tmp_path / "file.gcode"
+    with open(path, "wb") as writer:
+        writer.write(b"G28\nM84")
+    with GrowingFile(str(path)) as stream:
+        stream.finish(7)
+        assert stream.readline() == "G28\n"
+        assert stream.readline() == "M84"
+        assert stream.readline() == ""
+
+
+def test_wait_for_writer(tmp_path):
+    """The reader blocks until the writer catches up"""
+    path = tmp_path / "file.gcode"
+    path.write_bytes(b"")
+    with GrowingFile(str(path)) as stream:
+
+        def write():
+            sleep(0.1)
+            with open(path, "ab") as writer:
+                writer.write(b"G28\n")
+            stream.notify()
+            stream.finish(4)
+
+        thread = Thread(target=write)
+        thread.start()
+        assert stream.readline() == "G28\n"
+        assert stream.readline() == ""
+        thread.join()
+
+
+def test_integrity(tmp_path):
+    """A file shorter than what was transferred fails"""
+    path = tmp_path / "file.gcode"
+    path.write_bytes(b"G28\n")
+    with GrowingFile(str(path)) as stream:
+        stream.finish(100)
+        assert stream.readline() == "G28\n"
+        with pytest.raises(StreamAborted):
+            stream.readline()
+
+
+def test_abort(tmp_path):
+    """A dead transfer makes the reader fail instead of waiting forever"""
+    path = tmp_path / "file.gcode"
+    path.write_bytes(b"G28\nG1")
+    with GrowingFile(str(path)) as stream:
+        stream.abort("Stopped")
+        assert stream.readline() == "G28\n"
+        with pytest.raises(StreamAborted):
+            stream.readline()
+
+    alive = True
+    with GrowingFile(str(path), alive=lambda: alive) as stream:
+        assert stream.readline() == "G28\n"
+        alive = False
+        with pytest.raises(StreamAborted):
+            stream.readline()
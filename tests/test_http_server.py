@@ -0,0 +1,41 @@
+"""Tests of the worker pool HTTP server"""
+from socket import create_connection
+from threading import Thread
+
+from prusa.link.web.lib.classes import (  # type:ignore
+    PersistentRequestHandler, PoolServer)
+
+
+def hello(environ, start_response):
+    """Answers hello to everything"""
+    assert environ
+    start_response("200 OK", [("Content-Type", "text/plain"),
+                              ("Content-Length", "5")])
+    return [b"hello"]
+
+
+def test_head_then_get():
+    """Tests that HEAD gets no body, so the next response is in sync"""
+    server = PoolServer(("127.0.0.1", 0), PersistentRequestHandler,
+                        workers=1)
+    server.set_app(hello)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with create_connection(server.server_address, timeout=5) as sock:
+            sock.sendall(b"HEAD / HTTP/1.1\r\nHost: test\r\n\r\n"
+                         b"GET / HTTP/1.1\r\nHost: test\r\n"
+                         b"Connection: close\r\n\r\n")
+            data = b""
+            while chunk := sock.recv(4096):
+                data += chunk
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    head, get = data.split(b"HTTP/1.1 ")[1:]
+    assert head.startswith(b"200 OK")
+    assert head.endswith(b"\r\n\r\n")
+    assert b"Content-Length: 5" in head
+    assert get.startswith(b"200 OK")
+    assert get.endswith(b"\r\n\r\nhello")
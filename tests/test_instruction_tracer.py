@@ -0,0 +1,65 @@
+"""Tests of the instruction tracer"""
+from prusa.link.serial.instruction import Instruction  # type:ignore
+from prusa.link.serial.instruction_tracer import (  # type:ignore
+    CONFIRMED, DEQUEUED, FIRST_OUTPUT, InstructionTracer)
+
+
+def trace(tracer, message):
+    """Traces an instruction through all of its stages"""
+    instruction = Instruction(message)
+    instruction.queue_class = "regular"
+    tracer.start(instruction)
+    tracer.stamp(instruction.trace_id, DEQUEUED)
+    tracer.writing(instruction.trace_id)
+    tracer.written(instruction.trace_id)
+    tracer.line_read()
+    tracer.confirmed(instruction.trace_id)
+    return instruction
+
+
+def test_sampling_and_ring():
+    """Tests that every n-th instruction is traced and the oldest ones
+    get overwritten"""
+    tracer = InstructionTracer(size=2)
+    assert trace(tracer, "M105").trace_id is None
+    tracer.configure(True, 0.5)
+    traced = [trace(tracer, f"G1 X{i}").trace_id for i in range(6)]
+    assert traced == [0, None, 1, None, 2, None]
+
+    events = [event for event in tracer.chrome_trace()["traceEvents"]
+              if event["ph"] == "X"]
+    assert {event["args"]["message"] for event in events} == {"G1 X2",
+                                                              "G1 X4"}
+    assert [event["name"] for event in events[:4]] == [
+        "queue", "write", "firmware", "confirmation"]
+    assert all(event["dur"] >= 0 for event in events)
+
+
+def test_fast_reply():
+    """Tests that lines read before the write ended or after the
+    confirmation are not taken for the first output"""
+    tracer = InstructionTracer(size=2)
+    tracer.configure(True)
+    instruction = Instruction("M105")
+    instruction.queue_class = "regular"
+    tracer.start(instruction)
+    trace_id = instruction.trace_id
+    tracer.stamp(trace_id, DEQUEUED)
+
+    tracer.writing(trace_id)
+    tracer.line_read()  # an older reply, read during the write
+    tracer.written(trace_id)
+    tracer.line_read()
+    first_output = tracer.stamps[FIRST_OUTPUT]
+    assert first_output
+    tracer.confirmed(trace_id)
+    tracer.line_read()
+    tracer.stamp(trace_id, FIRST_OUTPUT)
+    assert tracer.stamps[FIRST_OUTPUT] == first_output
+    assert tracer.stamps[CONFIRMED] >= first_output
+
+    events = [event for event in tracer.chrome_trace()["traceEvents"]
+              if event["ph"] == "X"]
+    assert [event["name"] for event in events] == [
+        "queue", "write", "firmware", "confirmation"]
+    assert all(event["dur"] >= 0 for event in events)
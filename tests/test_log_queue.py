@@ -0,0 +1,47 @@
+"""Tests of the queue of log records"""
+import logging
+
+from prusa.link.log_queue import LogQueue  # type:ignore
+
+
+def record(level, msg):
+    """Makes a log record of the level"""
+    return logging.makeLogRecord(dict(levelno=level,
+                                      levelname=logging.getLevelName(level),
+                                      msg=msg))
+
+
+def test_drop_oldest_debug():
+    """Tests that debug records make room first and nothing blocks"""
+    queue = LogQueue(3)
+    queue.put_nowait(record(logging.INFO, "a"))
+    queue.put_nowait(record(logging.DEBUG, "b"))
+    queue.put_nowait(record(logging.DEBUG, "c"))
+    queue.put_nowait(record(logging.WARNING, "d"))
+    assert [item.msg for item in queue.records()] == ["a", "c", "d"]
+    queue.put_nowait(record(logging.ERROR, "e"))
+    assert [item.msg for item in queue.records()] == ["a", "d", "e"]
+    # No debug record to drop, a new debug one does not get in
+    queue.put_nowait(record(logging.DEBUG, "f"))
+    assert [item.msg for item in queue.records()] == ["a", "d", "e"]
+    # Anything more important pushes out the oldest record
+    queue.put_nowait(record(logging.INFO, "g"))
+    assert [item.msg for item in queue.records()] == ["d", "e", "g"]
+    assert queue.dropped == {"DEBUG": 3, "INFO": 1}
+    assert queue.dropped_total == 4
+
+
+def test_order_and_tasks():
+    """Tests that the records get out in order and dropped ones are
+    not waited for"""
+    queue = LogQueue(3)
+    for level, msg in ((logging.DEBUG, "a"), (logging.INFO, "b"),
+                       (logging.DEBUG, "c"), (logging.ERROR, "d"),
+                       (logging.DEBUG, "e")):
+        queue.put_nowait(record(level, msg))
+    assert queue.qsize() == 3
+    assert queue.unfinished_tasks == 3
+    assert [queue.get_nowait().msg for _ in range(3)] == ["b", "d", "e"]
+    for _ in range(3):
+        queue.task_done()
+    queue.join()
@@ -0,0 +1,50 @@
+"""Tests of the metrics registry"""
+from threading import Thread
+
+from prusa.link.metrics import Registry  # type:ignore
+
+
+def test_exposition():
+    """Tests the Prometheus text format of all the metric kinds"""
+    registry = Registry()
+    lines = registry.counter("lines_total", "Lines", ("direction",))
+    lines.labels("read").inc()
+    lines.labels("read").inc(2)
+    threshold = registry.gauge("threshold_seconds", "Threshold")
+    threshold.set_function(lambda: float("inf"))
+    latency = registry.histogram("latency_seconds", "Latency",
+                                 buckets=(0.1, 1))
+    latency.observe(0.1)
+    latency.observe(0.5)
+    latency.observe(3)
+
+    assert registry.expose() == (
+        "# HELP latency_seconds Latency\n"
+        "# TYPE latency_seconds histogram\n"
+        'latency_seconds_bucket{le="0.1"} 1\n'
+        'latency_seconds_bucket{le="1"} 2\n'
+        'latency_seconds_bucket{le="+Inf"} 3\n'
+        "latency_seconds_sum 3.6\n"
+        "latency_seconds_count 3\n"
+        "# HELP lines_total Lines\n"
+        "# TYPE lines_total counter\n"
+        'lines_total{direction="read"} 3\n'
+        "# HELP threshold_seconds Threshold\n"
+        "# TYPE threshold_seconds gauge\n"
+        "threshold_seconds +Inf\n")
+
+
+def test_threads():
+    """Tests that increments from more threads add up"""
+    counter = Registry().counter("total", "Total")
+
+    def count():
+        for _ in range(10000):
+            counter.inc()
+
+    threads = [Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.expose().endswith("total 40000\n")
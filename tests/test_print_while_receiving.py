@@ -0,0 +1,51 @@
+"""Tests of printing files while they are being received"""
+from types import SimpleNamespace
+
+from prusa.connect.printer.const import State  # type:ignore
+
+from prusa.link.const import STREAM_PRINT_BUFFER  # type:ignore
+from prusa.link.printer_adapter.job import JobState  # type:ignore
+from prusa.link.printer_adapter.print_while_receiving import (  # type:ignore
+    PrintWhileReceiving)
+
+
+def make_receiving(tmp_path):
+    """PrintWhileReceiving with an upload half way through"""
+    part_path = tmp_path / "benchy.gcode.part"
+    part_path.write_bytes(b"G28\n" * 1000)
+    transfer = SimpleNamespace(transfer_id=1, type=None, in_progress=True,
+                               to_print=True, stop_ts=0,
+                               size=4 * STREAM_PRINT_BUFFER,
+                               transferred=2 * STREAM_PRINT_BUFFER,
+                               path="/PrusaLink gcodes/benchy.gcode")
+    file_printer = SimpleNamespace(stream=None)
+
+    def do_command(command):
+        file_printer.stream = command.stream
+
+    receiving = PrintWhileReceiving(
+        cfg=SimpleNamespace(printer=SimpleNamespace(
+            print_while_receiving=True)),
+        printer=SimpleNamespace(transfer=transfer, state=State.IDLE),
+        job=SimpleNamespace(data=SimpleNamespace(job_state=JobState.IDLE),
+                            deselect_file=lambda: None),
+        command_queue=SimpleNamespace(do_command=do_command),
+        file_printer=file_printer,
+        print_stats=SimpleNamespace(stream_finished=lambda stream: None))
+    receiving.expect_upload(str(part_path))
+    return receiving, transfer
+
+
+def test_streamed_transfer_not_throttled(tmp_path):
+    """The printed transfer is not to give way to its own print"""
+    receiving, transfer = make_receiving(tmp_path)
+    assert not receiving.streams(transfer)
+
+    receiving.progress()
+    assert receiving.stream is not None
+    assert receiving.streams(transfer)
+    assert not receiving.streams(SimpleNamespace(transfer_id=2))
+
+    assert receiving.finished(transfer)
+    assert not receiving.streams(transfer)
+    receiving.file_printer.stream.close()
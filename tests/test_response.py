@@ -0,0 +1,65 @@
+"""Tests of the HTTP Range support"""
+from types import SimpleNamespace
+
+import pytest
+from poorwsgi import state
+from poorwsgi.headers import Headers
+from poorwsgi.response import HTTPException
+
+from prusa.link.web.lib.response import (  # type:ignore
+    get_range, partial_headers)
+
+SIZE = 1000
+
+
+def request(headers, method="GET"):
+    """A request with just the headers and the method"""
+    return SimpleNamespace(headers=headers, method=method)
+
+
+def byte_range(value, **headers):
+    """The range of SIZE bytes the Range header value asks for"""
+    return get_range(request(dict(Range=value, **headers)), SIZE, "etag")
+
+
+def test_ranges():
+    """Single, open-ended and suffix ranges"""
+    assert byte_range("bytes=0-99") == (0, 99)
+    assert byte_range("bytes=100-") == (100, SIZE - 1)
+    assert byte_range("bytes=900-2000") == (900, SIZE - 1)
+    assert byte_range("bytes=-100") == (900, SIZE - 1)
+    assert byte_range("bytes=-2000") == (0, SIZE - 1)
+    assert byte_range("bytes=5-5", **{"If-Range": "etag"}) == (5, 5)
+    assert get_range(request({}), SIZE) is None
+    assert get_range(request(dict(Range="bytes=0-99"), "POST"), SIZE) is None
+
+
+@pytest.mark.parametrize("value", ["bytes=1000-", "bytes=5000-6000",
+                                   "bytes=-0"])
+def test_unsatisfiable(value):
+    """Ranges out of the content get 416 with the content size"""
+    with pytest.raises(HTTPException) as info:
+        byte_range(value)
+    response = info.value.response
+    assert response.status_code == state.HTTP_RANGE_NOT_SATISFIABLE
+    assert response.headers["Content-Range"] == f"bytes */{SIZE}"
+
+
+@pytest.mark.parametrize("value", ["bytes=", "bytes=-", "bytes=abc-",
+                                   "bytes=10-5", "bytes=0-1,5-9",
+                                   "items=0-9", "bytes 0-9", "bytes=1-2-3"])
+def test_malformed(value):
+    """Anything not understood means the whole content"""
+    assert byte_range(value) is None
+    assert partial_headers(Headers(), byte_range(value), SIZE) == \
+        state.HTTP_OK
+
+
+def test_if_range():
+    """A changed resource is sent whole"""
+    assert byte_range("bytes=0-9", **{"If-Range": "old-etag"}) is None
+    headers = Headers()
+    assert partial_headers(headers, byte_range("bytes=0-9"), SIZE) == \
+        state.HTTP_PARTIAL_CONTENT
+    assert headers["Content-Range"] == f"bytes 0-9/{SIZE}"
+    assert headers["Accept-Ranges"] == "bytes"
@@ -0,0 +1,139 @@
+"""Tests of copying onto the SD card through the exclusive serial queue"""
+from collections import deque
+from threading import Condition
+from types import SimpleNamespace
+
+import pytest
+
+from prusa.link.printer_adapter.sd_copier import (  # type:ignore
+    CopyFailed, SDCopier, short_name)
+from prusa.link.serial.instruction import Instruction  # type:ignore
+from prusa.link.serial.serial_parser import SerialParser  # type:ignore
+from prusa.link.serial.serial_queue import SerialQueue  # type:ignore
+
+# pylint: disable=protected-access
+
+TIMEOUT = 5
+
+
+class FakeSerial:
+    """A serial adapter writing down what gets written"""
+
+    def __init__(self):
+        self.written = []
+        self.condition = Condition()
+
+    def write(self, data: bytes):
+        """Writes down the data"""
+        with self.condition:
+            self.written.append(data)
+            self.condition.notify_all()
+
+    def wait_written(self, count):
+        """Waits for the count of writes, returns the written data"""
+        with self.condition:
+            assert self.condition.wait_for(
+                lambda: len(self.written) >= count, TIMEOUT)
+            return list(self.written)
+
+
+@pytest.fixture(name="serial")
+def fixture_serial():
+    """The fake serial adapter"""
+    return FakeSerial()
+
+
+@pytest.fixture(name="serial_queue")
+def fixture_serial_queue(serial, tmp_path):
+    """A serial queue writing into the fake serial adapter"""
+    cfg = SimpleNamespace(daemon=SimpleNamespace(
+        threshold_file=str(tmp_path / "threshold")))
+    serial_queue = SerialQueue(serial, SerialParser(), cfg)
+    yield serial_queue
+    serial_queue.stop()
+    serial_queue.wait_stopped()
+    SerialQueue._MCSingleton__instance = None
+    SerialParser._MCSingleton__instance = None
+
+
+def reply_ok(serial_queue):
+    """The printer confirms the instruction it got"""
+    serial_queue.serial_parser.decide("ok")
+
+
+def test_exclusive_blocks_regular(serial, serial_queue):
+    """Only the exclusive instructions get sent until the end"""
+    serial_queue.begin_exclusive()
+    regular = Instruction("M105")
+    serial_queue.enqueue_one(regular)
+    exclusive = Instruction("M28 a.gco")
+    serial_queue.enqueue_exclusive(exclusive)
+    assert serial.wait_written(1) == [b"M28 a.gco\n"]
+
+    reply_ok(serial_queue)
+    assert exclusive.is_confirmed()
+    assert serial_queue.is_empty()
+    assert serial_queue.peek_next() is None
+    assert not regular.is_sent()
+
+    serial_queue.end_exclusive()
+    assert serial.wait_written(2) == [b"M28 a.gco\n", b"M105\n"]
+    reply_ok(serial_queue)
+    assert regular.is_confirmed()
+
+    with pytest.raises(RuntimeError):
+        serial_queue.enqueue_exclusive(Instruction("M29"))
+
+
+def test_leftovers_confirmed(serial, serial_queue):
+    """Whatever the exclusive sender did not get to send is thrown out"""
+    serial_queue.begin_exclusive()
+    sent = Instruction("G1 X1", to_checksum=True)
+    leftovers = [Instruction("G1 X2", to_checksum=True),
+                 Instruction("G1 X3", to_checksum=True)]
+    for instruction in (sent, *leftovers):
+        serial_queue.enqueue_exclusive(instruction)
+    serial.wait_written(1)
+    serial_queue.end_exclusive()
+
+    assert all(instruction.is_confirmed() for instruction in leftovers)
+    assert serial_queue.exclusive_queue is None
+    assert serial_queue.is_empty()
+    reply_ok(serial_queue)
+    assert sent.is_confirmed()
+    assert len(serial.written) == 1
+
+
+def test_write_ends_on_reset(serial, serial_queue):
+    """A printer reset ends the SD write, the copier does not wait"""
+    serial_queue.begin_exclusive()
+    write = Instruction("M28 a.gco")
+    line = Instruction("G1 X1", to_checksum=True)
+    serial_queue.enqueue_exclusive(write)
+    serial_queue.enqueue_exclusive(line)
+    serial.wait_written(1)
+
+    serial_queue._printer_reconnected(was_printing=False)
+    assert serial_queue.exclusive_queue is None
+    assert write.is_confirmed()
+    assert line.is_confirmed()
+
+    copier = SimpleNamespace(serial_queue=serial_queue, enqueued=deque())
+    with pytest.raises(CopyFailed):
+        SDCopier._enqueue(copier, Instruction("M29"))
+    assert not copier.enqueued
+    SDCopier._abort_write(copier, "a.gco")
+    assert len(serial.written) == 1
+
+
+def test_short_name():
+    """Short names are upper case 8.3 ones, the collisions get numbered"""
+    assert short_name("benchy.gcode", set()) == "BENCHY.GCO"
+    assert short_name("benchy.gcode", {"/benchy.gco"}) == "BENCHY1.GCO"
+    assert short_name("žluťoučký kůň.gcode", set()) == "ZLUTOUCK.GCO"
+    assert short_name("???.gcode", set()) == "PRINT.GCO"
+
+    taken = {"/verylong.gco"}
+    assert short_name("verylongname.gcode", taken) == "VERYLON1.GCO"
+    taken |= {f"/verylon{number}.gco" for number in range(1, 10)}
+    assert short_name("verylongname.gcode", taken) == "VERYLO10.GCO"
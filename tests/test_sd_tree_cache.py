@@ -0,0 +1,97 @@
+"""Tests of the SD card listing cache and its reconciliation"""
+from types import SimpleNamespace
+
+from prusa.link.printer_adapter.filesystem.sd_card import (  # type:ignore
+    FileTreeParser, SDCard, reconcile_tree)
+from prusa.link.printer_adapter.filesystem.sd_tree_cache import (
+    SDTreeCache, fingerprint)  # type:ignore
+from prusa.link.printer_adapter.structures.regular_expressions import (
+    LFN_CAPTURE)  # type:ignore
+
+# pylint: disable=protected-access
+
+M_TIME = "0x5a3b7c21"
+
+
+def listing(files, parts=()):
+    """Parses the printer listing of the files in the root
+    and in the parts directory"""
+    lines = ["Begin file list"]
+    lines += [f'{sfn} {M_TIME} {size} "{lfn}"' for sfn, size, lfn in files]
+    if parts:
+        lines.append('DIR_ENTER: /PARTS/ "parts"')
+        lines += [f'/PARTS/{sfn} {M_TIME} {size} "{lfn}"'
+                  for sfn, size, lfn in parts]
+        lines.append("DIR_EXIT")
+    lines.append("End file list")
+    return FileTreeParser([LFN_CAPTURE.match(line) for line in lines])
+
+
+BENCHY = ("BENCHY~1.GCO", 100, "benchy.gcode")
+GEAR = ("GEAR~1.GCO", 200, "gear.gcode")
+BOLT = ("BOLT~1.GCO", 300, "bolt.gcode")
+NUT = ("NUT~1.GCO", 400, "nut.gcode")
+
+
+def test_round_trip():
+    """The cached listing gives the same tree and translations"""
+    parser = listing([BENCHY, GEAR], parts=[BOLT])
+    data = parser.to_dict()
+    restored = FileTreeParser.from_dict(data)
+    assert restored.to_dict() == data
+    assert fingerprint(restored.to_dict()) == fingerprint(data)
+    assert restored.sfn_to_lfn_paths["/parts/bolt~1.gco"] == \
+        "/parts/bolt.gcode"
+    bolt = restored.tree.get(["parts", "bolt.gcode"])
+    assert bolt.attrs["size"] == 300
+    assert bolt.attrs["m_timestamp"]
+
+
+def test_reconcile():
+    """Only the added, removed and changed files are reported,
+    the unchanged nodes stay"""
+    current = listing([BENCHY, GEAR], parts=[BOLT]).tree
+    benchy = current.get(["benchy.gcode"])
+    fresh = listing([BENCHY, ("GEAR~1.GCO", 201, "gear.gcode")],
+                    parts=[NUT]).tree
+
+    changes = reconcile_tree(current, fresh, [])
+    paths = {(old, new) for old, new, _ in changes}
+    assert paths == {
+        ("/SD Card/gear.gcode", "/SD Card/gear.gcode"),
+        ("/SD Card/parts/bolt.gcode", None),
+        (None, "/SD Card/parts/nut.gcode"),
+    }
+    assert current.get(["benchy.gcode"]) is benchy
+    assert current.get(["gear.gcode"]).attrs["size"] == 201
+    assert current.get(["parts", "bolt.gcode"]) is None
+    assert current.get(["parts", "nut.gcode"]).abs_path("SD Card") == \
+        "/SD Card/parts/nut.gcode"
+
+    unchanged = listing([BENCHY, ("GEAR~1.GCO", 201, "gear.gcode")],
+                        parts=[NUT]).tree
+    assert not reconcile_tree(current, unchanged, [])
+
+
+def test_same_card():
+    """A card sharing at least half of the short names is the same one"""
+    card = SimpleNamespace(data=SimpleNamespace(
+        sfn_to_lfn_paths=listing([BENCHY, GEAR]).sfn_to_lfn_paths))
+    assert SDCard._same_card(card, listing([BENCHY, GEAR, BOLT]))
+    assert SDCard._same_card(card, listing([BENCHY]))
+    assert not SDCard._same_card(card, listing([BOLT, NUT]))
+    assert not SDCard._same_card(card, listing([BENCHY, BOLT, NUT]))
+
+
+def test_cache_file(tmp_path):
+    """The last listing survives a restart, an invalid file is ignored"""
+    path = str(tmp_path / "sd_tree_cache.json")
+    data = listing([BENCHY]).to_dict()
+    cache = SDTreeCache(path)
+    assert cache.last() is None
+    cache.save(fingerprint(data), data)
+    assert SDTreeCache(path).last() == (fingerprint(data), data)
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("[]")
+    assert SDTreeCache(path).last() is None
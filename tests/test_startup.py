@@ -0,0 +1,46 @@
+"""Tests of the startup steps"""
+from threading import Event
+
+import pytest
+
+from prusa.link.printer_adapter.startup import Startup  # type:ignore
+
+
+def test_order_and_parallel():
+    """Tests that the steps wait for their prerequisites only"""
+    order = []
+    slow_started = Event()
+
+    def slow():
+        slow_started.set()
+        order.append("slow")
+
+    def waiting():
+        # Runs alongside the slow one
+        assert slow_started.wait(1)
+        order.append("waiting")
+
+    startup = Startup(workers=2)
+    startup.add("first", lambda: order.append("first"))
+    startup.add("slow", slow, ("first",))
+    startup.add("waiting", waiting, ("first",))
+    startup.add("last", lambda: order.append("last"), ("slow", "waiting"))
+    startup.ready_after("last")
+    startup.run()
+
+    assert order[0] == "first" and order[-1] == "last"
+    assert all(step["duration"] is not None
+               for step in startup.report()["steps"])
+
+
+def test_failure():
+    """Tests that a failed step stops the startup"""
+    ran = []
+    startup = Startup()
+    startup.add("broken", lambda: 1 / 0)
+    startup.add("dependent", lambda: ran.append("dependent"), ("broken",))
+    with pytest.raises(ZeroDivisionError):
+        startup.run()
+    assert not ran
+    with pytest.raises(ValueError):
+        startup.add("unknown", lambda: None, ("missing",))
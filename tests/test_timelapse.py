@@ -0,0 +1,108 @@
+"""Tests of the Timelapse file management"""
+import os
+from types import SimpleNamespace
+
+from blinker import Signal  # type: ignore
+
+from prusa.link.printer_adapter.job import JobState  # type:ignore
+from prusa.link.timelapse import Timelapse  # type:ignore
+
+# pylint: disable=protected-access
+
+
+def make_timelapse(directory, max_size=1000):
+    """A timelapse with a fake job and no cameras"""
+    job = SimpleNamespace(
+        job_id_updated_signal=Signal(),
+        data=SimpleNamespace(job_state=JobState.IDLE,
+                             selected_file_path="/local/benchy.gcode"))
+    camera_controller = SimpleNamespace(cameras_in_order=[])
+    os.makedirs(directory, exist_ok=True)
+    return Timelapse(str(directory), max_size, 10, camera_controller, job)
+
+
+def write(path, size, mtime=None):
+    """Writes a file of the size, optionally dated to the mtime"""
+    with open(path, "wb") as file:
+        file.write(b"x" * size)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_traversal(tmp_path):
+    """Names pointing out of the timelapse directory are refused"""
+    timelapse = make_timelapse(tmp_path / "timelapse")
+    os.mkdir(tmp_path / "other")
+    write(tmp_path / "other" / "keep.avi", 10)
+    write(tmp_path / "secret.avi", 10)
+    os.symlink(tmp_path / "secret.avi",
+               tmp_path / "timelapse" / "link.avi")
+    write(tmp_path / "timelapse" / "notes.txt", 10)
+
+    for name in ("", ".", "..", "../other", "../secret.avi", "link.avi",
+                 "notes.txt", "missing.avi"):
+        assert not timelapse.delete(name)
+        assert timelapse.video_path(name) is None
+    assert os.path.exists(tmp_path / "other" / "keep.avi")
+    assert os.path.exists(tmp_path / "secret.avi")
+    assert os.path.exists(tmp_path / "timelapse" / "notes.txt")
+
+
+def test_delete(tmp_path):
+    """Videos and recordings in the directory can be deleted"""
+    timelapse = make_timelapse(tmp_path)
+    write(tmp_path / "print.avi", 10)
+    os.mkdir(tmp_path / "recording")
+    write(tmp_path / "recording" / "000001.jpg", 5)
+    timelapse.size = 15
+
+    assert timelapse.video_path("print.avi") == str(tmp_path / "print.avi")
+    assert timelapse.delete("print.avi")
+    assert timelapse.delete("recording")
+    assert os.listdir(tmp_path) == []
+    assert timelapse.size == 0
+
+
+def test_make_room(tmp_path):
+    """The oldest videos go first, frames are skipped with none left"""
+    timelapse = make_timelapse(tmp_path, max_size=100)
+    write(tmp_path / "new.avi", 40, mtime=2000)
+    write(tmp_path / "old.avi", 40, mtime=1000)
+    timelapse.size = timelapse._used_space()
+
+    assert timelapse._make_room(30)
+    assert sorted(os.listdir(tmp_path)) == ["new.avi"]
+    assert timelapse.size == 40
+
+    assert timelapse._make_room(60)
+    assert timelapse.size == 40
+
+    assert not timelapse._make_room(110)
+    assert os.listdir(tmp_path) == []
+    assert timelapse.size == 0
+
+
+def test_job_changed(tmp_path):
+    """A started job starts a recording, its end hands it to rendering"""
+    timelapse = make_timelapse(tmp_path)
+    job = timelapse.job
+
+    job.data.job_state = JobState.IN_PROGRESS
+    timelapse.job_changed(None)
+    recording = timelapse.recording
+    assert recording.startswith("benchy_")
+    assert os.path.isdir(tmp_path / recording)
+
+    job.data.job_state = JobState.IDLE
+    timelapse.job_changed(None)
+    assert timelapse.recording is None
+    assert not os.path.exists(tmp_path / recording)
+    assert not timelapse.to_render
+
+    job.data.job_state = JobState.IN_PROGRESS
+    timelapse.job_changed(None)
+    recording = timelapse.recording
+    timelapse.frame_number = 1
+    job.data.job_state = JobState.IDLE
+    timelapse.job_changed(None)
+    assert list(timelapse.to_render) == [recording]
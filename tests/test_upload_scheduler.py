@@ -0,0 +1,122 @@
+"""Tests of the upload throttling"""
+from types import SimpleNamespace
+
+import pytest
+
+from prusa.link.const import (UPLOAD_MAX_LOAD,  # type:ignore
+                              UPLOAD_MIN_RATE, UPLOAD_RATE_STEP)
+from prusa.link.printer_adapter.upload_scheduler import (  # type:ignore
+    TokenBucket, UploadScheduler)
+
+# pylint: disable=protected-access
+
+
+def make_scheduler(max_rate=0, at_risk=False):
+    """A scheduler with a fake file printer"""
+    file_printer = SimpleNamespace(at_risk=at_risk)
+    file_printer.print_at_risk = lambda: file_printer.at_risk
+    cfg = SimpleNamespace(http=SimpleNamespace(upload_rate=max_rate,
+                                               upload_burst=64 * 1024))
+    return UploadScheduler(file_printer, cfg)
+
+
+def feedback(upload, rate, now):
+    """Pretend the upload went at the rate for a second until now"""
+    upload.sampled_at = now - 1
+    upload.sampled_bytes = rate
+    upload._feedback(now)
+
+
+@pytest.fixture(autouse=True)
+def idle_cpu(monkeypatch):
+    """The CPU load does not play into the tests"""
+    monkeypatch.setattr("os.getloadavg", lambda: (0., 0., 0.))
+
+
+def test_token_bucket():
+    """Tokens refill at the rate up to the burst, debt means waiting"""
+    bucket = TokenBucket(rate=100, burst=50)
+    now = bucket.refilled_at
+    assert bucket.take(30, now) == 0
+    assert bucket.tokens == 20
+    assert bucket.take(40, now) == pytest.approx(0.2)
+    bucket.refill(now + 0.1)
+    assert bucket.tokens == pytest.approx(-10)
+    bucket.refill(now + 10)
+    assert bucket.tokens == 50
+    bucket.take(50, now + 10)
+    bucket.reset()
+    assert bucket.tokens == 50
+
+
+def test_halving_and_lifting():
+    """The rate halves down to the minimum at risk, then ramps up and
+    with no maximum, the limit gets lifted"""
+    scheduler = make_scheduler(at_risk=True)
+    upload = scheduler.start()
+    assert upload.rate is None
+
+    rate = 8 * UPLOAD_MIN_RATE
+    feedback(upload, rate, now=1)
+    assert upload.rate == rate / 2
+    assert upload.bucket.rate == rate / 2
+    for now in range(2, 10):
+        feedback(upload, upload.rate, now)
+    assert upload.rate == UPLOAD_MIN_RATE
+
+    scheduler.file_printer.at_risk = False
+    # The upload keeps up with the limit, so it goes on
+    feedback(upload, 2 * UPLOAD_MIN_RATE, now=10)
+    assert upload.rate == UPLOAD_MIN_RATE + UPLOAD_RATE_STEP
+    # The limit is far above what the upload does, no need for it
+    feedback(upload, UPLOAD_MIN_RATE, now=11)
+    assert upload.rate is None
+    scheduler.stop(upload)
+
+
+def test_ramp_up_to_share():
+    """Without the risk, the rate grows up to the share of the maximum"""
+    max_rate = 16 * UPLOAD_MIN_RATE
+    scheduler = make_scheduler(max_rate=max_rate)
+    upload = scheduler.start()
+    assert upload.rate == max_rate
+    scheduler.file_printer.at_risk = True
+    feedback(upload, max_rate, now=1)
+    assert upload.rate == max_rate / 2
+
+    scheduler.file_printer.at_risk = False
+    feedback(upload, max_rate / 2, now=2)
+    assert upload.rate == max_rate
+    feedback(upload, max_rate, now=3)
+    assert upload.rate == max_rate
+
+    other = scheduler.start()
+    assert other.rate == max_rate / 2
+    feedback(upload, max_rate, now=4)
+    assert upload.rate == max_rate / 2
+
+
+def test_rate_share():
+    """The maximum gets split between the running uploads"""
+    assert make_scheduler().rate_share() is None
+    scheduler = make_scheduler(max_rate=900)
+    assert scheduler.rate_share() == 900
+    uploads = [scheduler.start() for _ in range(3)]
+    assert [upload.rate for upload in uploads] == [900, 450, 300]
+    assert scheduler.rate_share() == 300
+    scheduler.stop(uploads[0])
+    scheduler.stop(uploads[0])
+    assert scheduler.rate_share() == 450
+
+
+def test_at_risk(monkeypatch):
+    """The print at risk, or an overloaded CPU"""
+    scheduler = make_scheduler()
+    assert not scheduler.at_risk()
+    scheduler.file_printer.at_risk = True
+    assert scheduler.at_risk()
+    scheduler.file_printer.at_risk = False
+    monkeypatch.setattr("os.cpu_count", lambda: 2)
+    monkeypatch.setattr("os.getloadavg",
+                        lambda: (2 * UPLOAD_MAX_LOAD + 0.1, 0., 0.))
+    assert scheduler.at_risk()
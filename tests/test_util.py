@@ -0,0 +1,80 @@
+"""Tests of the YUYV to JPEG conversion"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from prusa.link.util import YUYVConverter  # type:ignore
+
+WIDTH = 8
+HEIGHT = 6
+
+
+@pytest.fixture(name="encoded")
+def fixture_encoded(monkeypatch):
+    """Instead of encoding, writes down the planar buffer and its size"""
+    encoded = []
+
+    def encode_from_yuv(buffer, height, width, jpeg_subsample):
+        encoded.append((buffer.copy(), height, width, jpeg_subsample))
+        return b"jpeg"
+
+    monkeypatch.setattr(
+        "prusa.link.util.get_jpeg",
+        lambda: SimpleNamespace(encode_from_yuv=encode_from_yuv))
+    return encoded
+
+
+def frame(width=WIDTH, height=HEIGHT):
+    """A YUYV frame with every byte different"""
+    return (np.arange(width * height * 2) % 251).astype(np.uint8).tobytes()
+
+
+def old_planar(data):
+    """The planar buffer of the conversion before the converter"""
+    data_array = np.frombuffer(data, np.uint8)
+    size = len(data)
+    yuv_array = np.empty((size,), dtype=np.uint8)
+    yuv_array[:size//2] = data_array[0::2]
+    yuv_array[size//2: size//4*3] = data_array[1::4]
+    yuv_array[size//4*3:] = data_array[3::4]
+    return yuv_array
+
+
+def test_full_size(encoded):
+    """Unscaled, the planes are the same as before, the buffer is reused"""
+    converter = YUYVConverter()
+    data = frame()
+    assert converter.to_jpeg(data, WIDTH, HEIGHT) == b"jpeg"
+    buffer, height, width, _ = encoded[0]
+    assert (height, width) == (HEIGHT, WIDTH)
+    assert np.array_equal(buffer, old_planar(data))
+
+    converter.to_jpeg(frame()[::-1], WIDTH, HEIGHT)
+    assert np.array_equal(encoded[1][0], old_planar(frame()[::-1]))
+    assert len(converter._buffers) == 1  # pylint: disable=protected-access
+
+
+@pytest.mark.parametrize("scale, size", [(2, (4, 3)), (4, (2, 2))])
+def test_scaled(encoded, scale, size):
+    """Every scale-th pixel of every scale-th row is kept"""
+    data = frame()
+    assert YUYVConverter.scaled_size(WIDTH, HEIGHT, scale) == size
+    YUYVConverter().to_jpeg(data, WIDTH, HEIGHT, scale)
+    buffer, height, width, _ = encoded[0]
+    assert (width, height) == size
+
+    rows = np.frombuffer(data, np.uint8).reshape(HEIGHT, WIDTH * 2)
+    kept = rows[::scale].reshape(height, WIDTH // 2, 4)[:, ::scale]
+    luma = buffer[:width * height].reshape(height, width)
+    blue, red = buffer[width * height:].reshape(2, height, width // 2)
+    assert np.array_equal(luma, rows[::scale, 0::2][:, ::scale])
+    assert np.array_equal(blue, kept[:, :, 1])
+    assert np.array_equal(red, kept[:, :, 3])
+
+
+@pytest.mark.parametrize("width, scale", [(8, 0), (6, 2), (8, 3)])
+def test_bad_scale(width, scale):
+    """The pairs of pixels sharing the chroma cannot be split"""
+    with pytest.raises(ValueError):
+        YUYVConverter.scaled_size(width, HEIGHT, scale)